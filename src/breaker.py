@@ -0,0 +1,66 @@
+from typing import Any, Dict, Hashable, Iterable, List, Tuple
+
+# Number of consecutive failed evaluations after which a visualizer is not used for a type anymore
+QUARANTINE_THRESHOLD = 32
+
+
+class CircuitBreaker:
+    """
+    Tracks the runtime failures of visualizers per (natvis type, concrete type). A visualizer which validated but whose
+    expressions keep failing for a type (e.g. because of a different standard library ABI) is quarantined for the rest
+    of the session so that printing falls through to the next candidate instead of retrying the failing evaluations.
+    """
+
+    def __init__(self, threshold: int = QUARANTINE_THRESHOLD) -> None:
+        super().__init__()
+
+        self.threshold = threshold
+        # Consecutive failures of the pairs which did not succeed since their last failure
+        self._failures: Dict[Tuple[Any, str], int] = {}
+        # The total number of failures of the quarantined pairs
+        self._quarantined: Dict[Tuple[Any, str], int] = {}
+        self._total_failures: Dict[Tuple[Any, str], int] = {}
+
+    def record_success(self, natvis_type: Hashable, type_name: str) -> None:
+        if len(self._failures) > 0:
+            self._failures.pop((natvis_type, type_name), None)
+
+    def record_failure(self, natvis_type: Hashable, type_name: str) -> bool:
+        """
+        Counts a failed evaluation of an expression of natvis_type for a value of the named type.
+        :return: True if the pair is now quarantined
+        """
+        key = (natvis_type, type_name)
+        self._total_failures[key] = self._total_failures.get(key, 0) + 1
+
+        if key in self._quarantined:
+            self._quarantined[key] = self._total_failures[key]
+            return True
+
+        failures = self._failures.get(key, 0) + 1
+        if failures < self.threshold:
+            self._failures[key] = failures
+            return False
+
+        self._failures.pop(key, None)
+        self._quarantined[key] = self._total_failures[key]
+        return True
+
+    def is_quarantined(self, natvis_type: Hashable, type_name: str) -> bool:
+        return len(self._quarantined) > 0 and (natvis_type, type_name) in self._quarantined
+
+    def quarantined(self) -> List[Tuple[Any, str, int]]:
+        """:return: The quarantined pairs together with their number of failures"""
+        return [(natvis_type, type_name, count) for (natvis_type, type_name), count in self._quarantined.items()]
+
+    def release(self, natvis_types: Iterable[Hashable]) -> None:
+        """Forgets the failures of the given natvis types, e.g. after they were reloaded"""
+        natvis_types = set(natvis_types)
+        for entries in (self._failures, self._quarantined, self._total_failures):
+            for key in [x for x in entries if x[0] in natvis_types]:
+                del entries[key]
+
+    def clear(self) -> None:
+        self._failures.clear()
+        self._quarantined.clear()
+        self._total_failures.clear()
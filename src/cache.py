@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Callable, List
+
+
+class LRUCache:
+    """
+    Dictionary like container with a bounded size. Once the maximum size is reached the least recently used entry is
+    evicted.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        super().__init__()
+
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self._entries[key]
+        except KeyError:
+            return default
+
+        self._entries.move_to_end(key)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class ScopedCaches:
+    """
+    Keeps a separate cache for every scope (e.g. an objfile). The cache of a scope can be dropped as a whole once the
+    scope becomes invalid.
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        super().__init__()
+
+        self.factory = factory
+        self._scopes = {}
+
+    def __len__(self) -> int:
+        return len(self._scopes)
+
+    def __contains__(self, scope: Hashable) -> bool:
+        return scope in self._scopes
+
+    def get(self, scope: Hashable) -> Any:
+        cache = self._scopes.get(scope)
+        if cache is None:
+            cache = self.factory()
+            self._scopes[scope] = cache
+        return cache
+
+    def evict(self, scope: Hashable) -> None:
+        self._scopes.pop(scope, None)
+
+    def evict_if(self, predicate: Callable[[Hashable], bool]) -> None:
+        for scope in [x for x in self._scopes if predicate(x)]:
+            del self._scopes[scope]
+
+    def clear(self) -> None:
+        self._scopes.clear()
+
+
+class PageCache:
+    """
+    Caches the memory of the inferior in aligned pages. Neighbouring reads (e.g. the members of an object and the
+    characters of a string stored next to it) are then served by one transfer. The cache must be cleared whenever the
+    memory of the inferior may have changed.
+    """
+
+    def __init__(self, read: Callable[[int, int], bytes], page_size: int = 4096, max_pages: int = 256) -> None:
+        """
+        :param read: Reads the given number of bytes at an address. Raises an exception if the memory is not readable
+        """
+        super().__init__()
+
+        self.read_function = read
+        self.page_size = page_size
+        self.pages = LRUCache(max_pages)
+
+    def _get_page(self, page_start: int) -> bytes:
+        page = self.pages.get(page_start)
+        if page is None:
+            page = bytes(self.read_function(page_start, self.page_size))
+            self.pages[page_start] = page
+        return page
+
+    def read(self, address: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+
+        first_page = address - address % self.page_size
+        parts: List[bytes] = []
+        try:
+            for page_start in range(first_page, address + length, self.page_size):
+                parts.append(self._get_page(page_start))
+        except Exception:
+            # A page is only partially readable. Read exactly the requested range so the caller gets the same result
+            # (or error) as without the cache
+            return bytes(self.read_function(address, length))
+
+        data = b"".join(parts)
+        offset = address - first_page
+        return data[offset:offset + length]
+
+    def clear(self) -> None:
+        self.pages.clear()
@@ -0,0 +1,179 @@
+import argparse
+import itertools
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TextIO
+
+import gdb
+
+
+class DumpOptions:
+    def __init__(self, depth: int, elements: int, frames: Optional[int], variables: List[str],
+                 global_names: List[str]) -> None:
+        super().__init__()
+
+        self.depth = depth
+        self.elements = elements
+        self.frames = frames
+        self.variables = variables
+        self.global_names = global_names
+
+
+def _iter_children(visualizer) -> Iterator[Tuple[str, Any]]:
+    # Natvis printers can skip the display string child since the display string is already part of the record
+    children = getattr(visualizer, "expanded_children", None) or getattr(visualizer, "children", None)
+    if children is None:
+        return iter(())
+    return children()
+
+
+def dump_value(val: Any, depth: int, elements: int) -> Dict[str, Any]:
+    """
+    Converts a value into a JSON compatible dictionary using the registered pretty printers.
+    :param val: The value to convert. Children of pretty printers may also be plain Python values
+    :param depth: How many levels of children are included
+    :param elements: The maximum number of children per value
+    """
+    if not isinstance(val, gdb.Value):
+        return {"value": str(val)}
+
+    try:
+        result = {"type": str(val.type)}
+
+        visualizer = gdb.default_visualizer(val)
+        if visualizer is None:
+            result["value"] = str(val)
+            return result
+
+        display = visualizer.to_string() if hasattr(visualizer, "to_string") else None
+        result["value"] = None if display is None else str(display)
+
+        if depth > 0:
+            result["children"] = [dict(name=name, **dump_value(child, depth - 1, elements))
+                                  for name, child in itertools.islice(_iter_children(visualizer), elements)]
+        return result
+    except Exception as e:
+        # A broken visualizer (e.g. an expression the parser does not understand) must not abort the whole dump
+        return {"error": str(e)}
+
+
+def _frame_variables(frame: gdb.Frame, names: List[str]) -> Iterator[Tuple[str, gdb.Value]]:
+    if len(names) > 0:
+        for name in names:
+            try:
+                yield name, frame.read_var(name)
+            except ValueError:
+                # Not available in this frame
+                continue
+        return
+
+    try:
+        block = frame.block()
+    except RuntimeError:
+        # No debug information for this frame
+        return
+
+    seen = set()
+    while block is not None:
+        for symbol in block:
+            if (symbol.is_variable or symbol.is_argument) and symbol.name not in seen:
+                seen.add(symbol.name)
+                try:
+                    yield symbol.name, symbol.value(frame)
+                except gdb.error:
+                    # E.g. a variable whose location can not be computed
+                    continue
+
+        if block.function is not None:
+            # Do not include the static and global blocks
+            break
+        block = block.superblock
+
+
+def _iter_frames(limit: Optional[int]) -> Iterator[gdb.Frame]:
+    frame = gdb.newest_frame()
+    level = 0
+    while frame is not None and (limit is None or level < limit):
+        yield frame
+        frame = frame.older()
+        level += 1
+
+
+def dump(out: TextIO, options: DumpOptions) -> int:
+    """
+    Writes one JSON object per line for every requested variable of every frame of every thread.
+    :return: The number of written records
+    """
+    count = 0
+
+    for name in options.global_names:
+        symbol = gdb.lookup_global_symbol(name)
+        if symbol is None and hasattr(gdb, "lookup_static_symbol"):
+            # Only available in newer GDB versions
+            symbol = gdb.lookup_static_symbol(name)
+        if symbol is None:
+            continue
+        record = {"global": name}
+        record.update(dump_value(symbol.value(), options.depth, options.elements))
+        out.write(json.dumps(record) + "\n")
+        count += 1
+
+    for thread in gdb.selected_inferior().threads():
+        thread.switch()
+
+        for level, frame in enumerate(_iter_frames(options.frames)):
+            function = frame.name()
+            for name, val in _frame_variables(frame, options.variables):
+                record = {"thread": thread.num, "frame": level, "function": function, "name": name}
+                record.update(dump_value(val, options.depth, options.elements))
+                out.write(json.dumps(record) + "\n")
+                count += 1
+
+    return count
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    def error(self, message: str):
+        # The default implementation would exit GDB
+        raise gdb.GdbError(self.format_usage() + message)
+
+
+class DumpNatvis(gdb.Command):
+    """
+    Writes the visualized values of variables in all threads and frames as newline delimited JSON.
+
+    Usage: natvis-dump [--depth N] [--elements N] [--frames N] [--globals NAME,...] FILE [VARIABLE...]
+
+    Without variable names all locals and arguments of every frame are written.
+    """
+
+    def __init__(self):
+        super().__init__("natvis-dump", gdb.COMMAND_DATA)
+
+        self.parser = _ArgumentParser(prog="natvis-dump", add_help=False)
+        self.parser.add_argument("--depth", type=int, default=1)
+        self.parser.add_argument("--elements", type=int, default=100)
+        self.parser.add_argument("--frames", type=int, default=None)
+        self.parser.add_argument("--globals", default="")
+        self.parser.add_argument("file")
+        self.parser.add_argument("variables", nargs="*")
+
+    def invoke(self, argument: str, from_tty: bool) -> None:
+        args = self.parser.parse_args(gdb.string_to_argv(argument))
+        options = DumpOptions(args.depth, args.elements, args.frames, args.variables,
+                              [x for x in args.globals.split(",") if len(x) > 0])
+
+        selected_thread = gdb.selected_thread()
+        selected_frame = gdb.selected_frame() if selected_thread is not None else None
+        try:
+            with open(args.file, "w") as out:
+                count = dump(out, options)
+        finally:
+            # Walking the threads changes the selection
+            if selected_thread is not None:
+                selected_thread.switch()
+                selected_frame.select()
+
+        print("Wrote {} values to {}".format(count, args.file))
+
+    def dont_repeat(self) -> bool:
+        return True
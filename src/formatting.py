@@ -0,0 +1,347 @@
+from typing import Callable, List, Optional, Union, Tuple, Any
+
+import gdb
+
+import memory
+import scopes
+from natvis import FormatSpecifiers, FormatExpression, DisplayStringParser
+from settings import SETTINGS
+
+# Formats a single value as it should appear inside of a display string
+ValueFormatter = Callable[[Union[gdb.Value, bool, int, float]], str]
+
+# The maximum number of array elements that are read for a display string
+ARRAY_DISPLAY_LIMIT = 200
+
+CHARACTER_TYPE_NAMES = {"char", "signed char", "unsigned char", "char8_t", "wchar_t", "char16_t", "char32_t"}
+
+# Strings are read in chunks of this size. Chunks are aligned so a read never crosses a page boundary
+STRING_CHUNK_SIZE = 64
+
+# Evaluates an expression of a display string. Optionally converts the result with the passed function
+ValueGetter = Callable[..., Any]
+
+
+def _unsigned(val) -> int:
+    """Returns the integer value of val reinterpreted as an unsigned integer of the same size"""
+    result = int(val)
+    if result < 0 and isinstance(val, gdb.Value):
+        result &= (1 << (val.type.sizeof * 8)) - 1
+    return result
+
+
+def _format_decimal(val) -> str:
+    return str(int(val))
+
+
+def _format_octal(val) -> str:
+    return "0{:o}".format(_unsigned(val))
+
+
+def _format_hex(val) -> str:
+    return "0x{:x}".format(_unsigned(val))
+
+
+def _format_hex_upper(val) -> str:
+    return "0x{:X}".format(_unsigned(val))
+
+
+def _format_character(val) -> str:
+    code = int(val)
+    try:
+        return "{} '{}'".format(code, chr(_unsigned(val)))
+    except (ValueError, OverflowError):
+        return str(code)
+
+
+def _format_enum(val) -> str:
+    # GDB already prints the enumerator name for enum values
+    return str(val)
+
+
+# Formatters for the specifiers which determine how a scalar value is printed. If multiple are present the last one wins
+_SCALAR_FORMATTERS = {
+    FormatSpecifiers.DECIMAL_INT: _format_decimal,
+    FormatSpecifiers.OCTAL_INT: _format_octal,
+    FormatSpecifiers.HEX_INT: _format_hex,
+    FormatSpecifiers.HEX_INT_UPPER: _format_hex_upper,
+    FormatSpecifiers.CHARACTER: _format_character,
+    FormatSpecifiers.ENUM: _format_enum,
+}
+
+
+# Character size and whether the string is quoted for the string specifiers
+_STRING_FORMATS = {
+    FormatSpecifiers.STRING: (1, True),
+    FormatSpecifiers.STRING_NO_QUOTES: (1, False),
+    FormatSpecifiers.WIDE_STRING: (2, True),
+    FormatSpecifiers.WIDE_STRING_NO_QUOTES: (2, False),
+    FormatSpecifiers.UTF32_STRING: (4, True),
+    FormatSpecifiers.UTF32_STRING_NO_QUOTES: (4, False),
+}
+
+
+# The byte order of the program. Asking GDB for it is a CLI round trip, so it is only done once per program space
+_BYTE_ORDERS = scopes.scoped_caches(dict)
+
+
+def _target_byte_order() -> str:
+    cache = _BYTE_ORDERS.get(scopes.current_scope())
+    byte_order = cache.get("byte_order")
+    if byte_order is None:
+        byte_order = "be" if "big endian" in gdb.execute("show endian", to_string=True) else "le"
+        cache["byte_order"] = byte_order
+    return byte_order
+
+
+def _decode(data: bytes, char_size: int) -> str:
+    if char_size == 1:
+        return data.decode("utf-8", errors="replace")
+
+    encoding = "utf-16" if char_size == 2 else "utf-32"
+    return data.decode(encoding + "-" + _target_byte_order(), errors="replace")
+
+
+def _string_address(val: gdb.Value) -> int:
+    t = val.type.strip_typedefs()
+    if t.code == gdb.TYPE_CODE_ARRAY:
+        return int(val[0].address)
+    if t.code != gdb.TYPE_CODE_PTR:
+        raise ValueError("String format specified for non-pointer type " + str(val.type))
+    return int(val)
+
+
+def read_string(address: int, char_size: int, limit: Optional[int], length: int = None) -> Tuple[str, bool]:
+    """
+    Reads a string from the inferior without ever reading more than the configured limit.
+    :param address: The address of the first character
+    :param char_size: The size of one character in bytes
+    :param limit: The maximum number of characters to read. None for no limit
+    :param length: The number of characters of the string. If this is None the string is terminated by a nul character
+    :return: The decoded string and whether it was truncated
+    """
+    if length is not None:
+        count = length if limit is None else min(length, limit)
+        data = memory.read_memory(address, count * char_size)
+        return _decode(data, char_size), count < length
+
+    terminator = b"\0" * char_size
+    data = b""
+    while limit is None or len(data) < limit * char_size:
+        start = address + len(data)
+        chunk_size = STRING_CHUNK_SIZE - start % STRING_CHUNK_SIZE
+        if limit is not None:
+            chunk_size = min(chunk_size, limit * char_size - len(data))
+
+        try:
+            chunk = memory.read_memory(start, chunk_size)
+        except gdb.MemoryError:
+            # Reached inaccessible memory without finding the terminator
+            return _decode(data[:len(data) - len(data) % char_size], char_size), True
+
+        search_start = len(data) - len(data) % char_size
+        data += chunk
+
+        end = data.find(terminator, search_start)
+        while end != -1 and end % char_size != 0:
+            # Only accept terminators which are aligned to a character boundary
+            end = data.find(terminator, end + 1)
+        if end != -1:
+            return _decode(data[:end], char_size), False
+
+    return _decode(data[:len(data) - len(data) % char_size], char_size), True
+
+
+def _read_string_value(val: gdb.Value, char_size: int) -> Tuple[str, bool]:
+    """
+    Reads the string a character pointer or array refers to. Arrays are never read past their end, a string filling the
+    whole array is not reported as truncated.
+    """
+    t = val.type.strip_typedefs()
+    address = _string_address(val)
+    limit = SETTINGS.string_limit
+    if t.code == gdb.TYPE_CODE_ARRAY:
+        length = t.sizeof // char_size
+        if limit is None or length <= limit:
+            return read_string(address, char_size, length)[0], False
+    return read_string(address, char_size, limit)
+
+
+def _quote(string: str, truncated: bool, quoted: bool) -> str:
+    if truncated:
+        string += "..."
+    return '"' + string + '"' if quoted else string
+
+
+def _string_formatter(char_size: int, quoted: bool) -> ValueFormatter:
+    def format_string(val) -> str:
+        string, truncated = _read_string_value(val, char_size)
+        return _quote(string, truncated, quoted)
+
+    return format_string
+
+
+def is_string_value(val: gdb.Value) -> bool:
+    """Checks if the value is a pointer to or an array of characters"""
+    t = val.type.strip_typedefs()
+    return (t.code == gdb.TYPE_CODE_PTR or t.code == gdb.TYPE_CODE_ARRAY) and is_character_type(t.target())
+
+
+def format_string_value(val: gdb.Value, show_address: bool = True) -> str:
+    """
+    Formats a character pointer or array like GDB does but without reading an unbounded amount of memory.
+    :param val: The pointer or array
+    :param show_address: Whether the address of a pointer is printed in front of the string
+    """
+    t = val.type.strip_typedefs()
+    if t.code == gdb.TYPE_CODE_PTR and int(val) == 0:
+        return "0x0"
+
+    string, truncated = _read_string_value(val, t.target().sizeof)
+    if t.code == gdb.TYPE_CODE_PTR and show_address:
+        return "0x{:x} {}".format(int(val), _quote(string, truncated, True))
+    return _quote(string, truncated, True)
+
+
+def _no_address(formatter: ValueFormatter, is_default: bool) -> ValueFormatter:
+    def format_no_address(val) -> str:
+        if isinstance(val, gdb.Value) and val.type.strip_typedefs().code == gdb.TYPE_CODE_PTR:
+            if not is_character_type(val.type.strip_typedefs().target()):
+                # Show the object the pointer points to instead of the address
+                return formatter(val.dereference())
+            if is_default:
+                # Only the string itself
+                return format_string_value(val, show_address=False)
+        return formatter(val)
+
+    return format_no_address
+
+
+def is_character_type(t: gdb.Type) -> bool:
+    t = t.strip_typedefs().unqualified()
+    return t.code == gdb.TYPE_CODE_CHAR or (t.code == gdb.TYPE_CODE_INT and t.name in CHARACTER_TYPE_NAMES)
+
+
+def has_scalar_format(specs: Optional[List[FormatSpecifiers]]) -> bool:
+    return any(spec in _SCALAR_FORMATTERS for spec in specs or [])
+
+
+def _get_string_format(specs: Optional[List[FormatSpecifiers]]) -> Optional[Tuple[int, bool]]:
+    string_format = None
+    for spec in specs or []:
+        string_format = _STRING_FORMATS.get(spec, string_format)
+    return string_format
+
+
+def compile_formatter(specs: Optional[List[FormatSpecifiers]], default: ValueFormatter) -> ValueFormatter:
+    """
+    Builds the function which formats a value according to the given format specifiers.
+    :param specs: The parsed format specifiers of the expression
+    :param default: The formatter to use if no specifier changes how the value is printed
+    :return: The formatter function
+    """
+    formatter = default
+    for spec in specs or []:
+        if spec in _STRING_FORMATS:
+            formatter = _string_formatter(*_STRING_FORMATS[spec])
+        else:
+            formatter = _SCALAR_FORMATTERS.get(spec, formatter)
+
+    if specs is not None and FormatSpecifiers.NO_ADDRESS in specs:
+        formatter = _no_address(formatter, formatter is default)
+
+    return formatter
+
+
+def array_view(val: gdb.Value, length: int) -> gdb.Value:
+    """
+    Reinterprets a pointer (or an array) as an array with the specified length. The contents of the returned value are
+    read from the inferior with a single memory transfer once they are needed.
+    :param val: The pointer to the first element
+    :param length: The number of elements of the array
+    :return: The array value
+    """
+    t = val.type.strip_typedefs()
+    if t.code == gdb.TYPE_CODE_ARRAY:
+        val = val[0].address
+        t = val.type
+
+    if t.code != gdb.TYPE_CODE_PTR:
+        raise ValueError("Array length specified for non-pointer type " + str(val.type))
+
+    # Using a lower and upper bound also allows empty arrays
+    return val.dereference().cast(t.target().array(0, max(length, 0) - 1))
+
+
+def format_array(val: gdb.Value, length: int, specs: Optional[List[FormatSpecifiers]],
+                 element_formatter: ValueFormatter) -> str:
+    """
+    Formats the elements of an array view for a display string. Character arrays are displayed as strings unless a
+    numeric format was requested.
+    """
+    string_format = _get_string_format(specs)
+    if string_format is None and not has_scalar_format(specs):
+        t = val.type.strip_typedefs()
+        if is_string_value(val):
+            string_format = t.target().sizeof, True
+
+    if string_format is not None:
+        char_size, quoted = string_format
+        string, truncated = read_string(_string_address(val), char_size, SETTINGS.string_limit, max(length, 0))
+        return _quote(string, truncated, quoted)
+
+    count = min(length, ARRAY_DISPLAY_LIMIT)
+    view = array_view(val, count)
+    view.fetch_lazy()
+
+    elements = [element_formatter(view[i]) for i in range(count)]
+    if length > ARRAY_DISPLAY_LIMIT:
+        elements.append("...")
+
+    return "{" + ", ".join(elements) + "}"
+
+
+class FormatSlot:
+    """A code part of a display string together with its compiled formatter"""
+
+    def __init__(self, code: FormatExpression, default: ValueFormatter) -> None:
+        super().__init__()
+
+        self.expression = code.base_expression
+        self.array_length = code.array_length
+        self.specs = code.formatspecs
+        self.formatter = compile_formatter(code.formatspecs, default)
+
+    def format(self, get_value: ValueGetter) -> str:
+        val = get_value(self.expression)
+
+        try:
+            if self.array_length is not None:
+                length = get_value(self.array_length, int)
+                if isinstance(length, int) and isinstance(val, gdb.Value):
+                    return format_array(val, length, self.specs, self.formatter)
+
+            return self.formatter(val)
+        except (gdb.error, ValueError, TypeError):
+            # The format does not fit the value
+            return str(val)
+
+
+class DisplayStringRenderer:
+    """
+    Compiled form of a DisplayStringParser. The literal text is stored as plain segments in between the slots of the
+    code parts so rendering only needs to join strings.
+    """
+
+    def __init__(self, parser: DisplayStringParser, default: ValueFormatter) -> None:
+        super().__init__()
+
+        self.literals = parser.literal_parts
+        self.slots = [FormatSlot(code, default) for code in parser.code_parts]
+
+    def render(self, get_value: ValueGetter) -> str:
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            parts.append(slot.format(get_value))
+            parts.append(literal)
+        return "".join(parts)
@@ -1,5 +1,5 @@
 from enum import Enum, auto
-from typing import Optional, Any, overload, Tuple, Iterable, Union, List
+from typing import Optional, Any, overload, Tuple, Iterable, Union, List, Callable
 
 
 class CodeEnum(Enum):
@@ -77,6 +77,7 @@ class Type:
     name: Optional[str]
     sizeof: int
     tag: Optional[str]
+    objfile: Optional[Objfile]
 
     def fields(self) -> Iterable[Field]:
 
@@ -212,5 +213,195 @@ class Command:
 
 PYTHONDIR: str = ...
 
+VERSION: str = ...
+
 
 def string_to_argv(val: str) -> List[str]: ...
+
+
+class ParameterEnum(Enum):
+    PARAM_BOOLEAN = auto()
+    PARAM_AUTO_BOOLEAN = auto()
+    PARAM_UINTEGER = auto()
+    PARAM_INTEGER = auto()
+    PARAM_STRING = auto()
+    PARAM_STRING_NOESCAPE = auto()
+    PARAM_OPTIONAL_FILENAME = auto()
+    PARAM_FILENAME = auto()
+    PARAM_ZINTEGER = auto()
+    PARAM_ZUINTEGER = auto()
+    PARAM_ZUINTEGER_UNLIMITED = auto()
+    PARAM_ENUM = auto()
+
+
+PARAM_BOOLEAN = ParameterEnum.PARAM_BOOLEAN
+PARAM_AUTO_BOOLEAN = ParameterEnum.PARAM_AUTO_BOOLEAN
+PARAM_UINTEGER = ParameterEnum.PARAM_UINTEGER
+PARAM_INTEGER = ParameterEnum.PARAM_INTEGER
+PARAM_STRING = ParameterEnum.PARAM_STRING
+PARAM_STRING_NOESCAPE = ParameterEnum.PARAM_STRING_NOESCAPE
+PARAM_OPTIONAL_FILENAME = ParameterEnum.PARAM_OPTIONAL_FILENAME
+PARAM_FILENAME = ParameterEnum.PARAM_FILENAME
+PARAM_ZINTEGER = ParameterEnum.PARAM_ZINTEGER
+PARAM_ZUINTEGER = ParameterEnum.PARAM_ZUINTEGER
+PARAM_ZUINTEGER_UNLIMITED = ParameterEnum.PARAM_ZUINTEGER_UNLIMITED
+PARAM_ENUM = ParameterEnum.PARAM_ENUM
+
+
+class Parameter:
+    value: Any
+    set_doc: str
+    show_doc: str
+
+    def __init__(self, name: str, command_class: CommandClassEnum, parameter_class: ParameterEnum,
+                 enum_sequence: Iterable[str] = None): ...
+
+    def get_set_string(self) -> str: ...
+
+    def get_show_string(self, svalue: str) -> str: ...
+
+
+def parameter(name: str) -> Any: ...
+
+
+class error(RuntimeError): ...
+
+
+class MemoryError(error): ...
+
+
+class Inferior:
+    num: int
+    pid: int
+
+    def read_memory(self, address: int, length: int) -> memoryview: ...
+
+    def threads(self) -> Tuple[InferiorThread, ...]: ...
+
+    def write_memory(self, address: int, buffer: Union[str, bytes], length: int = None) -> None: ...
+
+
+def selected_inferior() -> Inferior: ...
+
+
+def execute(command: str, from_tty: bool = False, to_string: bool = False) -> Optional[str]: ...
+
+
+class EventRegistry:
+    def connect(self, handler: Callable[..., None]) -> None: ...
+
+    def disconnect(self, handler: Callable[..., None]) -> None: ...
+
+
+class events:
+    stop: EventRegistry
+    cont: EventRegistry
+    exited: EventRegistry
+    new_objfile: EventRegistry
+    free_objfile: EventRegistry
+    clear_objfiles: EventRegistry
+    inferior_call: EventRegistry
+    memory_changed: EventRegistry
+    register_changed: EventRegistry
+    before_prompt: EventRegistry
+
+
+class Progspace:
+    filename: Optional[str]
+
+    def is_valid(self) -> bool: ...
+
+    def objfiles(self) -> List[Objfile]: ...
+
+
+class Objfile:
+    filename: str
+    username: str
+    progspace: Progspace
+
+    def is_valid(self) -> bool: ...
+
+
+def current_progspace() -> Progspace: ...
+
+
+def objfiles() -> List[Objfile]: ...
+
+
+class GdbError(Exception): ...
+
+
+class Symtab:
+    filename: str
+    objfile: Objfile
+
+    def fullname(self) -> str: ...
+
+
+class Symbol:
+    name: str
+    type: Type
+    symtab: Symtab
+    is_argument: bool
+    is_variable: bool
+
+    def value(self, frame: Frame = None) -> Value: ...
+
+
+class Block:
+    function: Optional[Symbol]
+    superblock: Optional[Block]
+
+    def __iter__(self) -> Iterable[Symbol]: ...
+
+
+class Frame:
+    def name(self) -> Optional[str]: ...
+
+    def older(self) -> Optional[Frame]: ...
+
+    def block(self) -> Block: ...
+
+    def read_var(self, name: str) -> Value: ...
+
+    def select(self) -> None: ...
+
+
+class InferiorThread:
+    num: int
+    global_num: int
+
+    def switch(self) -> None: ...
+
+
+def newest_frame() -> Frame: ...
+
+
+def selected_frame() -> Frame: ...
+
+
+def selected_thread() -> Optional[InferiorThread]: ...
+
+
+def lookup_symbol(name: str, block: Block = None, domain: Any = None) -> Tuple[Optional[Symbol], bool]: ...
+
+
+def lookup_global_symbol(name: str, domain: Any = None) -> Optional[Symbol]: ...
+
+
+def lookup_static_symbol(name: str, domain: Any = None) -> Optional[Symbol]: ...
+
+
+def default_visualizer(value: Value) -> Any: ...
+
+
+def parse_and_eval(expression: str) -> Value: ...
+
+
+def convenience_variable(name: str) -> Optional[Value]: ...
+
+
+def set_convenience_variable(name: str, value: Any) -> None: ...
+
+
+def post_event(event: Callable[[], None]) -> None: ...
@@ -1,11 +1,187 @@
-# This exposes a function which writes to the GDB log if available and to stdout otherwise
+# This exposes functions which write to the GDB log if available and to stdout otherwise
+import sys
+import time
+import traceback
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
 try:
     from gdb import write
     import gdb
 
 
-    def log_message(msg: str):
-        write(str(msg) + "\n", gdb.STDLOG)
+    def _write(msg: str):
+        write(msg + "\n", gdb.STDLOG)
 except ImportError:
-    def log_message(msg: str):
+    def _write(msg: str):
         print(msg)
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {
+    "debug": DEBUG,
+    "info": INFO,
+    "warning": WARNING,
+    "error": ERROR,
+}
+
+# Messages below this level are discarded before they are formatted
+level = WARNING
+
+# At most this many messages are written per second. Further messages are counted and reported later
+MAX_MESSAGES_PER_SECOND = 20
+
+# At most this many distinct failures are remembered. The oldest ones are forgotten first
+MAX_FAILURE_RECORDS = 4096
+
+# Receives the formatted messages. Can be replaced e.g. for testing
+handler: Callable[[str], None] = _write
+
+# A message is either a format string with arguments or a function producing the message
+Message = Union[str, Callable[[], str]]
+
+
+class FailureRecord:
+    """Counts the occurrences of one kind of failure"""
+
+    def __init__(self, msg: Message, args: Tuple[Any, ...]) -> None:
+        super().__init__()
+
+        self.msg = msg
+        self.args = args
+        self.count = 0
+
+    def format(self) -> str:
+        return _format(self.msg, self.args)
+
+
+_failures: Dict[Hashable, FailureRecord] = {}
+
+_window_start = 0.0
+_window_messages = 0
+_suppressed = 0
+
+
+def set_level(name: str) -> None:
+    global level
+    level = LEVEL_NAMES[name]
+
+
+def is_enabled(msg_level: int) -> bool:
+    return msg_level >= level
+
+
+def _format(msg: Message, args) -> str:
+    if callable(msg):
+        return str(msg())
+    if len(args) > 0:
+        return msg.format(*args)
+    return str(msg)
+
+
+def _emit(text: Callable[[], str]) -> None:
+    """Writes the message produced by text unless the rate limit is exceeded, in which case it is never formatted"""
+    global _window_start, _window_messages, _suppressed
+
+    now = time.monotonic()
+    if now - _window_start >= 1.0:
+        _window_start = now
+        _window_messages = 0
+
+    if _window_messages >= MAX_MESSAGES_PER_SECOND:
+        _suppressed += 1
+        return
+    _window_messages += 1
+
+    if _suppressed > 0:
+        handler("{} log messages were suppressed".format(_suppressed))
+        _suppressed = 0
+    handler(text())
+
+
+def log(msg_level: int, msg: Message, *args: Any, exc_info: bool = False) -> None:
+    """
+    Writes a message if the level is enabled. The message is only formatted if it is actually written.
+    :param msg_level: The level of the message
+    :param msg: A format string for str.format or a function returning the message
+    :param args: The arguments of the format string
+    :param exc_info: Whether the traceback of the exception which is currently handled is appended
+    """
+    if not is_enabled(msg_level):
+        return
+
+    def text() -> str:
+        result = _format(msg, args)
+        if exc_info:
+            result += "\n" + "".join(traceback.format_exception(*sys.exc_info()))
+        return result
+
+    _emit(text)
+
+
+def debug(msg: Message, *args: Any, **kwargs: Any) -> None:
+    log(DEBUG, msg, *args, **kwargs)
+
+
+def info(msg: Message, *args: Any, **kwargs: Any) -> None:
+    log(INFO, msg, *args, **kwargs)
+
+
+def warning(msg: Message, *args: Any, **kwargs: Any) -> None:
+    log(WARNING, msg, *args, **kwargs)
+
+
+def error(msg: Message, *args: Any, **kwargs: Any) -> None:
+    log(ERROR, msg, *args, **kwargs)
+
+
+def _is_report_count(count: int) -> bool:
+    # Report after 10, 100, 1000, ... occurrences
+    while count >= 10 and count % 10 == 0:
+        count //= 10
+    return count == 1
+
+
+def log_failure(key: Hashable, msg_level: int, msg: Message, *args: Any, exc_info: bool = False) -> None:
+    """
+    Logs a failure which may happen many times, e.g. an expression which can not be evaluated for every element of a
+    container. Only the first occurrence is formatted and written. Repetitions increment a counter which is reported
+    after 10, 100, 1000, ... occurrences.
+    :param key: Identifies failures which are considered identical, e.g. the natvis type and the expression
+    """
+    record = _failures.get(key)
+    if record is not None:
+        record.count += 1
+        if _is_report_count(record.count) and is_enabled(msg_level):
+            count = record.count
+            _emit(lambda: "{} (repeated {} times)".format(record.format(), count))
+        return
+
+    if len(_failures) >= MAX_FAILURE_RECORDS:
+        del _failures[next(iter(_failures))]
+    record = FailureRecord(msg, args)
+    record.count = 1
+    _failures[key] = record
+
+    log(msg_level, msg, *args, exc_info=exc_info)
+
+
+def failure_counts() -> Dict[Hashable, int]:
+    return {key: record.count for key, record in _failures.items()}
+
+
+def reset_failures(key_filter: Optional[Callable[[Hashable], bool]] = None) -> None:
+    """Forgets the recorded failures so they are reported again, e.g. after a natvis file was reloaded"""
+    if key_filter is None:
+        _failures.clear()
+        return
+
+    for key in [x for x in _failures if key_filter(x)]:
+        del _failures[key]
+
+
+def log_message(msg: str):
+    """Writes a message regardless of the level"""
+    _emit(lambda: str(msg))
@@ -0,0 +1,86 @@
+from typing import Dict
+
+import gdb
+
+import formatting
+from cache import PageCache
+from settings import SETTINGS
+
+# Number of array elements which are read from the inferior with one memory transfer
+BULK_READ_ELEMENTS = 256
+
+# Size of the pages of the memory cache. The cache holds at most PAGE_CACHE_PAGES pages per inferior
+PAGE_SIZE = 4096
+PAGE_CACHE_PAGES = 256
+
+# Page caches of the inferiors by their number
+_PAGE_CACHES: Dict[int, PageCache] = {}
+
+
+def read_memory(address: int, length: int) -> bytes:
+    """
+    Reads memory of the selected inferior. If the page cache is enabled the memory is read in whole pages which are
+    kept until the inferior continues or its memory is modified.
+    """
+    inferior = gdb.selected_inferior()
+    if not SETTINGS.page_cache:
+        return bytes(inferior.read_memory(address, length))
+
+    cache = _PAGE_CACHES.get(inferior.num)
+    if cache is None:
+        cache = PageCache(inferior.read_memory, PAGE_SIZE, PAGE_CACHE_PAGES)
+        _PAGE_CACHES[inferior.num] = cache
+    return cache.read(address, length)
+
+
+def flush_page_cache(event=None) -> None:
+    _PAGE_CACHES.clear()
+
+
+def connect_events() -> None:
+    # The memory may change whenever the inferior runs, a function is called in it or the user writes to it
+    gdb.events.cont.connect(flush_page_cache)
+    gdb.events.inferior_call.connect(flush_page_cache)
+    gdb.events.memory_changed.connect(flush_page_cache)
+    gdb.events.exited.connect(flush_page_cache)
+
+
+def element_pointer(val: gdb.Value) -> gdb.Value:
+    """Returns a pointer to the first element if val is an array. Pointers are returned unchanged."""
+    if val.type.strip_typedefs().code == gdb.TYPE_CODE_ARRAY:
+        return val[0].address
+    return val
+
+
+class ArrayReader:
+    """
+    Provides access to the elements of a contiguous array. The elements are read in blocks so iterating over the array
+    needs one memory transfer per block instead of one per element.
+    """
+
+    def __init__(self, val: gdb.Value, count: int) -> None:
+        super().__init__()
+
+        self.first = element_pointer(val)
+        self.count = count
+
+        self._block_start = None
+        self._block = None
+
+    def __getitem__(self, index: int) -> gdb.Value:
+        if index < 0 or index >= self.count:
+            raise IndexError("Array index out of range")
+
+        if self._block_start is None or not self._block_start <= index < self._block_start + BULK_READ_ELEMENTS:
+            block_start = index - index % BULK_READ_ELEMENTS
+            block = formatting.array_view(self.first + block_start, min(BULK_READ_ELEMENTS, self.count - block_start))
+            try:
+                block.fetch_lazy()
+            except gdb.MemoryError:
+                # Parts of the block are not readable. Let GDB report the error for the individual elements
+                return (self.first + index).dereference()
+
+            self._block_start = block_start
+            self._block = block
+
+        return self._block[index - self._block_start]
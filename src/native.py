@@ -0,0 +1,181 @@
+import contextlib
+import re
+from typing import Any, Optional
+
+import gdb
+
+import logger
+import parser
+import scopes
+from cache import LRUCache
+from settings import SETTINGS
+from utils import get_type_name_or_tag
+
+# Name of the convenience variable holding a pointer to the visualized object
+THIS_VARIABLE = "natvis_this"
+# Name of the convenience variable holding the value of $i
+INDEX_VARIABLE = "natvis_i"
+
+# Identifiers outside of string and character literals. Literals are matched as well so they are skipped as a whole
+IDENTIFIER_REGEX = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|(?<![\w$])([A-Za-z_]\w*)")
+# Assignments, increments and decrements would modify the inferior
+SIDE_EFFECT_REGEX = re.compile(r"\+\+|--|<<=|>>=|(?<![=!<>])=(?!=)")
+CALL_REGEX = re.compile(r"([A-Za-z_]\w*|>)\s*\(")
+CAST_REGEX = re.compile(r"\b(?:static|reinterpret|const|dynamic)_cast\s*<")
+# Names which may be followed by parentheses without calling a function in the inferior
+NON_CALLS = {"sizeof", "alignof", "bool", "char", "short", "int", "long", "unsigned", "signed", "float", "double"}
+
+# The GDB setting which prevents the evaluator from calling functions in the inferior, e.g. for overloaded operators
+MAY_CALL_FUNCTIONS = "may-call-functions"
+
+# Returned by evaluate if the expression has to be evaluated by the parser module instead
+NOT_EVALUATED = object()
+
+# Translations by (type name, expression). False marks expressions GDB can not evaluate
+_TRANSLATIONS = scopes.scoped_caches(lambda: LRUCache(8192))
+
+
+def is_enabled() -> bool:
+    backend = SETTINGS.expression_backend
+    if backend == "auto":
+        # The parser can only evaluate member accesses without libclang
+        return not parser.CLANG_AVAILABLE
+    return backend == "gdb"
+
+
+def _has_member(t: gdb.Type, name: str) -> bool:
+    t = t.strip_typedefs()
+    if t.code != gdb.TYPE_CODE_STRUCT and t.code != gdb.TYPE_CODE_UNION:
+        return False
+
+    for field in t.fields():
+        if field.is_base_class:
+            if _has_member(field.type, name):
+                return True
+        elif field.name == name:
+            return True
+    return False
+
+
+def _may_call_functions(expression: str) -> bool:
+    for match in CALL_REGEX.finditer(expression):
+        callee = match.group(1)
+        if callee == ">":
+            # Either the end of a C++ cast or of the template arguments of a function
+            if CAST_REGEX.search(expression) is None:
+                return True
+        elif callee not in NON_CALLS:
+            return True
+    return False
+
+
+def translate(t: gdb.Type, expression: str) -> Optional[str]:
+    """
+    Translates a natvis expression into a GDB expression. "this" and the members of the visualized object which are used
+    without "this->" are accessed through the THIS_VARIABLE convenience variable.
+    :param t: The type of the visualized object
+    :param expression: The expression with $T1, ... already replaced and $i referring to the INDEX_VARIABLE
+    :return: The GDB expression or None if evaluating it could modify the inferior or call functions in it
+    """
+    if SIDE_EFFECT_REGEX.search(expression) is not None or _may_call_functions(expression):
+        return None
+
+    this = "$" + THIS_VARIABLE
+
+    def replace(match) -> str:
+        name = match.group(1)
+        if name is None:
+            # A literal
+            return match.group(0)
+
+        prefix = expression[:match.start()].rstrip()
+        if prefix.endswith((".", "->", "::")) or expression[match.end():].lstrip().startswith("::"):
+            # A member of something else or a scoped name
+            return name
+
+        if name == "this":
+            return this
+        if _has_member(t, name):
+            return this + "->" + name
+        # Globals, enumerators and type names are resolved by GDB
+        return name
+
+    return IDENTIFIER_REGEX.sub(replace, expression)
+
+
+def evaluate(this_val: gdb.Value, expression: str, index: Optional[int] = None) -> Any:
+    """
+    Evaluates a natvis expression with the expression evaluator of GDB.
+    :param expression: The expression with $i replaced by the INDEX_VARIABLE convenience variable
+    :param index: The value of $i
+    :return: The value, a parser.EvaluationError if evaluating it failed for this object or NOT_EVALUATED if GDB can not
+             evaluate the expression at all
+    """
+    address = this_val.address
+    if address is None or not hasattr(gdb, "set_convenience_variable"):
+        # Not located in memory or an older GDB version
+        return NOT_EVALUATED
+
+    t = this_val.type
+    translations = _TRANSLATIONS.get(scopes.type_scope(t))
+    key = (get_type_name_or_tag(t.strip_typedefs()), expression)
+
+    gdb.set_convenience_variable(THIS_VARIABLE, address)
+    if index is not None:
+        gdb.set_convenience_variable(INDEX_VARIABLE, index)
+
+    translated = translations.get(key)
+    if translated is None:
+        translated = translate(t, expression)
+        if translated is None or not _can_parse(translated):
+            translated = False
+        translations[key] = translated
+    if translated is False:
+        return NOT_EVALUATED
+
+    try:
+        with _no_inferior_calls():
+            return gdb.parse_and_eval(translated)
+    except gdb.error as e:
+        # A runtime error of this object (e.g. a division by zero or an optimized out member). Other objects of the
+        # type may still be fine
+        return parser.EvaluationError(e)
+
+
+def _can_parse(translated: str) -> bool:
+    """
+    Checks if GDB understands an expression. The operand of sizeof is only type checked, so this neither reads memory
+    nor fails because of the values of the object.
+    """
+    try:
+        with _no_inferior_calls():
+            gdb.parse_and_eval("sizeof(" + translated + ")")
+        return True
+    except gdb.error as e:
+        # Probably natvis specific syntax. The parser module is used for this expression from now on
+        logger.debug("GDB can not evaluate '{}', falling back to the natvis parser: {}", translated, e)
+        return False
+
+
+@contextlib.contextmanager
+def _no_inferior_calls():
+    """
+    Disables calls of inferior functions while GDB evaluates an expression. The translation only rejects calls which
+    are visible in the text, but overloaded operators and calls through function pointers would still resume the
+    inferior.
+    """
+    try:
+        may_call = gdb.parameter(MAY_CALL_FUNCTIONS)
+    except RuntimeError:
+        # GDB versions before 9 do not have the setting. Only the checks of translate() apply there
+        may_call = False
+
+    if not may_call:
+        yield
+        return
+
+    gdb.execute("set {} off".format(MAY_CALL_FUNCTIONS), to_string=True)
+    try:
+        yield
+    finally:
+        gdb.execute("set {} on".format(MAY_CALL_FUNCTIONS), to_string=True)
@@ -1,7 +1,9 @@
+import hashlib
 import os
 import re
+import sys
 from enum import Enum
-from typing import Iterator, Tuple, Optional, List
+from typing import Iterator, Tuple, Optional, List, Dict, Set
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element
 
@@ -59,24 +61,34 @@ def parse_format_specifier(spec: str) -> Iterator[FormatSpecifiers]:
             pos += current_length
 
 
-ARRAY_LENGTH_REGEX = re.compile("^(?:\[(.*)\])?(.*)$")
+def intern_string(value: Optional[str]) -> Optional[str]:
+    """
+    Interns the type names and expressions of the parsed documents. The same expressions (e.g. "_Mypair._Myval2") are
+    used by many types, so this keeps one copy of them alive.
+    """
+    return None if value is None else sys.intern(value)
+
+
+# The array length is either an expression in brackets or a plain integer literal
+ARRAY_LENGTH_REGEX = re.compile("^(?:\[(.*)\]|(\d+))?(.*)$")
 
 
 class FormatExpression:
+    __slots__ = ("base_expression", "formatspecs", "array_length")
 
     def __init__(self, expression: str) -> None:
         super().__init__()
 
         parts = expression.rsplit(",", 1)
 
-        self.base_expression = parts[0]
+        self.base_expression = intern_string(parts[0])
         self.formatspecs = None
         self.array_length = None
         if len(parts) == 2:
             format = parts[1].lstrip().rstrip()
             match = ARRAY_LENGTH_REGEX.match(format)
-            self.array_length = match.group(1)
-            self.formatspecs = list(parse_format_specifier(match.group(2)))
+            self.array_length = intern_string(match.group(1) or match.group(2))
+            self.formatspecs = list(parse_format_specifier(match.group(3)))
 
     def __str__(self):
         return self.base_expression + ", " + self.array_length or "(no array)" + " (" + ", ".join(
@@ -88,10 +100,16 @@ class FormatExpression:
 
 
 class DisplayStringParser:
+    __slots__ = ("code_parts", "literal_parts", "renderer", "template_string")
+
     def __init__(self, string) -> None:
         super().__init__()
 
         self.code_parts = []
+        # The unescaped text around the code parts. There is always one more literal than code parts
+        self.literal_parts = [""]
+        # Compiled lazily by the printer the first time this display string is rendered
+        self.renderer = None
 
         # TODO: This looks a lot like a state machine, maybe it should be written like one
         in_code = False
@@ -108,6 +126,7 @@ class DisplayStringParser:
                 if c == "}":
                     in_code = False
                     self.code_parts.append(FormatExpression(current_code))
+                    self.literal_parts.append("")
                     current_code = None
                 else:
                     current_code += c
@@ -116,9 +135,11 @@ class DisplayStringParser:
                     # Found an escaped {
                     skip_next = True
                     self.template_string += "{{"
+                    self.literal_parts[-1] += "{"
                 elif c == "}" and next == "}":
                     skip_next = True
                     self.template_string += "}}"
+                    self.literal_parts[-1] += "}"
                 elif c == "{":
                     # Saw the start of a code block
                     in_code = True
@@ -126,6 +147,10 @@ class DisplayStringParser:
                     self.template_string += "{{{}}}".format(len(self.code_parts))
                 else:
                     self.template_string += c
+                    self.literal_parts[-1] += c
+
+        self.literal_parts = [intern_string(x) for x in self.literal_parts]
+        self.template_string = intern_string(self.template_string)
 
     def __str__(self) -> str:
         return '"' + self.template_string + '" (' + ", ".join((str(x) for x in self.code_parts)) + ")"
@@ -136,10 +161,11 @@ class DisplayStringParser:
 
 
 class DisplayString:
+    __slots__ = ("condition", "parser")
 
     def __init__(self, parser: DisplayStringParser, condition: str) -> None:
         super().__init__()
-        self.condition = condition
+        self.condition = intern_string(condition)
         self.parser = parser
 
     def __str__(self) -> str:
@@ -150,44 +176,213 @@ class DisplayString:
 
 
 class ExpandElement:
-    pass
+    __slots__ = ()
 
 
 class ExpandItem(ExpandElement):
+    __slots__ = ("name", "expression", "condition")
+
     def __init__(self, name: str, expression: FormatExpression, condition: str):
         super().__init__()
-        self.name = name
+        self.name = intern_string(name)
         self.expression = expression
-        self.condition = condition
+        self.condition = intern_string(condition)
 
 
 class ExpandArrayItems(ExpandElement):
+    __slots__ = ("condition", "value_ptr_expr", "size_expr")
 
     def __init__(self, condition: str, size_expr: str, value_node: str) -> None:
         super().__init__()
-        self.condition = condition
-        self.value_ptr_expr = value_node
-        self.size_expr = size_expr
+        self.condition = intern_string(condition)
+        self.value_ptr_expr = intern_string(value_node)
+        self.size_expr = intern_string(size_expr)
+
+
+INDEX_VAR_REGEX = re.compile(r"\$i\b")
+
+# Characters of binary operators which bind weaker than "+"
+LOW_PRECEDENCE_CHARS = set("<>=!&|^?:,")
+OPERATOR_CHARS = LOW_PRECEDENCE_CHARS | set("+-*/%~")
+
+
+def _find_closing_paren(expr: str, start: int) -> int:
+    depth = 0
+    for pos in range(start, len(expr)):
+        if expr[pos] in "([":
+            depth += 1
+        elif expr[pos] in ")]":
+            depth -= 1
+            if depth == 0:
+                return pos
+    return -1
+
+
+def _top_level(expr: str) -> str:
+    """Returns the parts of the expression which are not nested inside of parentheses or brackets"""
+    out = ""
+    depth = 0
+    for c in expr.replace("->", ".").replace("::", "."):
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif depth == 0:
+            out += c
+    return out
+
+
+def _is_postfix_expression(expr: str) -> bool:
+    """Checks if the expression binds at least as strong as a subscript applied to it"""
+    if len(expr) <= 0 or INDEX_VAR_REGEX.search(expr) is not None:
+        return False
+    if expr[0] == "(":
+        # Only a completely parenthesized expression is fine. Anything else could be a cast
+        return _find_closing_paren(expr, 0) == len(expr) - 1
+    return not any(c in OPERATOR_CHARS or c.isspace() for c in _top_level(expr))
+
+
+def _parse_index_offset(index: str) -> Tuple[bool, Optional[str]]:
+    """Parses "$i", "$i + offset" or "offset + $i". Returns whether that worked and the offset expression"""
+    if index == "$i":
+        return True, None
+
+    if index.startswith("$i") and index[2:].lstrip().startswith("+"):
+        offset = index[2:].lstrip()[1:].strip()
+    elif index.endswith("$i") and index[:-2].rstrip().endswith("+"):
+        offset = index[:-2].rstrip()[:-1].strip()
+    else:
+        return False, None
+
+    if len(offset) <= 0 or INDEX_VAR_REGEX.search(offset) is not None:
+        return False, None
+    if any(c in LOW_PRECEDENCE_CHARS for c in _top_level(offset)):
+        # Something like "$i + a == b"
+        return False, None
+    return True, offset
+
+
+class IndexPattern:
+    """
+    A ValueNode of the form `base[$i]`, `base[$i + offset]` or `base[($i + offset) % modulus]`. The elements of such a
+    node are stored in one contiguous block of memory (or two for ring buffers) so they can be read in bulk.
+    """
+
+    __slots__ = ("base", "offset", "modulus")
+
+    def __init__(self, base: str, offset: Optional[str], modulus: Optional[str]) -> None:
+        super().__init__()
+        self.base = intern_string(base)
+        self.offset = intern_string(offset)
+        self.modulus = intern_string(modulus)
+
+    def __repr__(self) -> str:
+        return "<{}: {!r}[($i + {!r}) % {!r}]>".format(self.__class__.__name__, self.base, self.offset, self.modulus)
+
+
+def parse_index_pattern(value_node: str) -> Optional[IndexPattern]:
+    expr = value_node.strip()
+    if not expr.endswith("]"):
+        return None
+
+    # Find the bracket which opens the final subscript
+    depth = 0
+    open_pos = -1
+    for pos in range(len(expr) - 1, -1, -1):
+        if expr[pos] in ")]":
+            depth += 1
+        elif expr[pos] in "([":
+            depth -= 1
+            if depth == 0:
+                open_pos = pos
+                break
+    if open_pos <= 0 or expr[open_pos] != "[":
+        return None
+
+    base = expr[:open_pos].strip()
+    index = expr[open_pos + 1:-1].strip()
+    if not _is_postfix_expression(base):
+        return None
+
+    modulus = None
+    if index.startswith("("):
+        close_pos = _find_closing_paren(index, 0)
+        rest = index[close_pos + 1:].lstrip()
+        if close_pos == -1 or not rest.startswith("%"):
+            return None
+        modulus = rest[1:].strip()
+        if not _is_postfix_expression(modulus):
+            return None
+        index = index[1:close_pos].strip()
+
+    valid, offset = _parse_index_offset(index)
+    if not valid:
+        return None
+    return IndexPattern(base, offset, modulus)
+
+
+MEMBER_PATH_REGEX = re.compile(r"(?:\bthis\s*->\s*)?([A-Za-z_]\w*(?:\s*\.\s*[A-Za-z_]\w*)*)")
+
+
+def _previous_char(expr: str, pos: int) -> str:
+    prefix = expr[:pos].rstrip()
+    return prefix[-2:] if prefix.endswith(("->", "::", "&&")) else prefix[-1:]
+
+
+def _find_member_paths(expression: str) -> Iterator[Tuple[str, bool]]:
+    """Yields the candidates for member accesses in an expression and whether their address is taken"""
+    for match in MEMBER_PATH_REGEX.finditer(expression):
+        previous = _previous_char(expression, match.start())
+        if previous in (".", "->", "::", "$") or (previous[-1:].isalnum() or previous[-1:] == "_"):
+            # A member of something else, a scoped name or a natvis variable
+            continue
+
+        following = expression[match.end():].lstrip()
+        if following.startswith(("(", "::")):
+            # A function call or a namespace
+            continue
+
+        yield "".join(match.group(1).split()), previous == "&"
+
+
+def member_paths(expression: str) -> List[str]:
+    """
+    Finds the candidates for member accesses of the visualized object in an expression, e.g. "m_first" and "m_pair.first"
+    in "m_pair.first + this->m_first". Identifiers which are not members (e.g. type names) are returned as well, the
+    caller has to check them against the actual type. Members whose address is taken are not returned.
+    :return: The member paths without an explicit "this->" and without whitespace
+    """
+    return [path for path, address_taken in _find_member_paths(expression) if not address_taken]
+
+
+def address_taken_member_paths(expression: str) -> List[str]:
+    """The member paths of an expression whose address is taken, e.g. "m_first" in "&m_first" """
+    return [path for path, address_taken in _find_member_paths(expression) if address_taken]
 
 
 class ExpandIndexListItems(ExpandElement):
+    __slots__ = ("condition", "value_node", "size_expr", "index_pattern")
 
     def __init__(self, condition: str, size_expr: str, value_node: str) -> None:
         super().__init__()
-        self.condition = condition
-        self.value_node = value_node
-        self.size_expr = size_expr
+        self.condition = intern_string(condition)
+        self.value_node = intern_string(value_node)
+        self.size_expr = intern_string(size_expr)
+        # Set if the elements can be read directly from memory instead of evaluating the value node for every index
+        self.index_pattern = parse_index_pattern(value_node)
 
 
 class ExpandExpandedItem(ExpandElement):
+    __slots__ = ("expression", "condition")
 
     def __init__(self, condition: str, expression: str):
         super().__init__()
-        self.expression = expression
-        self.condition = condition
+        self.expression = intern_string(expression)
+        self.condition = intern_string(condition)
 
 
 class ExpandSynthetic(ExpandElement):
+    __slots__ = ("type",)
 
     def __init__(self, type: 'NatvisType') -> None:
         super().__init__()
@@ -195,6 +390,8 @@ class ExpandSynthetic(ExpandElement):
 
 
 class NatvisType:
+    __slots__ = ("template_type", "display_parsers", "expand_items", "_member_paths")
+
     expand_items: List[ExpandElement]
 
     def __init__(self, element: Element) -> None:
@@ -205,6 +402,7 @@ class NatvisType:
 
         self.display_parsers = []
         self.expand_items = None
+        self._member_paths = None
 
         for child in element:
             if child.tag == "DisplayString":
@@ -268,6 +466,25 @@ class NatvisType:
             template_args = []
         return self.template_type.matches(typename, template_args)
 
+    def member_paths(self) -> List[str]:
+        """
+        The candidates for member accesses in all expressions of this type. See member_paths().
+        """
+        if self._member_paths is None:
+            expressions = [expression for expression, _ in self.enumerate_expressions()]
+            expressions.extend(code.array_length for parser in self.display_parsers
+                               for code in parser.parser.code_parts if code.array_length is not None)
+
+            paths = {}
+            address_taken = set()
+            for expression in expressions:
+                paths.update((path, None) for path in member_paths(expression))
+                address_taken.update(address_taken_member_paths(expression))
+            # The evaluator looks up sub-expressions by their text, so a member whose address is taken anywhere must not
+            # be replaced by a value read into a buffer
+            self._member_paths = [path for path in paths if path not in address_taken]
+        return self._member_paths
+
     def enumerate_expressions(self) -> Iterator[Tuple[str, bool]]:
         for parser in self.display_parsers:
             if parser.condition is not None:
@@ -309,7 +526,7 @@ def remove_namespace(doc, namespace):
     """Remove namespace in the passed document in place."""
     ns = u'{%s}' % namespace
     nsl = len(ns)
-    for elem in doc.getiterator():
+    for elem in doc.iter():
         if elem.tag.startswith(ns):
             elem.tag = elem.tag[nsl:]
 
@@ -333,14 +550,30 @@ class NatvisDocument:
         logger.log_message("Parsing natvis document '" + path + "'")
         return NatvisDocument(ElementTree.parse(path))
 
+    @classmethod
+    def parse_content(cls, path: str, content: bytes):
+        logger.log_message("Parsing natvis document '" + path + "'")
+        return NatvisDocument(ElementTree.ElementTree(ElementTree.fromstring(content)))
 
-def _find_natvis(filename: str) -> Iterator[str]:
+
+def _find_natvis(filename: str, searched_directories: Set[str]) -> Iterator[str]:
     dir = filename
     if not os.path.isdir(dir):
         dir = os.path.dirname(dir)
 
     while os.path.dirname(dir) != dir:  # Search until we find the root dir
-        for child in os.listdir(dir):
+        if dir in searched_directories:
+            # The parent directories were searched at the same time
+            break
+        searched_directories.add(dir)
+
+        try:
+            children = os.listdir(dir)
+        except OSError:
+            # The source file may not exist on this machine
+            children = []
+
+        for child in children:
             path = os.path.join(dir, child)
 
             if not os.path.isfile(path):
@@ -353,6 +586,8 @@ def _find_natvis(filename: str) -> Iterator[str]:
 
 
 class NatvisTypeInstance:
+    __slots__ = ("template_args", "type")
+
     VAR_REGEX = re.compile("\$([\d\w])+")
 
     def __init__(self, type: NatvisType, template_args: List[str]) -> None:
@@ -379,38 +614,118 @@ class NatvisTypeInstance:
         return NatvisTypeInstance(type, args)
 
 
+class LoadedFile:
+    """A natvis file known to the manager together with the information needed to detect changes of the file"""
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+
+        self.path = path
+        self.mtime = None
+        self.size = None
+        self.digest = None
+        self.types = []
+
+    def is_modified(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            # Keep the types of deleted files
+            return False
+        return (stat.st_mtime_ns, stat.st_size) != (self.mtime, self.size)
+
+    def read(self) -> bytes:
+        """Reads the contents of the file and updates the change detection information"""
+        stat = os.stat(self.path)
+        with open(self.path, "rb") as f:
+            content = f.read()
+
+        self.mtime = stat.st_mtime_ns
+        self.size = stat.st_size
+        return content
+
+
 class NatvisManager:
     loaded_types: List[NatvisType]
+    loaded_files: Dict[str, LoadedFile]
 
     def __init__(self) -> None:
         super().__init__()
 
         self.loaded_types = []
-        self.loaded_files = set()
+        self.loaded_files = {}
+        # Called with the list of replaced types whenever a file is reloaded so that caches can drop dependent entries
+        self.reload_listeners = []
+        # Source files and directories which were already searched for natvis files
+        self.discovered_files = set()
+        self.searched_directories = set()
 
     def load_natvis_file(self, path):
         if path in self.loaded_files:
             return  # Avoid loading the same file more than once
-        self.loaded_files.add(path)
+        loaded = LoadedFile(path)
+        self.loaded_files[path] = loaded
 
-        doc = NatvisDocument.parse_file(path)
+        content = loaded.read()
+        loaded.digest = hashlib.sha1(content).hexdigest()
+
+        doc = NatvisDocument.parse_content(path, content)
         if doc is None:
             return
 
+        loaded.types = doc.types
         for type in doc.types:
             self.loaded_types.append(type)
 
+    def reload_changed_files(self) -> List[str]:
+        """
+        Checks all loaded files for modifications and replaces the types of the changed files.
+        :return: The paths of the reloaded files
+        """
+        reloaded = []
+        for loaded in self.loaded_files.values():
+            if not loaded.is_modified():
+                continue
+
+            content = loaded.read()
+            digest = hashlib.sha1(content).hexdigest()
+            if digest == loaded.digest:
+                # Only the timestamp changed
+                continue
+            loaded.digest = digest
+
+            try:
+                doc = NatvisDocument.parse_content(loaded.path, content)
+            except ElementTree.ParseError as e:
+                # Probably saved while editing. Keep the old types until the file is valid again
+                logger.log_message("Failed to reload natvis document '{}': {}".format(loaded.path, e))
+                continue
+
+            old_types = loaded.types
+            loaded.types = doc.types
+            reloaded.append(loaded.path)
+
+            for listener in self.reload_listeners:
+                listener(old_types)
+
+        if len(reloaded) > 0:
+            # Keep the types in the order the files were loaded in
+            self.loaded_types = [type for loaded in self.loaded_files.values() for type in loaded.types]
+
+        return reloaded
+
     def lookup_types(self, typename: templates.TemplateType, filename: str = None) -> Iterator[NatvisTypeInstance]:
         for loaded in self.loaded_types:
             instance = NatvisTypeInstance.match_type(typename, loaded)
             if instance is not None:
                 yield instance
 
-        if filename is not None:
+        if filename is not None and not self.is_discovered(filename):
+            count = len(self.loaded_types)
             self._load_natvis_files(filename)
 
             # Try again with the new files
-            for loaded in self.loaded_types:
+            for loaded in self.loaded_types[count:]:
                 instance = NatvisTypeInstance.match_type(typename, loaded)
                 if instance is not None:
                     yield instance
@@ -418,6 +733,14 @@ class NatvisManager:
     def lookup_type(self, typename: templates.TemplateType, filename: str = None) -> Optional[NatvisType]:
         return next(self.lookup_types(typename, filename), None)
 
+    def is_discovered(self, filename: str) -> bool:
+        """
+        Checks if the natvis files next to a source file were already loaded. The file name does not need to be passed
+        to lookup_types anymore in that case.
+        """
+        return filename in self.discovered_files
+
     def _load_natvis_files(self, filename):
-        for natvis in _find_natvis(filename):
+        self.discovered_files.add(filename)
+        for natvis in _find_natvis(filename, self.searched_directories):
             self.load_natvis_file(natvis)
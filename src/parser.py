@@ -1,11 +1,10 @@
 import re
-import sys
-import traceback
-from typing import Optional, Union
+from typing import Optional, Union, Dict, Any, Hashable
 
 import gdb
 
 import logger
+import scopes
 
 
 class ParserError(Exception):
@@ -14,6 +13,27 @@ class ParserError(Exception):
         super().__init__(*args, **kwargs)
 
 
+class EvaluationError(str):
+    """
+    The message of an error which occurred while evaluating an expression for a specific object, e.g. a memory error.
+    It is displayed like the value would be, but counts as a failed evaluation.
+    """
+
+
+WHITESPACE_AROUND_PUNCTUATION_REGEX = re.compile(r"\s*([^\w\s])\s*")
+EXPLICIT_THIS_REGEX = re.compile(r"\bthis->")
+QUALIFIER_REGEX = re.compile(r"\b(?:const|volatile)\b")
+
+
+def normalize_expression(expr: str) -> str:
+    """
+    Brings an expression into a canonical form so that equivalent expressions which only differ in whitespace or in
+    an explicit "this->" can share their evaluation result.
+    """
+    expr = WHITESPACE_AROUND_PUNCTUATION_REGEX.sub(r"\1", expr.strip())
+    return EXPLICIT_THIS_REGEX.sub("", " ".join(expr.split()))
+
+
 try:
     from clang import cindex
     from clang.cindex import TranslationUnit, Cursor, CursorKind, Diagnostic, Config, SourceRange, TypeKind
@@ -44,18 +64,41 @@ try:
         return None
 
 
-    def convert_clang_to_gdb_type(t: cindex.Type) -> gdb.Type:
+    def convert_clang_to_gdb_type(t: cindex.Type, scope: Hashable = None,
+                                  original_names: Optional[Dict[str, str]] = None) -> gdb.Type:
+        """
+        :param original_names: The names of the types in GDB by the names of their declarations for libclang (see
+                               TypeManager.get_original_names)
+        """
         if t.kind == TypeKind.POINTER:
-            return convert_clang_to_gdb_type(t.get_pointee()).pointer()
+            return convert_clang_to_gdb_type(t.get_pointee(), scope, original_names).pointer()
+        if t.kind == TypeKind.LVALUEREFERENCE:
+            return convert_clang_to_gdb_type(t.get_pointee(), scope, original_names).reference()
         if t.kind == TypeKind.CHAR_S:
-            return gdb.lookup_type("char")
+            name = "char"
         else:
-            raise ParserError("Unhandled pointer type!", t.kind, t.spelling)
+            # Primitive types and the types of the visualized object, e.g. the template argument inserted for $T. Record
+            # types are declared under generated names in the translation unit
+            name = " ".join(QUALIFIER_REGEX.sub("", t.spelling).split())
+            if original_names is not None:
+                name = original_names.get(name, name)
+        try:
+            gdb_t = scopes.lookup_type(name, scope)
+        except gdb.error:
+            raise ParserError("Unhandled type!", t.kind, t.spelling)
+
+        if t.is_const_qualified():
+            gdb_t = gdb_t.const()
+        return gdb_t
 
 
     class ClangExpressionEvaluator:
-        def __init__(self, this_val: gdb.Value, content: str):
+        def __init__(self, this_val: gdb.Value, content: str, memo: Optional[Dict[str, Any]] = None,
+                     original_names: Optional[Dict[str, str]] = None):
             self.content = content
+            self.original_names = original_names
+            # Values of already evaluated sub-expressions, keyed by their normalized text
+            self.memo = memo
 
             if this_val.type.code != gdb.TYPE_CODE_PTR:
                 # this must always be a pointer
@@ -63,6 +106,9 @@ try:
             else:
                 self.this_val = this_val
 
+            # Types named in the expression are resolved in the objfile of the visualized value
+            self.scope = scopes.type_scope(self.this_val.type.target())
+
         def get_binary_op(self, binary_cursor: Cursor):
             # libclang does not expose the binary operation in the C API. There is a patch for that
             # (https://reviews.llvm.org/D10833?id=39158) but that has been stuck in "code review" for three years...
@@ -92,6 +138,18 @@ try:
             return self.content[ext.start.offset:ext.end.offset]
 
         def get_value(self, expr_cursor: Cursor) -> Optional[Union[gdb.Value, bool, str, int, float]]:
+            if self.memo is None:
+                return self._evaluate(expr_cursor)
+
+            key = normalize_expression(self.get_cursor_text(expr_cursor))
+            if key in self.memo:
+                return self.memo[key]
+
+            value = self._evaluate(expr_cursor)
+            self.memo[key] = value
+            return value
+
+        def _evaluate(self, expr_cursor: Cursor) -> Optional[Union[gdb.Value, bool, str, int, float]]:
             if expr_cursor.kind == CursorKind.UNEXPOSED_EXPR:
                 # Unexposed expression found, let's hope it's not something serious...
                 children = list(expr_cursor.get_children())
@@ -187,7 +245,7 @@ try:
                 base_val = self.get_value(base)
                 index_val = self.get_value(index)
 
-                ptr_val = base_val.cast(gdb.lookup_type("intptr_t"))
+                ptr_val = base_val.cast(scopes.lookup_type("intptr_t", self.scope))
 
                 base_size = base_val.type.target().sizeof
 
@@ -196,7 +254,8 @@ try:
 
                 return result_val
             elif expr_cursor.kind == CursorKind.CSTYLE_CAST_EXPR:
-                gdb_t = convert_clang_to_gdb_type(expr_cursor.type.get_canonical())
+                gdb_t = convert_clang_to_gdb_type(expr_cursor.type.get_canonical(), self.scope,
+                                                  self.original_names)
                 target_val_expr = next(expr_cursor.get_children())
                 target_val = self.get_value(target_val_expr)
                 return target_val.cast(gdb_t)
@@ -219,8 +278,17 @@ void _GdbNatvisTestFunc() {{
         return template.format(type_name=c_type_name, base=c_type, expr=expr)
 
 
+    CLANG_AVAILABLE = True
+
+    # Creating an index is expensive, so every process keeps one
+    _INDEX = None
+
+
     def _prepare_clang(content: str) -> Optional[TranslationUnit]:
-        index = cindex.Index.create()
+        global _INDEX
+        if _INDEX is None:
+            _INDEX = cindex.Index.create()
+        index = _INDEX
         tu = index.parse("/tmp/file.cpp", unsaved_files=[("/tmp/file.cpp", content)])
 
         for diag in tu.diagnostics:
@@ -238,7 +306,9 @@ void _GdbNatvisTestFunc() {{
             return False
 
 
-    def evaluate_expression(this_val: gdb.Value, c_type_name: str, c_type: str, expr: str):
+    def evaluate_expression(this_val: gdb.Value, c_type_name: str, c_type: str, expr: str,
+                            memo: Optional[Dict[str, Any]] = None, log_key: Hashable = None,
+                            original_names: Optional[Dict[str, str]] = None):
         try:
             content = _get_content(c_type_name, c_type, expr)
             tu = _prepare_clang(content)
@@ -253,20 +323,23 @@ void _GdbNatvisTestFunc() {{
             if statement is None:
                 return None
 
-            return ClangExpressionEvaluator(this_val, content).get_value(next(statement.get_children()))
+            evaluator = ClangExpressionEvaluator(this_val, content, memo, original_names)
+            return evaluator.get_value(next(statement.get_children()))
         except gdb.MemoryError as e:
-            return str(e)
+            return EvaluationError(e)
         except ParserError as e:
-            logger.log_message(
-                "Failed to evaluate '{}': {}".format(expr, "".join(traceback.format_exception_only(type(e), e))))
+            # Failures are identified by the log key or else by the C++ type and the expression
+            logger.log_failure(log_key or (c_type_name, expr), logger.WARNING, "Failed to evaluate '{}': {}", expr,
+                               e)
             raise
-        except Exception as e:
-            exc_type, exc_value, exc_tb = sys.exc_info()
-            logger.log_message(
-                "Failed to evaluate '{}': {}".format(expr, "".join(traceback.format_exception(type(e), e, exc_tb))))
+        except Exception:
+            logger.log_failure(log_key or (c_type_name, expr), logger.ERROR, "Failed to evaluate '{}':", expr,
+                               exc_info=True)
             return None
 
 except ImportError:
+    CLANG_AVAILABLE = False
+
     SPLIT_REGEX = re.compile("\.|->")
 
 
@@ -275,13 +348,15 @@ except ImportError:
         return True
 
 
-    def evaluate_expression(this_val: gdb.Value, c_type_name: str, c_type: str, expr: str):
+    def evaluate_expression(this_val: gdb.Value, c_type_name: str, c_type: str, expr: str,
+                            memo: Optional[Dict[str, Any]] = None, log_key: Hashable = None,
+                            original_names: Optional[Dict[str, str]] = None):
         try:
             current_val = this_val
             for ident in SPLIT_REGEX.split(expr):
                 current_val = current_val[ident]
             return current_val
-        except:
+        except Exception as e:
             # If the expression was too complicated for this parser it will likely result in an exception
-            # TODO: Add actual logging for errors
+            logger.log_failure(log_key or (c_type_name, expr), logger.DEBUG, "Failed to evaluate '{}': {}", expr, e)
             return None
@@ -1,17 +1,32 @@
+import collections
+import itertools
 import os
+import re
 import sys
-import traceback
-from typing import Tuple, Iterable, Iterator, Optional, Union, Any
+import time
+from typing import Tuple, Iterable, Iterator, Optional, Union, Any, List, Callable, Dict
 
 import gdb
 import gdb.printing as gdb_printing
 from gdb.printing import PrettyPrinter
 
+import dump
+import formatting
 import logger
+import memory
+import native
 import natvis
 import parser
-from templates import TemplateType
+import scopes
+import settings
+import validation
+import warmup
+from breaker import CircuitBreaker
+from cache import LRUCache
+from templates import TemplateType, try_parse_template_type
 from type_mapping import TypeManager
+from settings import SETTINGS
+from snapshot import SnapshotPlan
 from utils import get_type_name_or_tag, get_basic_type, is_pointer
 
 DEBUGGING = False
@@ -50,13 +65,70 @@ class GdbValueWrapper(object):
         return getattr(self._wrapped_obj, attr)
 
 
+class RenderContext:
+    """
+    State shared by all nested printers of one top level print. This keeps track of the nesting depth and the objects
+    which are currently being rendered so that self-referential structures do not cause infinite recursion.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.depth = 0
+        self.active = set()
+        # Display strings which were already rendered during this print
+        self.rendered = {}
+        self.start_time = time.monotonic()
+
+    def elapsed_ms(self) -> int:
+        return int((time.monotonic() - self.start_time) * 1000)
+
+    def out_of_time(self) -> bool:
+        return SETTINGS.time_limit is not None and self.elapsed_ms() >= SETTINGS.time_limit
+
+    def enter(self, key) -> bool:
+        if SETTINGS.max_depth is not None and self.depth >= SETTINGS.max_depth:
+            return False
+        if self.depth > 0 and self.out_of_time():
+            # The top level value is always entered, so its children end with the truncation marker
+            return False
+        if key is not None and key in self.active:
+            # This object is already being rendered further up
+            return False
+
+        self.depth += 1
+        if key is not None:
+            self.active.add(key)
+        return True
+
+    def leave(self, key) -> None:
+        self.depth -= 1
+        self.active.discard(key)
+
+
+# The context of the display string which is currently being rendered
+_RENDER_CONTEXT: Optional[RenderContext] = None
+
+
 class NatvisPrinter:
-    def __init__(self, parent: 'NatvisPrettyPrinter', instance: natvis.NatvisTypeInstance, val: gdb.Value):
+    def __init__(self, parent: 'NatvisPrettyPrinter', instance: natvis.NatvisTypeInstance, val: gdb.Value,
+                 type_name: str = None):
         self.instance = instance
         self.parent = parent
         self.val = val
         self.type = self.instance.type
-        self.c_type_name, self.c_type = self.parent.type_manager.get_type_string(self.val.type)
+        type_manager = self.parent.get_type_manager(self.val.type)
+        self.c_type_name, self.c_type = type_manager.get_type_string(self.val.type)
+        self.original_type_names = type_manager.get_original_names(self.val.type)
+
+        address = self.val.address
+        # Identifies the visualized object. The type is required since a member may have the same address as its parent
+        self.render_key = None if address is None else (int(address), get_type_name_or_tag(self.val.type))
+        # The concrete type for which runtime failures of the visualizer are counted
+        self.type_name = type_name or get_type_name_or_tag(self.val.type)
+        self._child_ranges = None
+        self._memo = None
+        self._memo_generation = None
 
     def check_condition(self, cond: str) -> bool:
         if cond is None:
@@ -64,9 +136,65 @@ class NatvisPrinter:
 
         return self._get_value(cond, bool)
 
+    def _get_memo(self) -> Dict[str, Any]:
+        # Evaluated (sub-)expressions are only valid as long as the inferior state does not change
+        if self._memo_generation != INFERIOR_STATE.generation:
+            # The scalar members used by the expressions are read at once and reused by the evaluator
+            plan = self.parent.get_snapshot_plan(self.type, self.val.type, self.type_name)
+            self._memo = plan.read(self.val)
+            self._memo_generation = INFERIOR_STATE.generation
+        return self._memo
+
+    def _get_lvalue(self, expression: str) -> Any:
+        """
+        Like _get_value, but members read by the snapshot are returned as values located in the object. Front ends can
+        then assign to them and take their address.
+        """
+        value = self._get_value(expression)
+        if isinstance(value, gdb.Value) and value.address is None:
+            plan = self.parent.get_snapshot_plan(self.type, self.val.type, self.type_name)
+            member = plan.member_lvalue(self.val, parser.normalize_expression(self.instance.replace_vars(expression)))
+            if member is not None:
+                return member
+        return value
+
     def _get_value(self, expression, convert_func=None, **kwargs: str):
         replaced = self.instance.replace_vars(expression, **kwargs)
-        val = parser.evaluate_expression(self.val, self.c_type_name, self.c_type, replaced)
+
+        memo = self._get_memo()
+        key = parser.normalize_expression(replaced)
+        if key in memo:
+            val = memo[key]
+        else:
+            shared_memo = memo
+            if len(kwargs) > 0:
+                # Every value of $i is evaluated once, keeping the results would hold a value per element of the
+                # container. Sub-expressions can still use the memo but their results are dropped afterwards
+                memo = collections.ChainMap({}, shared_memo)
+            try:
+                val = native.NOT_EVALUATED
+                if native.is_enabled():
+                    # $i is passed in a convenience variable, so all elements share one translation
+                    index = kwargs.get("i")
+                    val = native.evaluate(self.val,
+                                          self.instance.replace_vars(expression, i="$" + native.INDEX_VARIABLE),
+                                          None if index is None else int(index))
+                if val is native.NOT_EVALUATED:
+                    # Failures are logged per expression of the natvis file, not per value of $i
+                    val = parser.evaluate_expression(self.val, self.c_type_name, self.c_type, replaced, memo,
+                                                     (self.type.template_type, expression), self.original_type_names)
+            except parser.ParserError:
+                CIRCUIT_BREAKER.record_failure(self.type, self.type_name)
+                raise
+            if memo is shared_memo:
+                memo[key] = val
+
+            if val is None or isinstance(val, parser.EvaluationError):
+                # Runtime errors count as well, e.g. a visualizer for another ABI which follows garbage pointers
+                CIRCUIT_BREAKER.record_failure(self.type, self.type_name)
+            else:
+                CIRCUIT_BREAKER.record_success(self.type, self.type_name)
+
         if val is not None:
             if convert_func is not None:
                 try:
@@ -85,96 +213,353 @@ class NatvisPrinter:
     def _get_natvis_type_display_string(self, t: natvis.NatvisType):
         for string in t.display_parsers:
             if self.check_condition(string.condition):
-                display_args = []
-                for code in string.parser.code_parts:
-                    code_val = self._get_value(code.base_expression)
-                    visualizer = gdb.default_visualizer(code_val)
-                    if visualizer is not None and isinstance(visualizer, NatvisPrinter):
-                        # If this is again a natvis visualizer we can enforce the usage of the DisplayString option
-                        display_args.append(visualizer.to_string())
-                    else:
-                        display_args.append(str(code_val))
-                return string.parser.template_string.format(*display_args)
+                if string.parser.renderer is None:
+                    string.parser.renderer = formatting.DisplayStringRenderer(string.parser, format_value)
+                return string.parser.renderer.render(self._get_value)
 
         return "No visualizer available"
 
     def to_string(self):
-        return self._get_natvis_type_display_string(self.type)
+        global _RENDER_CONTEXT
+        if _RENDER_CONTEXT is not None:
+            # Nested inside of the display string of another printer
+            return self._render_nested(_RENDER_CONTEXT)
 
-    def children(self):
-        yield "[display string]", gdb.Value(self.to_string()).cast(gdb.lookup_type("char").pointer())
+        _RENDER_CONTEXT = RenderContext()
+        try:
+            return self._render_nested(_RENDER_CONTEXT)
+        finally:
+            _RENDER_CONTEXT = None
+
+    def _render_nested(self, context: RenderContext) -> str:
+        if self.render_key in context.rendered:
+            return context.rendered[self.render_key]
 
+        if not context.enter(self.render_key):
+            return "..."
+        try:
+            result = self._get_natvis_type_display_string(self.type)
+        finally:
+            context.leave(self.render_key)
+
+        if self.render_key is not None:
+            context.rendered[self.render_key] = result
+        return result
+
+    def children(self):
+        if needs_display_string_child():
+            yield self._display_string_child()
+
+        yield from self.expanded_children()
+
+    def expanded_children(self):
+        """The children defined by the Expand node. Unlike children() this never contains the display string child."""
+        context = RenderContext()
+        count = 0
+        for child in self._expand_children(context):
+            if (SETTINGS.max_elements is not None and count >= SETTINGS.max_elements) or context.out_of_time():
+                # Probably a corrupted container. Show what we have so far instead of blocking the debugger
+                yield self._truncation_child(count, context)
+                return
+
+            yield child
+            count += 1
+
+    def num_children(self) -> int:
+        count = sum(child_range.count for child_range in self._get_child_ranges())
+        if SETTINGS.max_elements is not None and count > SETTINGS.max_elements:
+            # The remaining children are replaced by the truncation marker
+            count = SETTINGS.max_elements + 1
+
+        if needs_display_string_child():
+            count += 1
+        return count
+
+    def child(self, index: int):
+        if needs_display_string_child():
+            if index == 0:
+                return self._display_string_child()
+            index -= 1
+
+        if SETTINGS.max_elements is not None and index >= SETTINGS.max_elements:
+            return self._truncation_child(SETTINGS.max_elements, None)
+
+        for child_range in self._get_child_ranges():
+            if index < child_range.count:
+                return child_range.get_child(index)
+            index -= child_range.count
+
+        raise IndexError("Child index out of range")
+
+    def slice_children(self, start: int, stop: int, step: int = 1) -> Iterator[Tuple[str, Any]]:
+        """
+        Returns the children in [start, stop) of the Expand node. Only the requested children are computed, so this also
+        reaches children beyond max-elements and is not affected by the summary mode.
+        """
+        offset = 0
+        for child_range in self._expand_child_ranges(RenderContext()):
+            if offset >= stop:
+                return
+
+            end = offset + child_range.count
+            # The first index of the slice inside of this range
+            first = start if offset <= start else start + -(-(offset - start) // step) * step
+            for i in range(first, min(stop, end), step):
+                yield child_range.get_child(i - offset)
+            offset = end
+
+    def _display_string_child(self):
+        return "[display string]", gdb.Value(self.to_string()).cast(
+            scopes.lookup_type("char", scopes.type_scope(self.val.type)).pointer())
+
+    @staticmethod
+    def _truncation_child(count: int, context: Optional[RenderContext]):
+        if context is None:
+            return "[truncated after {} items]".format(count), "..."
+        return "[truncated after {} items / {} ms]".format(count, context.elapsed_ms()), "..."
+
+    def _get_child_ranges(self) -> List['ChildRange']:
+        # The ranges are kept while the inferior is stopped so random access to children does not need to reevaluate
+        # the conditions and sizes every time
+        if self._child_ranges is None or self._child_ranges[0] != INFERIOR_STATE.generation:
+            self._child_ranges = INFERIOR_STATE.generation, list(self._expand_shown_child_ranges(RenderContext()))
+        return self._child_ranges[1]
+
+    def _expand_children(self, context: RenderContext):
+        for child_range in self._expand_shown_child_ranges(context):
+            for i in range(child_range.count):
+                yield child_range.get_child(i)
+
+    def _expand_shown_child_ranges(self, context: RenderContext) -> Iterator['ChildRange']:
+        limit = summary_limit()
+        for child_range in self._expand_child_ranges(context):
+            yield child_range if limit is None else child_range.summarize(limit)
+
+    def _expand_child_ranges(self, context: RenderContext) -> Iterator['ChildRange']:
         if self.type.expand_items is None:
             return
 
-        for item in self.type.expand_items:
-            if isinstance(item, natvis.ExpandItem):
-                yield from self._expand_item_children(item)
-            elif isinstance(item, natvis.ExpandIndexListItems):
-                yield from self._expand_index_list_items(item)
-            elif isinstance(item, natvis.ExpandArrayItems):
-                yield from self._expand_array_items(item)
-            elif isinstance(item, natvis.ExpandExpandedItem):
-                yield from self._expand_expanded_item(item)
-            elif isinstance(item, natvis.ExpandSynthetic):
-                yield from self._expand_synthetic_item(item)
+        if not context.enter(self.render_key):
+            return
+        try:
+            for item in self.type.expand_items:
+                if isinstance(item, natvis.ExpandItem):
+                    yield from self._expand_item_children(item)
+                elif isinstance(item, natvis.ExpandIndexListItems):
+                    yield from self._expand_index_list_items(item)
+                elif isinstance(item, natvis.ExpandArrayItems):
+                    yield from self._expand_array_items(item)
+                elif isinstance(item, natvis.ExpandExpandedItem):
+                    yield from self._expand_expanded_item(item, context)
+                elif isinstance(item, natvis.ExpandSynthetic):
+                    yield from self._expand_synthetic_item(item)
+        finally:
+            context.leave(self.render_key)
 
     def _expand_synthetic_item(self, item: natvis.ExpandSynthetic):
-        yield str(item.type.template_type), self._get_natvis_type_display_string(item.type)
+        yield ChildRange.single(str(item.type.template_type), lambda: self._get_natvis_type_display_string(item.type))
 
-    def _expand_expanded_item(self, item: natvis.ExpandExpandedItem):
+    def _expand_expanded_item(self, item: natvis.ExpandExpandedItem, context: RenderContext):
         if self.check_condition(item.condition):
             item = self._get_value(item.expression)
             visualizer = gdb.default_visualizer(item)
             if visualizer is not None:
                 if isinstance(visualizer, NatvisPrinter):
-                    first = True
-                    for name, val in visualizer.children():
-                        if first:
-                            # Remove the display string child since that only exists for fixing the MI issues
-                            first = False
-                            continue
-                        yield name, val
+                    # This skips the display string child since that only exists for fixing the MI issues
+                    yield from visualizer._expand_child_ranges(context)
                 else:
                     try:
-                        yield from visualizer.children()
+                        limit = None if SETTINGS.max_elements is None else SETTINGS.max_elements + 1
+                        children = list(itertools.islice(visualizer.children(), limit))
                     except AttributeError:
                         # Make sure we don't break the iteration if the child visualizer does not have this function
-                        pass
+                        return
+                    yield ChildRange(len(children), children.__getitem__)
+
+    def _get_item_value(self, item: natvis.ExpandItem):
+        value = self._get_lvalue(item.expression.base_expression)
+
+        if item.expression.array_length is not None and isinstance(value, gdb.Value):
+            length = self._get_value(item.expression.array_length, int)
+            try:
+                # Let GDB display the elements as an array instead of the pointer
+                value = formatting.array_view(value, length)
+            except (gdb.error, ValueError, TypeError):
+                # Invalid length or not a pointer. Fall back to displaying the plain value
+                pass
+
+        return value
 
     def _expand_item_children(self, item: natvis.ExpandItem):
         if self.check_condition(item.condition):
-            value = self._get_value(item.expression.base_expression)
-            yield item.name, value
+            yield ChildRange.single(item.name, lambda: self._get_item_value(item))
+
+    def _get_size(self, size_expr: str) -> int:
+        size = self._get_value(size_expr, int)
+
+        if not isinstance(size, int) or size < 0:
+            # The size node has an invalid value or could not be evaluated
+            return 0
+        return size
+
+    def _get_index_pattern_reader(self, pattern: natvis.IndexPattern, size: int) -> Optional[Callable[[int], Any]]:
+        """Returns a function reading the elements of an index pattern directly from memory if that is possible"""
+        base = self._get_value(pattern.base)
+        if not isinstance(base, gdb.Value) or base.type.strip_typedefs().code not in (gdb.TYPE_CODE_PTR,
+                                                                                   gdb.TYPE_CODE_ARRAY):
+            # Probably an object with an overloaded subscript operator
+            return None
+
+        offset = 0 if pattern.offset is None else self._get_value(pattern.offset, int)
+        if not isinstance(offset, int):
+            return None
+
+        if pattern.modulus is None:
+            reader = memory.ArrayReader(memory.element_pointer(base) + offset, size)
+            return reader.__getitem__
+
+        modulus = self._get_value(pattern.modulus, int)
+        if not isinstance(modulus, int) or modulus <= 0 or offset < 0:
+            return None
+
+        # Ring buffer. In logical order the elements are at most two contiguous blocks of the physical array
+        reader = memory.ArrayReader(base, modulus)
+        return lambda i: reader[(i + offset) % modulus]
 
     def _expand_index_list_items(self, item: natvis.ExpandIndexListItems):
         if not self.check_condition(item.condition):
             return
 
-        size: int = self._get_value(item.size_expr, int)
+        size = self._get_size(item.size_expr)
 
-        if size is None:
-            # The size node has an invalid value
-            return
+        read_element = None
+        if item.index_pattern is not None and size > 0:
+            read_element = self._get_index_pattern_reader(item.index_pattern, size)
+
+        if read_element is not None:
+            def get_child(i: int):
+                return "[{}]".format(i), read_element(i)
+        else:
+            def get_child(i: int):
+                return "[{}]".format(i), self._get_value(item.value_node, i=str(i))
 
-        for i in range(size):
-            val = self._get_value(item.value_node, i=str(i))
-            yield "[{}]".format(i), val
+        yield ChildRange(size, get_child)
 
     def _expand_array_items(self, item: natvis.ExpandArrayItems):
-        if self.check_condition(item.condition):
+        if not self.check_condition(item.condition):
             return
 
-        size: int = self._get_value(item.size_expr, int)
+        size = self._get_size(item.size_expr)
+        if size <= 0:
+            return
 
-        if size is None:
-            # The size node has an invalid value
+        value_ptr = self._get_value(item.value_ptr_expr)
+        if not isinstance(value_ptr, gdb.Value):
+            # The evaluation failed
             return
 
-        current_val = self._get_value(item.value_ptr_expr)
-        for i in range(size):
-            yield "[{}]".format(i), current_val.dereference()
-            current_val = current_val + 1
+        reader = memory.ArrayReader(value_ptr, size)
+
+        def get_child(i: int):
+            return "[{}]".format(i), reader[i]
+
+        yield ChildRange(size, get_child)
+
+
+class ChildRange:
+    """
+    A sequence of children produced by one element of an Expand node. Every child can be computed directly from its
+    index so paging through a large container only evaluates the visible children.
+    """
+
+    def __init__(self, count: int, get_child: Callable[[int], Tuple[str, Any]]) -> None:
+        super().__init__()
+
+        self.count = count
+        self.get_child = get_child
+
+    @staticmethod
+    def single(name: str, get_value: Callable[[], Any]) -> 'ChildRange':
+        return ChildRange(1, lambda i: (name, get_value()))
+
+    def summarize(self, limit: int) -> 'ChildRange':
+        """
+        Shortens a range with more than limit children to its first and last children. The elided children are replaced
+        by one marker child which also shows the size of the range.
+        """
+        if self.count <= limit:
+            return self
+
+        head = (limit + 1) // 2
+        tail_start = self.count - (limit - head)
+        marker = "[...]", "{} of {} elements elided".format(tail_start - head, self.count)
+
+        def get_child(i: int):
+            if i < head:
+                return self.get_child(i)
+            if i == head:
+                return marker
+            return self.get_child(tail_start + i - head - 1)
+
+        return ChildRange(limit + 1, get_child)
+
+
+def summary_limit() -> Optional[int]:
+    """
+    The number of children shown per child range in the summary mode. This is GDB's "print elements" setting.
+    :return: The limit or None if all children are shown
+    """
+    if SETTINGS.large_container_mode != "summary":
+        return None
+
+    try:
+        limit = gdb.parameter("print elements")
+    except (gdb.error, RuntimeError):
+        return None
+
+    if limit is None or limit <= 0:
+        # Unlimited
+        return None
+    return limit
+
+
+class InferiorState:
+    """
+    Counts the changes of the inferior state. Values computed while the inferior was stopped are only valid as long as
+    the generation does not change.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.generation = 0
+
+    def invalidate(self, event=None) -> None:
+        self.generation += 1
+
+    def connect_events(self) -> None:
+        gdb.events.cont.connect(self.invalidate)
+        gdb.events.memory_changed.connect(self.invalidate)
+        gdb.events.register_changed.connect(self.invalidate)
+        gdb.events.inferior_call.connect(self.invalidate)
+
+
+INFERIOR_STATE = InferiorState()
+
+CIRCUIT_BREAKER = CircuitBreaker()
+
+
+def format_value(val) -> str:
+    """Default formatter for display string values which do not have a format specifier"""
+    if isinstance(val, gdb.Value):
+        visualizer = gdb.default_visualizer(val)
+        if visualizer is not None and isinstance(visualizer, NatvisPrinter):
+            # If this is again a natvis visualizer we can enforce the usage of the DisplayString option
+            return visualizer.to_string()
+        if formatting.is_string_value(val):
+            # Make sure that garbage pointers do not cause huge reads
+            return formatting.format_string_value(val)
+    return str(val)
 
 
 def template_arg_to_string(arg) -> str:
@@ -195,8 +580,11 @@ def get_template_args(type: gdb.Type) -> Iterable[TemplateType]:
         index += 1
 
 
-def gdb_to_template_type(type: gdb.Type):
-    type_name = template_arg_to_string(type)
+# Maps type names to their parsed TemplateType. Most names can be parsed without asking GDB for the template arguments
+TEMPLATE_TYPE_CACHES = scopes.scoped_caches(lambda: LRUCache(4096))
+
+
+def _query_template_type(type: gdb.Type, type_name: str) -> TemplateType:
     template_index = type_name.find("<")
     if template_index != -1:
         type_name = type_name[:template_index]
@@ -204,6 +592,23 @@ def gdb_to_template_type(type: gdb.Type):
     return TemplateType(type_name, list(get_template_args(type)))
 
 
+def gdb_to_template_type(type: gdb.Type) -> TemplateType:
+    type_name = template_arg_to_string(type)
+
+    cache = TEMPLATE_TYPE_CACHES.get(scopes.type_scope(type))
+    template_type = cache.get(type_name)
+    if template_type is not None:
+        return template_type
+
+    template_type = try_parse_template_type(type_name)
+    if template_type is None:
+        # The name is too complicated for our parser so we need to use the (slow) GDB API
+        template_type = _query_template_type(type, type_name)
+
+    cache[type_name] = template_type
+    return template_type
+
+
 def is_void_ptr(type: gdb.Type):
     if type.code != gdb.TYPE_CODE_PTR:
         return False
@@ -227,23 +632,57 @@ def strip_references(val: gdb.Value) -> Tuple[Optional[gdb.Value], Optional[gdb.
     return val, val.type.unqualified()
 
 
-def find_valid_type(type_manager: TypeManager, iter: Iterator[natvis.NatvisTypeInstance], value: gdb.Value):
-    c_type_name, c_type = None, None
+def strip_reference_types(t: gdb.Type) -> Optional[gdb.Type]:
+    """
+    Type equivalent of is_natvis_taget and strip_references for values which are not available yet
+    :return: The type a visualizer would be looked up for or None if the type is not handled
+    """
+    stripped = t.strip_typedefs()
+    if is_pointer(stripped) and is_pointer(stripped.target().strip_typedefs()):
+        return None
+
+    while t.code == gdb.TYPE_CODE_REF or t.code == gdb.TYPE_CODE_RVALUE_REF or t.code == gdb.TYPE_CODE_PTR:
+        if is_void_ptr(t):
+            return None
+        t = t.target()
+    return t.unqualified()
+
+
+def submit_candidates(type_manager: TypeManager, iter: Iterator[natvis.NatvisTypeInstance], t: gdb.Type,
+                      type_name: str = None) -> List[Tuple[natvis.NatvisTypeInstance, validation.CheckKey]]:
+    """
+    Starts checking the expressions of all matching visualizers which are not quarantined for the type.
+    :return: The visualizers in priority order and the keys of their checks
+    """
+    candidates = []
+    for instance in iter:
+        if type_name is not None and CIRCUIT_BREAKER.is_quarantined(instance.type, type_name):
+            # This visualizer kept failing for the type at runtime
+            continue
+        candidates.append(instance)
+
+    if len(candidates) == 0:
+        return []
+
+    c_type_name, c_type = type_manager.get_type_string(t)
 
-    for t in iter:
-        if c_type_name is None and c_type is None:
-            c_type_name, c_type = type_manager.get_type_string(value.type)
+    checks = []
+    for instance in candidates:
+        expressions = tuple(instance.replace_vars(expression, i="int()")
+                            for expression, required in instance.type.enumerate_expressions() if required)
+        key = (c_type_name, c_type, expressions)
+        checks.append((instance, key))
+        # Let the workers check all candidates at once, we only wait for them in priority order
+        validation.VALIDATOR.submit(*key)
 
-        valid = True
-        for expression, required in t.type.enumerate_expressions():
-            replaced = t.replace_vars(expression, i="int()")
+    return checks
 
-            if required and not parser.check_expression(c_type_name, c_type, replaced):
-                valid = False
-                break
 
-        if valid:
-            return t
+def find_valid_type(type_manager: TypeManager, iter: Iterator[natvis.NatvisTypeInstance], t: gdb.Type,
+                    type_name: str = None):
+    for instance, key in submit_candidates(type_manager, iter, t, type_name):
+        if validation.VALIDATOR.is_valid(*key):
+            return instance
 
     return None
 
@@ -265,13 +704,162 @@ def is_natvis_taget(val: gdb.Value) -> bool:
         return True
 
 
+# Matches "--interpreter", "-interpreter" and "-i", followed by "=mi..." or by the interpreter as the next argument
+MI_INTERPRETER_REGEX = re.compile(r"^--?(?:interpreter|i)(?:=|$)")
+
+# Cached result of the front end detection
+_FRONTEND_NEEDS_DISPLAY_STRING_CHILD: Optional[bool] = None
+
+
+def _command_line() -> List[str]:
+    try:
+        with open("/proc/self/cmdline", "rb") as f:
+            return [x.decode(errors="replace") for x in f.read().split(b"\0")]
+    except OSError:
+        return sys.argv
+
+
+def _is_mi_session(args: Optional[List[str]] = None) -> bool:
+    """
+    Checks if GDB was started with an MI interpreter. Only the command line is considered, so a front end which attaches
+    an MI interpreter later with "new-ui mi" is not detected. It has to use "set natvis display-string-child on".
+    :param args: The command line of GDB. Defaults to the one of the current process
+    """
+    if args is None:
+        args = _command_line()
+
+    for i, arg in enumerate(args):
+        if MI_INTERPRETER_REGEX.match(arg) is None:
+            continue
+        # Supports both "--interpreter=mi2" and "--interpreter mi2"
+        interpreter = arg.split("=", 1)[1] if "=" in arg else (args[i + 1] if i + 1 < len(args) else "")
+        if interpreter.startswith("mi"):
+            return True
+    return False
+
+
+def needs_display_string_child() -> bool:
+    """
+    Determines if the display string must be added as a child since the front end does not show the to_string value of
+    printers which have children (GDB bug 11335, not fixed in any released version).
+    """
+    if SETTINGS.display_string_child is not None:
+        return SETTINGS.display_string_child
+
+    global _FRONTEND_NEEDS_DISPLAY_STRING_CHILD
+    if _FRONTEND_NEEDS_DISPLAY_STRING_CHILD is None:
+        _FRONTEND_NEEDS_DISPLAY_STRING_CHILD = _is_mi_session()
+    return _FRONTEND_NEEDS_DISPLAY_STRING_CHILD
+
+
 NATVIS_MANAGER = natvis.NatvisManager()
 
 
 class NatvisPrettyPrinter(PrettyPrinter):
     def __init__(self, name, subprinters=None):
         super().__init__(name, subprinters)
-        self.type_manager = TypeManager()
+        # The generated declarations are only valid for the objfile the type was loaded from
+        self.type_managers = scopes.scoped_caches(TypeManager)
+
+        # Maps type names to the file name of their symbol table. None is stored if there is no symbol or if the natvis
+        # files of the source file were already discovered
+        self.symtab_filenames = scopes.scoped_caches(lambda: LRUCache(4096))
+
+        # Snapshot plans per (natvis type, concrete type name)
+        self.snapshot_plans = scopes.scoped_caches(lambda: LRUCache(1024))
+
+    def get_type_manager(self, t: gdb.Type) -> TypeManager:
+        return self.type_managers.get(scopes.type_scope(t))
+
+    def get_snapshot_plan(self, natvis_type: natvis.NatvisType, t: gdb.Type, type_name: str) -> SnapshotPlan:
+        plans = self.snapshot_plans.get(scopes.type_scope(t))
+        plan = plans.get((natvis_type, type_name))
+        if plan is None:
+            plan = SnapshotPlan(t, natvis_type.member_paths())
+            plans[(natvis_type, type_name)] = plan
+        return plan
+
+    def _get_discovery_filename(self, t: gdb.Type) -> Optional[str]:
+        """
+        Determines the source file which is used for finding natvis files next to the declaration of a type.
+        :return: The file name or None if no discovery is necessary for this type
+        """
+        filenames = self.symtab_filenames.get(scopes.type_scope(t))
+        name = get_type_name_or_tag(t)
+
+        if name in filenames:
+            filename = filenames.get(name)
+        else:
+            symbol = gdb.lookup_symbol(name)
+
+            if symbol is None or symbol[0] is None or symbol[0].symtab is None:
+                # Hmm, basic type has no symbol table entry. Hopefully the type manager already loaded the right
+                # document for this
+                filename = None
+            else:
+                filename = symbol[0].symtab.filename
+            filenames[name] = filename
+
+        if filename is not None and NATVIS_MANAGER.is_discovered(filename):
+            # The natvis files of this source file are already loaded
+            filenames[name] = None
+            return None
+
+        return filename
+
+    def get_visualized_type(self, t: gdb.Type) -> Optional[gdb.Type]:
+        """
+        Determines the type visualizers are looked up for.
+        :param t: The type of a value without references
+        :return: The basic type or None if this printer does not handle the type
+        """
+        t = t.strip_typedefs()
+        if not t:
+            return None
+
+        t = get_basic_type(t)
+
+        if get_type_name_or_tag(t) is None:
+            # We can't handle unnamed types
+            return None
+
+        if t.code != gdb.TYPE_CODE_UNION and t.code != gdb.TYPE_CODE_STRUCT:
+            # Non-structs are not handled by this printer
+            return None
+
+        return t
+
+    def find_natvis_type(self, t: gdb.Type) -> Optional[natvis.NatvisTypeInstance]:
+        template_type = gdb_to_template_type(t)
+
+        filename = self._get_discovery_filename(t)
+
+        type_name = get_type_name_or_tag(t)
+        type_manager = self.get_type_manager(t)
+        natvis_type = find_valid_type(type_manager, NATVIS_MANAGER.lookup_types(template_type), t, type_name)
+        if natvis_type is None and filename is not None:
+            # Only look for natvis files next to the sources if none of the loaded ones matched
+            natvis_type = find_valid_type(type_manager, NATVIS_MANAGER.lookup_types(template_type, filename), t,
+                                          type_name)
+        return natvis_type
+
+    def submit_type(self, t: gdb.Type) -> None:
+        """
+        Starts checking the loaded visualizers of a type in the background without waiting for the results.
+        :param t: A type returned by get_visualized_type
+        """
+        submit_candidates(self.get_type_manager(t), NATVIS_MANAGER.lookup_types(gdb_to_template_type(t)), t,
+                          get_type_name_or_tag(t))
+
+    def prepare_type(self, t: gdb.Type) -> None:
+        """
+        Does the work for printing values of a type which does not depend on the values: Selecting the visualizer and
+        planning which members are read.
+        :param t: A type returned by get_visualized_type
+        """
+        natvis_type = self.find_natvis_type(t)
+        if natvis_type is not None:
+            self.get_snapshot_plan(natvis_type.type, t, get_type_name_or_tag(t))
 
     def __call__(self, val: gdb.Value):
         val = GdbValueWrapper(val) if DEBUGGING else val
@@ -285,42 +873,19 @@ class NatvisPrettyPrinter(PrettyPrinter):
                 # Probably a void ptr
                 return None
 
-            val_type = val_type.strip_typedefs()
-            if not val_type:
+            val_type = self.get_visualized_type(val_type)
+            if val_type is None:
                 return None
 
-            val_type: gdb.Type = get_basic_type(val_type)
-
-            if get_type_name_or_tag(val_type) is None:
-                # We can't handle unnamed types
-                return None
-
-            if val_type.code != gdb.TYPE_CODE_UNION and val_type.code != gdb.TYPE_CODE_STRUCT:
-                # Non-structs are not handled by this printer
-                return None
-
-            template_type = gdb_to_template_type(val_type)
-
-            symbol = gdb.lookup_symbol(get_type_name_or_tag(val_type))
-
-            if symbol is None or symbol[0] is None:
-                # Hmm, basic type has no symbol table entry. Hopefully the type manager already loaded the right
-                # document for this
-                filename = None
-            else:
-                symbtab = symbol[0].symtab
-
-                filename = symbtab.filename
-
-            natvis_type = find_valid_type(self.type_manager, NATVIS_MANAGER.lookup_types(template_type, filename), val)
-
+            natvis_type = self.find_natvis_type(val_type)
             if natvis_type is None:
                 return None
 
-            return NatvisPrinter(self, natvis_type, val)
-        except Exception as e:
-            exc_type, exc_value, exc_tb = sys.exc_info()
-            logger.log_message("".join(traceback.format_exception(type(e), e, exc_tb)))
+            type_name = get_type_name_or_tag(val_type)
+            return NatvisPrinter(self, natvis_type, val, type_name)
+        except Exception:
+            logger.log_failure(("printer", str(val.type)), logger.ERROR, "Failed to find a visualizer for '{}':",
+                               val.type, exc_info=True)
             return None
 
 
@@ -347,6 +912,115 @@ class AddNatvis(gdb.Command):
         return gdb.COMPLETE_FILENAME
 
 
+class ReloadNatvis(gdb.Command):
+
+    def __init__(self):
+        super().__init__("natvis-reload", gdb.COMMAND_USER)
+
+    def invoke(self, argument: str, from_tty: bool) -> None:
+        reloaded = NATVIS_MANAGER.reload_changed_files()
+
+        if len(reloaded) <= 0:
+            print("No natvis files changed")
+        for path in reloaded:
+            print("Reloaded " + path)
+
+    def dont_repeat(self) -> bool:
+        return True
+
+
+class NatvisStats(gdb.Command):
+    """
+    Shows statistics of the natvis printers.
+
+    Usage: natvis-stats [reset]
+
+    "reset" releases all quarantined visualizers so they are tried again.
+    """
+
+    def __init__(self):
+        super().__init__("natvis-stats", gdb.COMMAND_USER)
+
+    def invoke(self, argument: str, from_tty: bool) -> None:
+        args = gdb.string_to_argv(argument)
+
+        if args == ["reset"]:
+            CIRCUIT_BREAKER.clear()
+            logger.reset_failures()
+            print("Released all quarantined visualizers")
+            return
+        if len(args) > 0:
+            raise gdb.GdbError("Usage: natvis-stats [reset]")
+
+        print("Loaded {} natvis types from {} files".format(len(NATVIS_MANAGER.loaded_types),
+                                                            len(NATVIS_MANAGER.loaded_files)))
+
+        quarantined = CIRCUIT_BREAKER.quarantined()
+        if len(quarantined) <= 0:
+            print("No quarantined visualizers")
+            return
+
+        print("Quarantined visualizers:")
+        for natvis_type, type_name, count in quarantined:
+            print("  {} for {}: {} failed evaluations".format(natvis_type.template_type, type_name, count))
+
+    def dont_repeat(self) -> bool:
+        return True
+
+
+class NatvisSlice(gdb.Command):
+    """
+    Prints a range of the children of a value shown by a natvis visualizer. The children before START are not evaluated,
+    so this is fast even for elements far into huge containers.
+
+    Usage: natvis-slice EXPR START END [STEP]
+
+    EXPR has to be quoted if it contains spaces. The children with the indices START to END - 1 are printed. The indices
+    count all children of the Expand node, including Items in front of the elements.
+    """
+
+    USAGE = "Usage: natvis-slice EXPR START END [STEP]"
+
+    def __init__(self):
+        super().__init__("natvis-slice", gdb.COMMAND_DATA)
+
+    def invoke(self, argument: str, from_tty: bool) -> None:
+        args = gdb.string_to_argv(argument)
+        if len(args) not in (3, 4):
+            raise gdb.GdbError(self.USAGE)
+
+        try:
+            start, stop, step = int(args[1], 0), int(args[2], 0), int(args[3], 0) if len(args) == 4 else 1
+        except ValueError:
+            raise gdb.GdbError(self.USAGE)
+        if start < 0 or stop < start or step <= 0:
+            raise gdb.GdbError("START and END must not be negative, END must not be less than START and STEP must be "
+                               "positive")
+
+        val = gdb.parse_and_eval(args[0])
+        visualizer = gdb.default_visualizer(val)
+        if not isinstance(visualizer, NatvisPrinter):
+            raise gdb.GdbError("'{}' is not shown by a natvis visualizer".format(args[0]))
+
+        for name, child in visualizer.slice_children(start, stop, step):
+            print("{} = {}".format(name, format_value(child)))
+
+    def dont_repeat(self) -> bool:
+        return True
+
+
+def _reload_on_stop(event) -> None:
+    if SETTINGS.auto_reload:
+        NATVIS_MANAGER.reload_changed_files()
+
+
+def _forget_failures(old_types: List[natvis.NatvisType]) -> None:
+    # The expressions of reloaded types may work now, so their failures should be reported again
+    template_types = {t.template_type for t in old_types}
+    logger.reset_failures(lambda key: key[0] in template_types)
+    CIRCUIT_BREAKER.release(old_types)
+
+
 def add_natvis_printers():
     if os.environ.get("GDB_NATVIS_DEBUG") is not None:
         import pydevd as pydevd
@@ -356,4 +1030,16 @@ def add_natvis_printers():
         DEBUGGING = True
 
     AddNatvis()
-    gdb_printing.register_pretty_printer(None, NatvisPrettyPrinter("Natvis"))
+    ReloadNatvis()
+    NatvisStats()
+    NatvisSlice()
+    dump.DumpNatvis()
+    settings.register_parameters()
+    gdb.events.stop.connect(_reload_on_stop)
+    NATVIS_MANAGER.reload_listeners.append(_forget_failures)
+    INFERIOR_STATE.connect_events()
+    memory.connect_events()
+    scopes.connect_events()
+    pretty_printer = NatvisPrettyPrinter("Natvis")
+    warmup.WarmUp(pretty_printer).connect_events()
+    gdb_printing.register_pretty_printer(None, pretty_printer)
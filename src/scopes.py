@@ -0,0 +1,91 @@
+from typing import Any, Callable, Hashable, List, Optional
+
+import gdb
+
+from cache import LRUCache, ScopedCaches
+
+# All caches which need to be invalidated when GDB unloads objfiles
+_SCOPED_CACHES: List[ScopedCaches] = []
+
+
+def scoped_caches(factory: Callable[[], Any]) -> ScopedCaches:
+    """Creates a cache per objfile or program space which is dropped once GDB unloads the objfile"""
+    caches = ScopedCaches(factory)
+    _SCOPED_CACHES.append(caches)
+    return caches
+
+
+def type_scope(t: gdb.Type) -> Hashable:
+    """Returns the objfile a type belongs to. Types without an objfile (e.g. architecture types) use the program space"""
+    # Type.objfile is not available in older GDB versions
+    objfile = getattr(t, "objfile", None)
+    if objfile is not None:
+        return objfile
+    return gdb.current_progspace()
+
+
+def current_scope() -> Hashable:
+    return gdb.current_progspace()
+
+
+_TYPE_CACHES = scoped_caches(lambda: LRUCache(1024))
+# Names which could not be found. They are kept apart since a new objfile may define them
+_MISSING_TYPES = scoped_caches(lambda: LRUCache(1024))
+
+
+def lookup_type(name: str, scope: Optional[Hashable] = None) -> gdb.Type:
+    """
+    Cached version of gdb.lookup_type. Types named in expressions are resolved once per objfile instead of once per
+    evaluation. Failed lookups are cached as well until the next objfile is loaded.
+    :param name: The name of the type
+    :param scope: The scope of the value the type is used with. Defaults to the current program space
+    """
+    if scope is None:
+        scope = current_scope()
+
+    cache = _TYPE_CACHES.get(scope)
+    t = cache.get(name)
+    if t is None:
+        missing = _MISSING_TYPES.get(scope)
+        if name not in missing:
+            try:
+                t = gdb.lookup_type(name)
+            except gdb.error:
+                pass
+        if t is None:
+            missing[name] = True
+            raise gdb.error("No type named {}.".format(name))
+        cache[name] = t
+
+    return t
+
+
+def _belongs_to(scope: Hashable, progspace: gdb.Progspace) -> bool:
+    if scope == progspace:
+        return True
+    if isinstance(scope, gdb.Objfile):
+        return not scope.is_valid() or getattr(scope, "progspace", progspace) == progspace
+    return False
+
+
+def _on_clear_objfiles(event) -> None:
+    for caches in _SCOPED_CACHES:
+        caches.evict_if(lambda scope: _belongs_to(scope, event.progspace))
+
+
+def _on_free_objfile(event) -> None:
+    for caches in _SCOPED_CACHES:
+        caches.evict(event.objfile)
+
+
+def _on_new_objfile(event) -> None:
+    # The new objfile may define types whose lookup failed so far
+    _MISSING_TYPES.clear()
+
+
+def connect_events() -> None:
+    gdb.events.clear_objfiles.connect(_on_clear_objfiles)
+    gdb.events.new_objfile.connect(_on_new_objfile)
+    if hasattr(gdb.events, "free_objfile"):
+        # Only available in newer GDB versions. Older versions at least report clear_objfiles when a new file is loaded
+        gdb.events.free_objfile.connect(_on_free_objfile)
@@ -0,0 +1,133 @@
+from typing import Any, List
+
+import gdb
+
+import logger
+
+
+class Settings:
+    """Runtime settings of the natvis printers. These can be changed with `set natvis ...` inside GDB."""
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        # Maximum number of characters that are read for a string in a display string. None means unlimited
+        self.string_limit = 1024
+        # Maximum nesting depth of natvis printers inside of display strings and expanded items. None means unlimited
+        self.max_depth = 8
+        # Maximum number of children shown for one value. None means unlimited
+        self.max_elements = 10000
+        # Time in milliseconds after which rendering or expanding a value is stopped. None means unlimited
+        self.time_limit = 2000
+        # Whether the display string is added as a child for front ends which do not show it. None detects this
+        # automatically
+        self.display_string_child = None
+        # Whether modified natvis files are reloaded automatically when the inferior stops
+        self.auto_reload = True
+        # Whether memory read by the printers is cached in pages while the inferior is stopped
+        self.page_cache = False
+        # Number of worker processes checking the expressions of natvis candidates in parallel. 0 checks them in GDB
+        # itself, None uses one worker per CPU
+        self.validation_workers = 0
+        # Whether the printers for the variables of the selected frame are prepared when the inferior stops
+        self.warm_up = False
+        # Time in milliseconds the preparation may take per stop. None means unlimited
+        self.warm_up_time_limit = 200
+        # "summary" only shows the first and last elements of containers larger than GDB's "print elements"
+        self.large_container_mode = "full"
+        # Which evaluator is tried first for natvis expressions: "gdb", "parser" or "auto" which uses GDB's evaluator if
+        # libclang is not available
+        self.expression_backend = "auto"
+
+
+SETTINGS = Settings()
+
+
+class NatvisPrefixCommand(gdb.Command):
+    """Generic command for changing or showing the natvis settings."""
+
+    def __init__(self, prefix: str):
+        super().__init__(prefix + " natvis", gdb.COMMAND_DATA, prefix=True)
+
+
+class NatvisParameter(gdb.Parameter):
+    """
+    GDB parameter which stores its value in an attribute of SETTINGS. "unlimited" is stored as None.
+    """
+
+    def __init__(self, name: str, attribute: str, param_class: Any, doc: str, enum_values: List[str] = None):
+        self.attribute = attribute
+        self.unlimited = param_class == gdb.PARAM_ZUINTEGER_UNLIMITED
+        self.set_doc = "Set " + doc
+        self.show_doc = "Show " + doc
+        if enum_values is None:
+            super().__init__("natvis " + name, gdb.COMMAND_DATA, param_class)
+        else:
+            super().__init__("natvis " + name, gdb.COMMAND_DATA, param_class, enum_values)
+
+        value = getattr(SETTINGS, attribute)
+        if value is None and self.unlimited:
+            value = -1
+        self.value = value
+
+    def get_set_string(self) -> str:
+        value = self.value
+        if value == -1 and self.unlimited:
+            value = None
+        setattr(SETTINGS, self.attribute, value)
+        return ""
+
+    def get_show_string(self, svalue: str) -> str:
+        return svalue
+
+
+class LogLevelParameter(gdb.Parameter):
+    """
+    GDB parameter for the minimum level of the messages written by the natvis printers.
+    """
+
+    def __init__(self):
+        self.set_doc = "Set the minimum level of logged natvis messages."
+        self.show_doc = "Show the minimum level of logged natvis messages."
+        super().__init__("natvis log-level", gdb.COMMAND_DATA, gdb.PARAM_ENUM, list(logger.LEVEL_NAMES))
+
+        self.value = next(name for name, level in logger.LEVEL_NAMES.items() if level == logger.level)
+
+    def get_set_string(self) -> str:
+        logger.set_level(self.value)
+        return ""
+
+    def get_show_string(self, svalue: str) -> str:
+        return svalue
+
+
+def register_parameters():
+    NatvisPrefixCommand("set")
+    NatvisPrefixCommand("show")
+
+    NatvisParameter("string-limit", "string_limit", gdb.PARAM_ZUINTEGER_UNLIMITED,
+                    "the maximum number of characters read for strings in display strings.")
+    NatvisParameter("max-depth", "max_depth", gdb.PARAM_ZUINTEGER_UNLIMITED,
+                    "the maximum nesting depth of natvis visualizers in display strings and expanded items.")
+    NatvisParameter("max-elements", "max_elements", gdb.PARAM_ZUINTEGER_UNLIMITED,
+                    "the maximum number of children shown for a visualized value.")
+    NatvisParameter("time-limit", "time_limit", gdb.PARAM_ZUINTEGER_UNLIMITED,
+                    "the time in milliseconds after which printing a visualized value is stopped.")
+    NatvisParameter("display-string-child", "display_string_child", gdb.PARAM_AUTO_BOOLEAN,
+                    "whether the display string is added as the first child of a visualized value.")
+    NatvisParameter("auto-reload", "auto_reload", gdb.PARAM_BOOLEAN,
+                    "whether modified natvis files are reloaded when the inferior stops.")
+    NatvisParameter("page-cache", "page_cache", gdb.PARAM_BOOLEAN,
+                    "whether memory read by the natvis printers is cached while the inferior is stopped.")
+    NatvisParameter("validation-workers", "validation_workers", gdb.PARAM_ZUINTEGER_UNLIMITED,
+                    "the number of processes checking natvis candidates in parallel.")
+    NatvisParameter("warm-up", "warm_up", gdb.PARAM_BOOLEAN,
+                    "whether the visualizers of the local variables are prepared when the inferior stops.")
+    NatvisParameter("warm-up-time-limit", "warm_up_time_limit", gdb.PARAM_ZUINTEGER_UNLIMITED,
+                    "the time in milliseconds spent on preparing visualizers when the inferior stops.")
+    NatvisParameter("large-container-mode", "large_container_mode", gdb.PARAM_ENUM,
+                    "whether containers larger than \"print elements\" are shown completely or summarized.",
+                    ["full", "summary"])
+    NatvisParameter("expression-backend", "expression_backend", gdb.PARAM_ENUM,
+                    "which evaluator is tried first for natvis expressions.", ["auto", "gdb", "parser"])
+    LogLevelParameter()
@@ -0,0 +1,131 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import gdb
+
+import memory
+
+# Objects whose needed members span more than this many bytes are not read as a whole
+SNAPSHOT_SIZE_LIMIT = 4096
+
+SCALAR_TYPE_CODES = {gdb.TYPE_CODE_INT, gdb.TYPE_CODE_FLT, gdb.TYPE_CODE_PTR, gdb.TYPE_CODE_ENUM, gdb.TYPE_CODE_BOOL,
+                     gdb.TYPE_CODE_CHAR}
+
+# Creating values from bytes is not supported by older GDB versions
+_VALUES_FROM_BYTES = True
+
+
+def _find_field(t: gdb.Type, name: str) -> Optional[Tuple[int, gdb.Type, int]]:
+    """
+    Looks up a data member like GDB does: Members of the type itself hide the members of its base classes.
+    :return: The bit offset of the member, its type and its size in bits if it is a bit field
+    """
+    t = t.strip_typedefs()
+    if t.code != gdb.TYPE_CODE_STRUCT and t.code != gdb.TYPE_CODE_UNION:
+        return None
+
+    fields = t.fields()
+    for field in fields:
+        if not field.is_base_class and field.name == name:
+            # Static members do not have a position
+            bitpos = getattr(field, "bitpos", None)
+            if bitpos is None:
+                return None
+            return bitpos, field.type, field.bitsize
+
+    for field in fields:
+        if field.is_base_class:
+            # Virtual base classes do not have a fixed position
+            bitpos = getattr(field, "bitpos", None)
+            if bitpos is None:
+                continue
+
+            found = _find_field(field.type, name)
+            if found is not None:
+                return bitpos + found[0], found[1], found[2]
+
+    return None
+
+
+def resolve_member(t: gdb.Type, path: str) -> Optional[Tuple[int, gdb.Type]]:
+    """
+    Resolves a member path like "m_pair.first" to the byte offset and the type of the member.
+    :return: The offset and the type or None if the path does not refer to a scalar member of the type
+    """
+    offset = 0
+    for name in path.split("."):
+        found = _find_field(t, name)
+        if found is None:
+            return None
+
+        bitpos, t, bitsize = found
+        if bitsize != 0 or bitpos % 8 != 0:
+            # Bit fields can not be decoded from a byte range
+            return None
+        offset += bitpos // 8
+
+    if t.strip_typedefs().code not in SCALAR_TYPE_CODES:
+        return None
+    return offset, t
+
+
+class SnapshotPlan:
+    """
+    The scalar members which are used by the expressions of a natvis type, resolved to byte offsets for one concrete
+    type. The members of an object are then read from the inferior with a single memory transfer instead of one access
+    per member.
+    """
+
+    def __init__(self, t: gdb.Type, paths: Iterable[str]) -> None:
+        super().__init__()
+
+        self.members: List[Tuple[str, int, gdb.Type]] = []
+        for path in paths:
+            resolved = resolve_member(t, path)
+            if resolved is not None:
+                self.members.append((path, resolved[0], resolved[1]))
+
+        self.start = min((offset for _, offset, _ in self.members), default=0)
+        self.end = max((offset + member_type.sizeof for _, offset, member_type in self.members), default=0)
+
+        if self.end - self.start > SNAPSHOT_SIZE_LIMIT:
+            self.members = []
+
+    def member_lvalue(self, val: gdb.Value, path: str) -> Optional[gdb.Value]:
+        """
+        The values returned by read() are not located in memory. This returns a member as a (lazy) value referring to the
+        object instead, e.g. for children which the user may modify or take the address of.
+        :return: The member or None if it is not part of this plan
+        """
+        if val.address is None:
+            return None
+
+        for member_path, offset, member_type in self.members:
+            if member_path == path:
+                return gdb.Value(int(val.address) + offset).cast(member_type.pointer()).dereference()
+        return None
+
+    def read(self, val: gdb.Value) -> Dict[str, Any]:
+        """
+        Reads the members of an object.
+        :return: The values of the members keyed by their path. Empty if the object could not be read
+        """
+        global _VALUES_FROM_BYTES
+
+        if len(self.members) <= 0 or not _VALUES_FROM_BYTES or val.address is None:
+            return {}
+
+        try:
+            data = memory.read_memory(int(val.address) + self.start, self.end - self.start)
+        except gdb.MemoryError:
+            # Let the normal evaluation report the error
+            return {}
+
+        values = {}
+        for path, offset, member_type in self.members:
+            begin = offset - self.start
+            try:
+                values[path] = gdb.Value(data[begin:begin + member_type.sizeof], member_type)
+            except TypeError:
+                _VALUES_FROM_BYTES = False
+                return {}
+        return values
@@ -1,5 +1,6 @@
 import re
-from typing import List, Tuple
+import sys
+from typing import List, Tuple, Optional
 
 
 class TemplateException(Exception):
@@ -11,6 +12,8 @@ class TemplateException(Exception):
 
 
 class TemplateType:
+    __slots__ = ("name", "args")
+
     args: List['TemplateType']
 
     def __init__(self, name: str, args=None) -> None:
@@ -18,7 +21,8 @@ class TemplateType:
 
         if args is None:
             args = []
-        self.name = name
+        # Type names are interned since the same names (e.g. "std") appear in a lot of types
+        self.name = sys.intern(name)
         self.args = args
 
     @property
@@ -111,3 +115,24 @@ def parse_template_type(input: str) -> TemplateType:
         raise TemplateException(input, end + 1,
                                 'Input remained after reading entire type! Additional string: {}'.format(input[end:]))
     return type
+
+
+# Type names containing any of these can not be handled by the template parser above (function types, array bounds,
+# anonymous namespaces, lambdas, operators, character literals...)
+AMBIGUOUS_NAME_REGEX = re.compile(r"[()\[\]{}'\"]|\boperator\b")
+
+
+def try_parse_template_type(input: str) -> Optional[TemplateType]:
+    """
+    Parses a type name if it is unambiguous for the template parser.
+    :param input: The type name to parse
+    :return: The parsed type or None if the caller has to determine the template arguments by other means
+    """
+    if AMBIGUOUS_NAME_REGEX.search(input) is not None:
+        return None
+
+    try:
+        return parse_template_type(input)
+    except (TemplateException, IndexError):
+        # The parser does not check for the end of the input in all cases
+        return None
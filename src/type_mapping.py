@@ -1,9 +1,13 @@
+import re
 from typing import Tuple, Union, Iterator, List, Set, Dict
 
 import gdb
 
 import utils
 
+# Types with a plain identifier as name are additionally declared under that name, so expressions can refer to them
+IDENTIFIER_REGEX = re.compile(r"^[A-Za-z_]\w*$")
+
 
 class TypeWrapper:
     referencing_types: Set['TypeWrapper']
@@ -180,11 +184,20 @@ class GdbTypeFormatter:
 
         return L  # Since the program was compilable there shouldn't be any cycles...
 
+    def get_original_names(self) -> Dict[str, str]:
+        """The names of the types in GDB by the names used in the declarations"""
+        return {mapped_name: name for name, mapped_name in self.type_name_mapping.items()}
+
     def _get_type_declaration(self, t: gdb.Type):
         if t.code == gdb.TYPE_CODE_UNION or t.code == gdb.TYPE_CODE_STRUCT:
             # Unions are always written as structs
-            return "struct " + self.get_type_name(utils.get_type_name_or_tag(t)) \
-                   + "; // " + utils.get_type_name_or_tag(t)
+            name = utils.get_type_name_or_tag(t)
+            mapped_name = self.get_type_name(name)
+            declaration = "struct " + mapped_name + "; // " + name
+            if IDENTIFIER_REGEX.match(name) is not None:
+                # Allows casts to the type, e.g. with the name inserted for $T
+                declaration += "\ntypedef " + mapped_name + " " + name + ";"
+            return declaration
         else:
             return str(t) + ";"
 
@@ -264,11 +277,13 @@ class GdbTypeFormatter:
 
 class TypeManager:
     cached_types: Dict[TypeWrapper, Tuple[str, str]]
+    original_names: Dict[TypeWrapper, Dict[str, str]]
 
     def __init__(self) -> None:
         super().__init__()
 
         self.cached_types = {}
+        self.original_names = {}
 
     def get_type_string(self, t: gdb.Type):
         wrapper = TypeWrapper(t)
@@ -280,5 +295,13 @@ class TypeManager:
         type_name, decl = formatter.get_type_string(t)
 
         self.cached_types[wrapper] = (type_name, decl)
+        self.original_names[wrapper] = formatter.get_original_names()
 
         return type_name, decl
+
+    def get_original_names(self, t: gdb.Type) -> Dict[str, str]:
+        """
+        Maps the names of the declarations returned by get_type_string back to the names of the types in GDB.
+        """
+        self.get_type_string(t)
+        return self.original_names[TypeWrapper(t)]
@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from typing import Dict, Optional, Sequence, Tuple
+
+import logger
+import parser
+from cache import LRUCache
+from settings import SETTINGS
+
+# The type declarations and the expressions which have to compile for a candidate
+CheckKey = Tuple[str, str, Tuple[str, ...]]
+# Seconds to wait for the check of a worker before checking in this process. A hanging worker must not block GDB
+VALIDATION_TIMEOUT = 5.0
+
+
+def check_expressions(c_type_name: str, c_type: str, expressions: Sequence[str]) -> bool:
+    """Checks if all expressions compile for the type. This runs in the worker processes."""
+    return all(parser.check_expression(c_type_name, c_type, expression) for expression in expressions)
+
+
+class Validator:
+    """
+    Checks whether the expressions of natvis candidates compile for a type and caches the results. If worker processes
+    are enabled, the checks of all candidates run in parallel while the caller waits for them in priority order.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.results = LRUCache(16384)
+        self.pending: Dict[CheckKey, Future] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._workers = 0
+
+    def _worker_count(self) -> int:
+        if not parser.CLANG_AVAILABLE:
+            # Without libclang checking is free
+            return 0
+        workers = SETTINGS.validation_workers
+        if workers is None:
+            return os.cpu_count() or 1
+        return workers
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        workers = self._worker_count()
+        if workers != self._workers:
+            self.shutdown()
+            self._workers = workers
+
+        if self._executor is None and workers > 0:
+            try:
+                # The workers are forked so they do not need to import the modules (and GDB) again. Python 3.6 can not
+                # select the start method, but forks on Linux anyway
+                if sys.version_info >= (3, 7):
+                    self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+                else:
+                    self._executor = ProcessPoolExecutor(workers)
+            except (OSError, ValueError) as e:
+                logger.warning("Failed to start the natvis validation workers: {}", e)
+                self._workers = 0
+        return self._executor
+
+    def _collect_finished(self) -> None:
+        for key in [key for key, future in self.pending.items() if future.done()]:
+            future = self.pending.pop(key)
+            if future.exception() is None:
+                self.results[key] = future.result()
+
+    def submit(self, c_type_name: str, c_type: str, expressions: Sequence[str]) -> None:
+        """Starts checking a candidate in the background if worker processes are enabled"""
+        key = (c_type_name, c_type, tuple(expressions))
+        if key in self.results or key in self.pending:
+            return
+
+        executor = self._get_executor()
+        if executor is None:
+            return
+
+        self._collect_finished()
+        try:
+            self.pending[key] = executor.submit(check_expressions, *key)
+        except RuntimeError:
+            # The pool broke, e.g. because a worker was killed
+            self.shutdown()
+
+    def is_valid(self, c_type_name: str, c_type: str, expressions: Sequence[str]) -> bool:
+        key = (c_type_name, c_type, tuple(expressions))
+        result = self.results.get(key)
+        if result is not None:
+            return result
+
+        future = self.pending.pop(key, None)
+        result = None
+        if future is not None:
+            try:
+                result = future.result(timeout=VALIDATION_TIMEOUT)
+            except TimeoutError:
+                logger.warning("Natvis validation worker did not respond within {} s", VALIDATION_TIMEOUT)
+                # The worker is probably stuck, so the queued checks would wait for it as well
+                self.shutdown()
+            except Exception as e:
+                logger.warning("Natvis validation worker failed: {}", e)
+
+        if result is None:
+            result = check_expressions(*key)
+
+        self.results[key] = result
+        return result
+
+    def shutdown(self) -> None:
+        # Executor.shutdown only cancels the queued checks itself since Python 3.9
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+VALIDATOR = Validator()
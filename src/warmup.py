@@ -0,0 +1,131 @@
+import time
+from collections import deque
+from typing import Callable, Deque, List
+
+import gdb
+
+import logger
+from settings import SETTINGS
+
+# Maximum number of variables of a frame which are considered
+MAX_WARM_UP_VARIABLES = 256
+# Time in milliseconds the warm-up runs before giving GDB a chance to handle other events
+WARM_UP_SLICE = 10
+
+
+def frame_variable_types(frame: gdb.Frame) -> List[gdb.Type]:
+    """
+    Returns the distinct types of the locals and arguments visible in a frame, innermost scope first.
+    """
+    try:
+        block = frame.block()
+    except RuntimeError:
+        # No debug information for this frame
+        return []
+
+    types = []
+    seen = set()
+    while block is not None:
+        for symbol in block:
+            if not symbol.is_variable and not symbol.is_argument:
+                continue
+
+            t = symbol.type
+            name = str(t)
+            if name not in seen:
+                seen.add(name)
+                types.append(t)
+            if len(seen) >= MAX_WARM_UP_VARIABLES:
+                return types
+
+        if block.function is not None:
+            # The remaining blocks are the static and global scopes
+            break
+        block = block.superblock
+
+    return types
+
+
+class WarmUp:
+    """
+    Prepares the printers for the variables of the selected frame when the inferior stops, so the front end does not
+    have to wait for the visualizers to be selected and checked when it asks for the values. The work is done in small
+    slices posted to the event loop of GDB. It stops once the time limit is reached and is cancelled when the inferior
+    continues.
+    """
+
+    def __init__(self, printer) -> None:
+        super().__init__()
+
+        # The NatvisPrettyPrinter which is prepared
+        self.printer = printer
+        self._generation = 0
+        self._work: Deque[Callable[[], None]] = deque()
+        self._deadline = 0.0
+
+    @property
+    def running(self) -> bool:
+        return len(self._work) > 0
+
+    def cancel(self, event=None) -> None:
+        self._generation += 1
+        self._work.clear()
+
+    def start(self, event=None) -> None:
+        self.cancel()
+        if not SETTINGS.warm_up:
+            return
+
+        try:
+            types = frame_variable_types(gdb.selected_frame())
+        except gdb.error:
+            # No frame is selected
+            return
+
+        # The loaded visualizers of all types are submitted first so that workers check them in parallel
+        self._work.extend(self._step(self.printer.submit_type, t) for t in types)
+        self._work.extend(self._step(self.printer.prepare_type, t) for t in types)
+
+        time_limit = SETTINGS.warm_up_time_limit
+        self._deadline = float("inf") if time_limit is None else time.monotonic() + time_limit / 1000
+        self._post()
+
+    def _step(self, prepare: Callable[[gdb.Type], None], t: gdb.Type) -> Callable[[], None]:
+        def step():
+            visualized_type = self.printer.get_visualized_type(t)
+            if visualized_type is not None:
+                prepare(visualized_type)
+
+        return step
+
+    def _post(self) -> None:
+        generation = self._generation
+        gdb.post_event(lambda: self._run(generation))
+
+    def _run(self, generation: int) -> None:
+        if generation != self._generation:
+            # Cancelled in the meantime
+            return
+
+        slice_end = min(self._deadline, time.monotonic() + WARM_UP_SLICE / 1000)
+        while self._work and time.monotonic() < slice_end:
+            step = self._work.popleft()
+            try:
+                step()
+            except Exception:
+                logger.debug("Natvis warm-up failed:", exc_info=True)
+
+        if not self._work:
+            return
+
+        if time.monotonic() >= self._deadline:
+            logger.debug("Natvis warm-up stopped after {} ms with {} steps left", SETTINGS.warm_up_time_limit,
+                         len(self._work))
+            self._work.clear()
+        else:
+            self._post()
+
+    def connect_events(self) -> None:
+        gdb.events.stop.connect(self.start)
+        gdb.events.cont.connect(self.cancel)
+        gdb.events.exited.connect(self.cancel)
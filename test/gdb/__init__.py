@@ -0,0 +1,1179 @@
+# In-memory stand-in for the GDB Python API (see src/gdb/__init__.pyi) which allows testing the printers in plain
+# CPython. The inferior is a byte addressable memory image and values are read from it lazily like GDB does, so tests
+# can assert on the exact memory transfers.
+import re
+import shlex
+import struct
+import sys
+from enum import Enum, auto
+from typing import Optional, Any, Tuple, Iterable, Union, List, Callable, Dict
+
+
+class CodeEnum(Enum):
+    TYPE_CODE_PTR = auto()
+    TYPE_CODE_ARRAY = auto()
+    TYPE_CODE_STRUCT = auto()
+    TYPE_CODE_UNION = auto()
+    TYPE_CODE_ENUM = auto()
+    TYPE_CODE_FLAGS = auto()
+    TYPE_CODE_FUNC = auto()
+    TYPE_CODE_FLT = auto()
+    TYPE_CODE_INT = auto()
+    TYPE_CODE_VOID = auto()
+    TYPE_CODE_SET = auto()
+    TYPE_CODE_RANGE = auto()
+    TYPE_CODE_STRING = auto()
+    TYPE_CODE_BITSTRING = auto()
+    TYPE_CODE_ERROR = auto()
+    TYPE_CODE_METHOD = auto()
+    TYPE_CODE_METHODPTR = auto()
+    TYPE_CODE_MEMBERPTR = auto()
+    TYPE_CODE_REF = auto()
+    TYPE_CODE_RVALUE_REF = auto()
+    TYPE_CODE_CHAR = auto()
+    TYPE_CODE_BOOL = auto()
+    TYPE_CODE_COMPLEX = auto()
+    TYPE_CODE_TYPEDEF = auto()
+    TYPE_CODE_NAMESPACE = auto()
+    TYPE_CODE_DECFLOAT = auto()
+    TYPE_CODE_INTERNAL_FUNCTION = auto()
+
+
+TYPE_CODE_PTR = CodeEnum.TYPE_CODE_PTR
+TYPE_CODE_ARRAY = CodeEnum.TYPE_CODE_ARRAY
+TYPE_CODE_STRUCT = CodeEnum.TYPE_CODE_STRUCT
+TYPE_CODE_UNION = CodeEnum.TYPE_CODE_UNION
+TYPE_CODE_ENUM = CodeEnum.TYPE_CODE_ENUM
+TYPE_CODE_FLAGS = CodeEnum.TYPE_CODE_FLAGS
+TYPE_CODE_FUNC = CodeEnum.TYPE_CODE_FUNC
+TYPE_CODE_FLT = CodeEnum.TYPE_CODE_FLT
+TYPE_CODE_INT = CodeEnum.TYPE_CODE_INT
+TYPE_CODE_VOID = CodeEnum.TYPE_CODE_VOID
+TYPE_CODE_SET = CodeEnum.TYPE_CODE_SET
+TYPE_CODE_RANGE = CodeEnum.TYPE_CODE_RANGE
+TYPE_CODE_STRING = CodeEnum.TYPE_CODE_STRING
+TYPE_CODE_BITSTRING = CodeEnum.TYPE_CODE_BITSTRING
+TYPE_CODE_ERROR = CodeEnum.TYPE_CODE_ERROR
+TYPE_CODE_METHOD = CodeEnum.TYPE_CODE_METHOD
+TYPE_CODE_METHODPTR = CodeEnum.TYPE_CODE_METHODPTR
+TYPE_CODE_MEMBERPTR = CodeEnum.TYPE_CODE_MEMBERPTR
+TYPE_CODE_REF = CodeEnum.TYPE_CODE_REF
+TYPE_CODE_RVALUE_REF = CodeEnum.TYPE_CODE_RVALUE_REF
+TYPE_CODE_CHAR = CodeEnum.TYPE_CODE_CHAR
+TYPE_CODE_BOOL = CodeEnum.TYPE_CODE_BOOL
+TYPE_CODE_COMPLEX = CodeEnum.TYPE_CODE_COMPLEX
+TYPE_CODE_TYPEDEF = CodeEnum.TYPE_CODE_TYPEDEF
+TYPE_CODE_NAMESPACE = CodeEnum.TYPE_CODE_NAMESPACE
+TYPE_CODE_DECFLOAT = CodeEnum.TYPE_CODE_DECFLOAT
+TYPE_CODE_INTERNAL_FUNCTION = CodeEnum.TYPE_CODE_INTERNAL_FUNCTION
+
+VERSION = "12.1"
+PYTHONDIR = ""
+
+STDOUT = 0
+STDERR = 1
+STDLOG = 2
+
+
+class error(RuntimeError):
+    pass
+
+
+class MemoryError(error):
+    pass
+
+
+class GdbError(Exception):
+    pass
+
+
+def write(string: str, stream: int = STDOUT) -> None:
+    (sys.stderr if stream == STDERR else sys.stdout).write(string)
+
+
+def string_to_argv(val: str) -> List[str]:
+    return shlex.split(val)
+
+
+# Types
+
+class Field:
+    def __init__(self, name: Optional[str], type: 'Type', bitpos: Optional[int] = None, bitsize: int = 0,
+                 is_base_class: bool = False, artificial: bool = False, enumval: int = None) -> None:
+        super().__init__()
+
+        self.name = name
+        self.type = type
+        if bitpos is not None:
+            # Like in GDB static members do not have this attribute
+            self.bitpos = bitpos
+        if enumval is not None:
+            self.enumval = enumval
+        self.bitsize = bitsize
+        self.is_base_class = is_base_class
+        self.artificial = artificial
+        self.parent_type = None
+
+
+class Type:
+    """
+    A type of the mock inferior. Unlike GDB types these can be created directly, the helper functions in mock_inferior
+    build the usual C++ types.
+    """
+
+    def __init__(self, code: CodeEnum, name: Optional[str] = None, sizeof: int = 0, target: 'Type' = None,
+                 fields: List[Field] = None, template_arguments: List[Any] = None, is_signed: bool = False) -> None:
+        super().__init__()
+
+        self.code = code
+        self.name = name
+        self.tag = name if code in (TYPE_CODE_STRUCT, TYPE_CODE_UNION, TYPE_CODE_ENUM) else None
+        self.sizeof = sizeof
+        self.objfile = None
+        self.is_signed = is_signed
+        self._target = target
+        self._fields = fields or []
+        self._template_arguments = template_arguments or []
+        self._range = None
+        self._qualifiers = ()
+        self._unqualified = self
+        self._derived = {}
+
+        for field in self._fields:
+            field.parent_type = self
+
+    def _derive(self, key: Any, factory: Callable[[], 'Type']) -> 'Type':
+        # Derived types are created once so that they compare equal and can be used as dictionary keys
+        derived = self._derived.get(key)
+        if derived is None:
+            derived = factory()
+            self._derived[key] = derived
+        return derived
+
+    def _qualified(self, qualifier: str) -> 'Type':
+        def create():
+            t = Type(self.code, self.name, self.sizeof, self._target, None, self._template_arguments, self.is_signed)
+            t.tag = self.tag
+            t._fields = self._fields
+            t._range = self._range
+            t._qualifiers = tuple(sorted(set(self._qualifiers + (qualifier,))))
+            t._unqualified = self._unqualified
+            return t
+
+        return self._derive(qualifier, create)
+
+    def const(self) -> 'Type':
+        return self._qualified("const")
+
+    def volatile(self) -> 'Type':
+        return self._qualified("volatile")
+
+    def unqualified(self) -> 'Type':
+        return self._unqualified
+
+    def pointer(self) -> 'Type':
+        return self._derive("*", lambda: Type(TYPE_CODE_PTR, None, 8, self))
+
+    def reference(self) -> 'Type':
+        return self._derive("&", lambda: Type(TYPE_CODE_REF, None, 8, self))
+
+    def array(self, n1: int, n2: int = None) -> 'Type':
+        low, high = (0, n1) if n2 is None else (n1, n2)
+        if high < low - 1:
+            raise ValueError("Array length must not be negative")
+
+        def create():
+            t = Type(TYPE_CODE_ARRAY, None, (high - low + 1) * self.sizeof, self)
+            t._range = (low, high)
+            return t
+
+        return self._derive(("[]", low, high), create)
+
+    def range(self) -> Tuple[int, int]:
+        if self._range is None:
+            raise RuntimeError("This type does not have a range.")
+        return self._range
+
+    def target(self) -> 'Type':
+        if self._target is None:
+            raise RuntimeError("Type does not have a target.")
+        return self._target
+
+    def strip_typedefs(self) -> 'Type':
+        t = self
+        while t.code == TYPE_CODE_TYPEDEF:
+            t = t._target
+        return t
+
+    def fields(self) -> List[Field]:
+        if self.code not in (TYPE_CODE_STRUCT, TYPE_CODE_UNION, TYPE_CODE_ENUM, TYPE_CODE_FUNC):
+            raise TypeError("Type is not a structure, union, enum, or function type.")
+        return list(self._fields)
+
+    def keys(self) -> List[str]:
+        return [f.name for f in self.fields()]
+
+    def __getitem__(self, name: str) -> Field:
+        for f in self.fields():
+            if f.name == name:
+                return f
+        raise KeyError(name)
+
+    def template_argument(self, n: int, block: Any = None) -> Any:
+        if n >= len(self._template_arguments):
+            raise RuntimeError("Template argument number {} out of range.".format(n))
+        return self._template_arguments[n]
+
+    def optimized_out(self) -> 'Value':
+        return Value(b"\0" * self.sizeof, self)
+
+    def __str__(self) -> str:
+        prefix = "".join(q + " " for q in self._qualifiers)
+        if self.name is not None:
+            return prefix + self.name
+        if self.code == TYPE_CODE_PTR:
+            return str(self._target) + " *" + (" " + " ".join(self._qualifiers) if self._qualifiers else "")
+        if self.code == TYPE_CODE_REF:
+            return str(self._target) + " &"
+        if self.code == TYPE_CODE_ARRAY:
+            return "{} [{}]".format(self._target, self._range[1] - self._range[0] + 1)
+        return prefix + "<anonymous>"
+
+    def __repr__(self) -> str:
+        return "<gdb.Type {}>".format(self)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Type) and self.code == other.code and str(self) == str(other)
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+
+def _integer_type(name: str, size: int, signed: bool, code: CodeEnum = TYPE_CODE_INT) -> Type:
+    return Type(code, name, size, is_signed=signed)
+
+
+_BUILTIN_TYPES = [
+    Type(TYPE_CODE_VOID, "void", 1),
+    _integer_type("bool", 1, False, TYPE_CODE_BOOL),
+    _integer_type("char", 1, True),
+    _integer_type("signed char", 1, True),
+    _integer_type("unsigned char", 1, False),
+    _integer_type("wchar_t", 4, True),
+    _integer_type("char16_t", 2, False, TYPE_CODE_CHAR),
+    _integer_type("char32_t", 4, False, TYPE_CODE_CHAR),
+    _integer_type("short", 2, True),
+    _integer_type("unsigned short", 2, False),
+    _integer_type("int", 4, True),
+    _integer_type("unsigned int", 4, False),
+    _integer_type("long", 8, True),
+    _integer_type("unsigned long", 8, False),
+    _integer_type("long long", 8, True),
+    _integer_type("unsigned long long", 8, False),
+    Type(TYPE_CODE_FLT, "float", 4, is_signed=True),
+    Type(TYPE_CODE_FLT, "double", 8, is_signed=True),
+]
+
+# All types which can be found with lookup_type. Tests add their struct types here
+TYPES: Dict[str, Type] = {t.name: t for t in _BUILTIN_TYPES}
+
+
+def _add_typedef(name: str, target: str) -> None:
+    TYPES[name] = Type(TYPE_CODE_TYPEDEF, name, TYPES[target].sizeof, TYPES[target])
+
+
+_add_typedef("size_t", "unsigned long")
+_add_typedef("intptr_t", "long")
+_add_typedef("uintptr_t", "unsigned long")
+
+
+def lookup_type(name: str, block: Any = None) -> Type:
+    t = TYPES.get(name)
+    if t is None:
+        raise error("No type named {}.".format(name))
+    return t
+
+
+# Memory
+
+class Inferior:
+    """
+    The memory of the mock inferior consists of separate regions. Every access to them (through read_memory or by
+    fetching a lazy value) is recorded in reads.
+    """
+
+    def __init__(self, num: int = 1) -> None:
+        super().__init__()
+
+        self.num = num
+        self.pid = 1000 + num
+        self.regions: List[Tuple[int, bytearray]] = []
+        self.reads: List[Tuple[int, int]] = []
+
+    def add_region(self, address: int, size: int) -> None:
+        self.regions.append((address, bytearray(size)))
+
+    def _find_region(self, address: int, length: int) -> Tuple[int, bytearray]:
+        for start, data in self.regions:
+            if start <= address and address + length <= start + len(data):
+                return start, data
+        raise MemoryError("Cannot access memory at address 0x{:x}".format(address))
+
+    def read(self, address: int, length: int) -> bytes:
+        start, data = self._find_region(address, length)
+        self.reads.append((address, length))
+        return bytes(data[address - start:address - start + length])
+
+    def read_memory(self, address: int, length: int) -> memoryview:
+        return memoryview(self.read(int(address), int(length)))
+
+    def write_memory(self, address: int, buffer: Union[str, bytes], length: int = None) -> None:
+        if isinstance(buffer, str):
+            buffer = buffer.encode()
+        if length is not None:
+            buffer = buffer[:length]
+        start, data = self._find_region(int(address), len(buffer))
+        data[int(address) - start:int(address) - start + len(buffer)] = buffer
+
+    def threads(self) -> Tuple[Any, ...]:
+        # A single thread while a frame is selected
+        return () if _SELECTED_FRAME is None else (InferiorThread(),)
+
+
+_SELECTED_INFERIOR = Inferior()
+
+
+def selected_inferior() -> Inferior:
+    return _SELECTED_INFERIOR
+
+
+def select_inferior(inferior: Inferior) -> None:
+    """Test only: Replaces the inferior the values are read from"""
+    global _SELECTED_INFERIOR
+    _SELECTED_INFERIOR = inferior
+
+
+# Values
+
+_CHARACTER_TYPE_NAMES = {"char", "signed char", "unsigned char", "wchar_t", "char16_t", "char32_t"}
+
+
+def _scalar_codes() -> Tuple[CodeEnum, ...]:
+    return TYPE_CODE_INT, TYPE_CODE_BOOL, TYPE_CODE_CHAR, TYPE_CODE_ENUM, TYPE_CODE_PTR, TYPE_CODE_REF, TYPE_CODE_FLT
+
+
+def _pack(t: Type, number: Union[int, float]) -> bytes:
+    t = t.strip_typedefs()
+    if t.code == TYPE_CODE_FLT:
+        return struct.pack("<f" if t.sizeof == 4 else "<d", float(number))
+    return (int(number) & ((1 << (8 * t.sizeof)) - 1)).to_bytes(t.sizeof, "little")
+
+
+def _unpack(t: Type, data: bytes) -> Union[int, float]:
+    t = t.strip_typedefs()
+    if t.code == TYPE_CODE_FLT:
+        return struct.unpack("<f" if t.sizeof == 4 else "<d", data[:t.sizeof])[0]
+    if t.code not in _scalar_codes():
+        raise error("Cannot convert value to long.")
+    signed = t.is_signed and t.code not in (TYPE_CODE_PTR, TYPE_CODE_REF)
+    return int.from_bytes(data[:t.sizeof], "little", signed=signed)
+
+
+def _find_member(t: Type, name: str) -> Optional[Tuple[int, Type]]:
+    t = t.strip_typedefs()
+    fields = t.fields()
+    for f in fields:
+        if not f.is_base_class and f.name == name:
+            return getattr(f, "bitpos", 0) // 8, f.type
+    for f in fields:
+        if f.is_base_class:
+            found = _find_member(f.type, name)
+            if found is not None:
+                return f.bitpos // 8 + found[0], found[1]
+    return None
+
+
+# Set while an operand of sizeof is evaluated. GDB only determines the type of the operand then
+_AVOID_SIDE_EFFECTS = False
+
+
+def _c_division(left: int, right: int) -> int:
+    if right == 0:
+        if _AVOID_SIDE_EFFECTS:
+            return 0
+        raise error("Division by zero")
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+class Value:
+    def __init__(self, val: Any, type: Type = None) -> None:
+        super().__init__()
+
+        self._address = None
+        self._lazy = False
+
+        if type is not None:
+            data = bytes(val)
+            if len(data) < type.sizeof:
+                raise ValueError("Size of type is larger than that of buffer object.")
+            self._type = type
+            self._contents = data[:type.sizeof]
+        elif isinstance(val, Value):
+            self._type = val._type
+            self._contents = val._get_contents()
+        elif isinstance(val, bool):
+            self._type = TYPES["bool"]
+            self._contents = _pack(self._type, int(val))
+        elif isinstance(val, int):
+            self._type = TYPES["long"]
+            self._contents = _pack(self._type, val)
+        elif isinstance(val, float):
+            self._type = TYPES["double"]
+            self._contents = _pack(self._type, val)
+        elif isinstance(val, str):
+            data = val.encode() + b"\0"
+            self._type = TYPES["char"].array(len(data) - 1)
+            self._contents = data
+        else:
+            raise TypeError("Could not convert Python object: {!r}.".format(val))
+
+    @staticmethod
+    def _at(t: Type, address: int) -> 'Value':
+        val = Value.__new__(Value)
+        val._type = t
+        val._address = address
+        val._lazy = True
+        val._contents = None
+        return val
+
+    @staticmethod
+    def _from_contents(t: Type, contents: bytes, address: Optional[int]) -> 'Value':
+        val = Value(contents, t)
+        val._address = address
+        return val
+
+    @property
+    def type(self) -> Type:
+        return self._type
+
+    @property
+    def dynamic_type(self) -> Type:
+        return self._type
+
+    @property
+    def address(self) -> Optional['Value']:
+        if self._address is None:
+            return None
+        return Value._from_contents(self._type.pointer(), _pack(self._type.pointer(), self._address), None)
+
+    @property
+    def is_lazy(self) -> bool:
+        return self._lazy
+
+    @property
+    def is_optimized_out(self) -> bool:
+        return False
+
+    def fetch_lazy(self) -> None:
+        if self._lazy:
+            self._contents = _SELECTED_INFERIOR.read(self._address, self._type.sizeof)
+            self._lazy = False
+
+    def _get_contents(self) -> bytes:
+        self.fetch_lazy()
+        return self._contents
+
+    def _number(self) -> Union[int, float]:
+        return _unpack(self._type, self._get_contents())
+
+    def _child(self, t: Type, offset: int) -> 'Value':
+        address = None if self._address is None else self._address + offset
+        if self._lazy:
+            return Value._at(t, address)
+        if offset < 0 or offset + t.sizeof > len(self._contents):
+            if address is None:
+                raise error("no such vector element")
+            return Value._at(t, address)
+        return Value._from_contents(t, self._contents[offset:offset + t.sizeof], address)
+
+    # Conversions
+
+    def __int__(self) -> int:
+        return int(self._number())
+
+    def __index__(self) -> int:
+        number = self._number()
+        if isinstance(number, float):
+            raise TypeError("Cannot use a floating point value as index")
+        return number
+
+    def __float__(self) -> float:
+        return float(self._number())
+
+    def __bool__(self) -> bool:
+        return self._number() != 0
+
+    def __hash__(self) -> int:
+        return id(self)
+
+    # Access
+
+    def dereference(self) -> 'Value':
+        t = self._type.strip_typedefs()
+        if t.code not in (TYPE_CODE_PTR, TYPE_CODE_REF) or t.target().code == TYPE_CODE_VOID:
+            raise error("Attempt to take contents of a non-pointer value.")
+        return Value._at(t.target(), int(self))
+
+    def referenced_value(self) -> 'Value':
+        return self.dereference()
+
+    def reference_value(self) -> 'Value':
+        if self._address is None:
+            raise error("Attempt to take address of value not located in memory.")
+        t = self._type.reference()
+        return Value._from_contents(t, _pack(t, self._address), None)
+
+    def const_value(self) -> 'Value':
+        return self.cast(self._type.const())
+
+    def __getitem__(self, key: Any) -> 'Value':
+        t = self._type.strip_typedefs()
+
+        if isinstance(key, Field):
+            key = key.name
+
+        if isinstance(key, str):
+            if t.code in (TYPE_CODE_PTR, TYPE_CODE_REF):
+                return self.dereference()[key]
+            if t.code not in (TYPE_CODE_STRUCT, TYPE_CODE_UNION):
+                raise error("Attempt to extract a component of a value that is not a structure.")
+            found = _find_member(t, key)
+            if found is None:
+                raise error("There is no member named {}.".format(key))
+            return self._child(found[1], found[0])
+
+        index = int(key)
+        if t.code == TYPE_CODE_ARRAY:
+            element = t.target()
+            return self._child(element, (index - t.range()[0]) * element.sizeof)
+        if t.code == TYPE_CODE_PTR:
+            return (self + index).dereference()
+        raise error("Cannot subscript requested type.")
+
+    def cast(self, type: Type) -> 'Value':
+        source = self._type.strip_typedefs()
+        target = type.strip_typedefs()
+
+        if source.code in _scalar_codes() and target.code in _scalar_codes():
+            return Value._from_contents(type, _pack(type, self._number()), None)
+
+        # Reinterpret the memory of the value
+        if not self._lazy and len(self._contents) >= type.sizeof:
+            return Value._from_contents(type, self._contents[:type.sizeof], self._address)
+        if self._address is None:
+            raise error("Invalid cast.")
+        return Value._at(type, self._address)
+
+    def reinterpret_cast(self, type: Type) -> 'Value':
+        return self.cast(type)
+
+    def dynamic_cast(self, type: Type) -> 'Value':
+        return self.cast(type)
+
+    def string(self, encoding: str = None, errors: str = None, length: int = None) -> str:
+        return self._read_string(length)[0].decode(encoding or "utf-8", errors or "strict")
+
+    def _read_string(self, length: Optional[int], limit: int = 200) -> Tuple[bytes, bool]:
+        t = self._type.strip_typedefs()
+        if t.code == TYPE_CODE_ARRAY:
+            data = self._get_contents()
+            end = data.find(b"\0")
+            return (data if end == -1 else data[:end]), False
+
+        address = int(self)
+        count = limit if length is None else length
+        data = b""
+        for i in range(count):
+            char = _SELECTED_INFERIOR.read(address + i, 1)
+            if length is None and char == b"\0":
+                return data, False
+            data += char
+        return data, length is None
+
+    # Arithmetic
+
+    def _binary(self, other: Any, op: Callable[[Any, Any], Any], reverse: bool = False) -> Any:
+        if not isinstance(other, Value):
+            other = Value(other)
+        left, right = (other, self) if reverse else (self, other)
+        left_t, right_t = left._type.strip_typedefs(), right._type.strip_typedefs()
+
+        if left_t.code == TYPE_CODE_PTR or right_t.code == TYPE_CODE_PTR:
+            return self._pointer_arithmetic(left, right, op)
+
+        if left_t.code == TYPE_CODE_FLT or right_t.code == TYPE_CODE_FLT:
+            result_t = TYPES["double"]
+        else:
+            # Integer promotion to at least int
+            candidates = [t for t in (left_t, right_t) if t.code in (TYPE_CODE_INT, TYPE_CODE_ENUM)] + [TYPES["int"]]
+            result_t = max(candidates, key=lambda t: (t.sizeof, not t.is_signed))
+
+        result = op(left._number(), right._number())
+        return Value._from_contents(result_t, _pack(result_t, result), None)
+
+    @staticmethod
+    def _pointer_arithmetic(left: 'Value', right: 'Value', op: Callable[[Any, Any], Any]) -> 'Value':
+        left_t, right_t = left._type.strip_typedefs(), right._type.strip_typedefs()
+        if left_t.code == TYPE_CODE_PTR and right_t.code == TYPE_CODE_PTR:
+            size = max(left_t.target().sizeof, 1)
+            result = Value._from_contents(TYPES["long"], _pack(TYPES["long"], (int(left) - int(right)) // size), None)
+            return result
+
+        pointer, offset = (left, int(right)) if left_t.code == TYPE_CODE_PTR else (right, int(left))
+        size = max(pointer._type.strip_typedefs().target().sizeof, 1)
+        address = op(int(pointer), offset * size)
+        return Value._from_contents(pointer._type, _pack(pointer._type, address), None)
+
+    def __add__(self, other):
+        return self._binary(other, lambda a, b: a + b)
+
+    def __radd__(self, other):
+        return self._binary(other, lambda a, b: a + b, True)
+
+    def __sub__(self, other):
+        return self._binary(other, lambda a, b: a - b)
+
+    def __rsub__(self, other):
+        return self._binary(other, lambda a, b: a - b, True)
+
+    def __mul__(self, other):
+        return self._binary(other, lambda a, b: a * b)
+
+    def __rmul__(self, other):
+        return self._binary(other, lambda a, b: a * b, True)
+
+    def _divide(self, a, b):
+        if isinstance(a, float) or isinstance(b, float):
+            return a / b
+        return _c_division(a, b)
+
+    def __truediv__(self, other):
+        return self._binary(other, self._divide)
+
+    def __rtruediv__(self, other):
+        return self._binary(other, self._divide, True)
+
+    def __floordiv__(self, other):
+        return self._binary(other, self._divide)
+
+    def __mod__(self, other):
+        return self._binary(other, lambda a, b: a - _c_division(a, b) * b)
+
+    def __lshift__(self, other):
+        return self._binary(other, lambda a, b: a << b)
+
+    def __rshift__(self, other):
+        return self._binary(other, lambda a, b: a >> b)
+
+    def __and__(self, other):
+        return self._binary(other, lambda a, b: a & b)
+
+    def __or__(self, other):
+        return self._binary(other, lambda a, b: a | b)
+
+    def __xor__(self, other):
+        return self._binary(other, lambda a, b: a ^ b)
+
+    def __neg__(self):
+        return Value._from_contents(self._type, _pack(self._type, -self._number()), None)
+
+    def __abs__(self):
+        return Value._from_contents(self._type, _pack(self._type, abs(self._number())), None)
+
+    def __invert__(self):
+        return Value._from_contents(self._type, _pack(self._type, ~int(self._number())), None)
+
+    def _compare_number(self, other: Any) -> Union[int, float]:
+        return other._number() if isinstance(other, Value) else other
+
+    def __eq__(self, other):
+        return self._number() == self._compare_number(other)
+
+    def __ne__(self, other):
+        return self._number() != self._compare_number(other)
+
+    def __lt__(self, other):
+        return self._number() < self._compare_number(other)
+
+    def __le__(self, other):
+        return self._number() <= self._compare_number(other)
+
+    def __gt__(self, other):
+        return self._number() > self._compare_number(other)
+
+    def __ge__(self, other):
+        return self._number() >= self._compare_number(other)
+
+    # Formatting
+
+    def format_string(self, raw: bool = False, **kwargs: Any) -> str:
+        t = self._type.strip_typedefs()
+
+        if not raw and t.code in (TYPE_CODE_STRUCT, TYPE_CODE_UNION):
+            visualizer = default_visualizer(self)
+            if visualizer is not None and hasattr(visualizer, "to_string"):
+                return str(visualizer.to_string())
+
+        if t.code == TYPE_CODE_BOOL:
+            return "true" if self._number() else "false"
+        if t.code == TYPE_CODE_FLT:
+            return "{:.9g}".format(self._number()) if t.sizeof == 4 else "{:.17g}".format(self._number())
+        if t.code in (TYPE_CODE_INT, TYPE_CODE_CHAR) and t.name in _CHARACTER_TYPE_NAMES:
+            number = self._number()
+            return "{} {!r}".format(number, chr(number & 0xFF) if t.sizeof == 1 else chr(number))
+        if t.code == TYPE_CODE_ENUM:
+            number = self._number()
+            for f in t.fields():
+                if getattr(f, "enumval", None) == number:
+                    return f.name
+            return str(number)
+        if t.code in (TYPE_CODE_INT, TYPE_CODE_CHAR):
+            return str(self._number())
+        if t.code in (TYPE_CODE_PTR, TYPE_CODE_REF):
+            text = "0x{:x}".format(self._number())
+            target = t.target().strip_typedefs().unqualified()
+            if target.name in _CHARACTER_TYPE_NAMES and target.sizeof == 1 and self._number() != 0:
+                data, truncated = self._read_string(None)
+                text += ' "{}"{}'.format(data.decode(errors="replace"), "..." if truncated else "")
+            return text
+        if t.code == TYPE_CODE_ARRAY:
+            target = t.target().strip_typedefs().unqualified()
+            if target.name in _CHARACTER_TYPE_NAMES and target.sizeof == 1:
+                return '"{}"'.format(self._read_string(None)[0].decode(errors="replace"))
+            low, high = t.range()
+            return "{" + ", ".join(str(self[i]) for i in range(low, high + 1)) + "}"
+        if t.code in (TYPE_CODE_STRUCT, TYPE_CODE_UNION):
+            parts = []
+            for f in t.fields():
+                if not hasattr(f, "bitpos"):
+                    continue
+                if f.is_base_class:
+                    parts.append("<{}> = {}".format(f.name, self._child(f.type, f.bitpos // 8).format_string(raw)))
+                else:
+                    parts.append("{} = {}".format(f.name, self[f.name].format_string(raw)))
+            return "{" + ", ".join(parts) + "}"
+        return "<unknown>"
+
+    def __str__(self) -> str:
+        return self.format_string()
+
+    def __repr__(self) -> str:
+        return "<gdb.Value {} at {}>".format(self._type, None if self._address is None else hex(self._address))
+
+
+# Pretty printers
+
+pretty_printers: List[Callable[[Value], Any]] = []
+
+
+# Values of the variables visible to parse_and_eval by their name
+VARIABLES: Dict[str, Value] = {}
+CONVENIENCE_VARIABLES: Dict[str, Value] = {}
+
+# Every expression passed to parse_and_eval
+EVALUATED: List[str] = []
+
+_EXPRESSION_TOKEN_REGEX = re.compile(r"\s*(?:(\$?[A-Za-z_]\w*)|(\d+)|(->|&&|\|\||==|!=|<=|>=|<<|>>|[-+*/%<>()\[\].!&|^~]))")
+_SIZEOF_REGEX = re.compile(r"^\s*sizeof\s*\((.*)\)\s*$")
+_PYTHON_OPERATORS = {"&&": " and ", "||": " or ", "!": " not ", "/": "//"}
+
+
+def convenience_variable(name: str) -> Optional[Value]:
+    return CONVENIENCE_VARIABLES.get(name)
+
+
+def set_convenience_variable(name: str, value: Any) -> None:
+    CONVENIENCE_VARIABLES[name] = value if isinstance(value, Value) else Value(value)
+
+
+def parse_and_eval(expression: str) -> Value:
+    """
+    Supports the names of VARIABLES, convenience variables, integer literals, member access, subscripts, the
+    arithmetic, comparison and logical operators and sizeof of a whole expression.
+    """
+    EVALUATED.append(expression)
+    return _evaluate(expression)
+
+
+def _evaluate(expression: str) -> Value:
+    sizeof = _SIZEOF_REGEX.match(expression)
+    if sizeof is not None:
+        global _AVOID_SIDE_EFFECTS
+        _AVOID_SIDE_EFFECTS = True
+        try:
+            operand = _evaluate(sizeof.group(1))
+        finally:
+            _AVOID_SIDE_EFFECTS = False
+        return Value._from_contents(TYPES["unsigned long"], _pack(TYPES["unsigned long"], operand.type.sizeof), None)
+
+    python = []
+    values = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _EXPRESSION_TOKEN_REGEX.match(expression, pos)
+        if match is None:
+            raise error("A syntax error in expression, near `{}'.".format(expression[pos:]))
+        pos = match.end()
+        name, number, operator = match.groups()
+
+        previous = python[-1] if python else None
+        if name is not None and previous in ("[\"", ".dereference()[\""):
+            python.append(name + "\"]")
+        elif name is not None:
+            if name.startswith("$"):
+                value = CONVENIENCE_VARIABLES.get(name[1:])
+            else:
+                value = VARIABLES.get(name)
+            if value is None:
+                raise error('No symbol "{}" in current context.'.format(name))
+            python.append("_values[{}]".format(len(values)))
+            values.append(value)
+        elif number is not None:
+            python.append(number)
+        elif operator == ".":
+            python.append("[\"")
+        elif operator == "->":
+            python.append(".dereference()[\"")
+        else:
+            python.append(_PYTHON_OPERATORS.get(operator, operator))
+
+    try:
+        result = eval("".join(python), {"__builtins__": {}}, {"_values": values})
+    except SyntaxError:
+        raise error("A syntax error in expression, near `'.")
+    return result if isinstance(result, Value) else Value(result)
+
+
+def default_visualizer(value: Value) -> Any:
+    for printer in pretty_printers:
+        if getattr(printer, "enabled", True):
+            visualizer = printer(value)
+            if visualizer is not None:
+                return visualizer
+    return None
+
+
+# Commands and parameters
+
+class CommandClassEnum(Enum):
+    COMMAND_NONE = auto()
+    COMMAND_RUNNING = auto()
+    COMMAND_DATA = auto()
+    COMMAND_STACK = auto()
+    COMMAND_FILES = auto()
+    COMMAND_SUPPORT = auto()
+    COMMAND_STATUS = auto()
+    COMMAND_BREAKPOINTS = auto()
+    COMMAND_TRACEPOINTS = auto()
+    COMMAND_USER = auto()
+    COMMAND_OBSCURE = auto()
+    COMMAND_MAINTENANCE = auto()
+
+
+COMMAND_NONE = CommandClassEnum.COMMAND_NONE
+COMMAND_RUNNING = CommandClassEnum.COMMAND_RUNNING
+COMMAND_DATA = CommandClassEnum.COMMAND_DATA
+COMMAND_STACK = CommandClassEnum.COMMAND_STACK
+COMMAND_FILES = CommandClassEnum.COMMAND_FILES
+COMMAND_SUPPORT = CommandClassEnum.COMMAND_SUPPORT
+COMMAND_STATUS = CommandClassEnum.COMMAND_STATUS
+COMMAND_BREAKPOINTS = CommandClassEnum.COMMAND_BREAKPOINTS
+COMMAND_TRACEPOINTS = CommandClassEnum.COMMAND_TRACEPOINTS
+COMMAND_USER = CommandClassEnum.COMMAND_USER
+COMMAND_OBSCURE = CommandClassEnum.COMMAND_OBSCURE
+COMMAND_MAINTENANCE = CommandClassEnum.COMMAND_MAINTENANCE
+
+
+class CompleteEnum(Enum):
+    COMPLETE_NONE = auto()
+    COMPLETE_FILENAME = auto()
+    COMPLETE_LOCATION = auto()
+    COMPLETE_COMMAND = auto()
+    COMPLETE_SYMBOL = auto()
+    COMPLETE_EXPRESSION = auto()
+
+
+COMPLETE_NONE = CompleteEnum.COMPLETE_NONE
+COMPLETE_FILENAME = CompleteEnum.COMPLETE_FILENAME
+COMPLETE_LOCATION = CompleteEnum.COMPLETE_LOCATION
+COMPLETE_COMMAND = CompleteEnum.COMPLETE_COMMAND
+COMPLETE_SYMBOL = CompleteEnum.COMPLETE_SYMBOL
+COMPLETE_EXPRESSION = CompleteEnum.COMPLETE_EXPRESSION
+
+# Registered commands by their name
+COMMANDS: Dict[str, 'Command'] = {}
+
+
+class Command:
+    def __init__(self, name: str, command_class: CommandClassEnum, completer_class: CompleteEnum = None,
+                 prefix: bool = False) -> None:
+        super().__init__()
+        COMMANDS[name] = self
+
+    def dont_repeat(self) -> bool:
+        return False
+
+
+class ParameterEnum(Enum):
+    PARAM_BOOLEAN = auto()
+    PARAM_AUTO_BOOLEAN = auto()
+    PARAM_UINTEGER = auto()
+    PARAM_INTEGER = auto()
+    PARAM_STRING = auto()
+    PARAM_STRING_NOESCAPE = auto()
+    PARAM_OPTIONAL_FILENAME = auto()
+    PARAM_FILENAME = auto()
+    PARAM_ZINTEGER = auto()
+    PARAM_ZUINTEGER = auto()
+    PARAM_ZUINTEGER_UNLIMITED = auto()
+    PARAM_ENUM = auto()
+
+
+PARAM_BOOLEAN = ParameterEnum.PARAM_BOOLEAN
+PARAM_AUTO_BOOLEAN = ParameterEnum.PARAM_AUTO_BOOLEAN
+PARAM_UINTEGER = ParameterEnum.PARAM_UINTEGER
+PARAM_INTEGER = ParameterEnum.PARAM_INTEGER
+PARAM_STRING = ParameterEnum.PARAM_STRING
+PARAM_STRING_NOESCAPE = ParameterEnum.PARAM_STRING_NOESCAPE
+PARAM_OPTIONAL_FILENAME = ParameterEnum.PARAM_OPTIONAL_FILENAME
+PARAM_FILENAME = ParameterEnum.PARAM_FILENAME
+PARAM_ZINTEGER = ParameterEnum.PARAM_ZINTEGER
+PARAM_ZUINTEGER = ParameterEnum.PARAM_ZUINTEGER
+PARAM_ZUINTEGER_UNLIMITED = ParameterEnum.PARAM_ZUINTEGER_UNLIMITED
+PARAM_ENUM = ParameterEnum.PARAM_ENUM
+
+
+class Parameter:
+    def __init__(self, name: str, command_class: CommandClassEnum, parameter_class: ParameterEnum,
+                 enum_sequence: Iterable[str] = None) -> None:
+        super().__init__()
+        self.value = None
+        PARAMETERS[name] = self
+
+
+# Values of GDB's own parameters and of the registered Parameter objects by their name
+PARAMETERS: Dict[str, Any] = {
+    "print elements": 200,
+    "may-call-functions": True,
+}
+
+
+def parameter(name: str) -> Any:
+    if name not in PARAMETERS:
+        raise RuntimeError("Could not find parameter `{}'.".format(name))
+    value = PARAMETERS.get(name)
+    if isinstance(value, Parameter):
+        return value.value
+    return value
+
+
+def execute(command: str, from_tty: bool = False, to_string: bool = False) -> Optional[str]:
+    words = command.split()
+    if command == "show endian":
+        output = "The target endianness is set automatically (currently little endian).\n"
+    elif len(words) == 3 and words[0] == "set" and isinstance(PARAMETERS.get(words[1]), bool):
+        PARAMETERS[words[1]] = words[2] == "on"
+        output = ""
+    else:
+        raise error("Undefined command: \"{}\".".format(command))
+    return output if to_string else None
+
+
+# Events
+
+_POSTED_EVENTS: List[Callable[[], None]] = []
+
+
+def post_event(event: Callable[[], None]) -> None:
+    _POSTED_EVENTS.append(event)
+
+
+def run_posted_events() -> int:
+    """Test only: Runs the posted events (including the ones posted meanwhile) like the event loop of GDB would"""
+    count = 0
+    while _POSTED_EVENTS:
+        _POSTED_EVENTS.pop(0)()
+        count += 1
+    return count
+
+
+class EventRegistry:
+    def __init__(self) -> None:
+        super().__init__()
+        self.handlers: List[Callable[..., None]] = []
+
+    def connect(self, handler: Callable[..., None]) -> None:
+        self.handlers.append(handler)
+
+    def disconnect(self, handler: Callable[..., None]) -> None:
+        self.handlers.remove(handler)
+
+    def notify(self, event: Any = None) -> None:
+        """Test only: Calls the connected handlers"""
+        for handler in list(self.handlers):
+            handler(event)
+
+
+class events:
+    stop = EventRegistry()
+    cont = EventRegistry()
+    exited = EventRegistry()
+    new_objfile = EventRegistry()
+    free_objfile = EventRegistry()
+    clear_objfiles = EventRegistry()
+    inferior_call = EventRegistry()
+    memory_changed = EventRegistry()
+    register_changed = EventRegistry()
+    before_prompt = EventRegistry()
+
+
+# Program spaces and symbols
+
+class Progspace:
+    filename = None
+
+    def is_valid(self) -> bool:
+        return True
+
+    def objfiles(self) -> List['Objfile']:
+        return []
+
+
+class Objfile:
+    filename = ""
+    username = ""
+    progspace = None
+
+    def is_valid(self) -> bool:
+        return True
+
+
+_PROGSPACE = Progspace()
+
+
+def current_progspace() -> Progspace:
+    return _PROGSPACE
+
+
+def objfiles() -> List[Objfile]:
+    return []
+
+
+def lookup_symbol(name: str, block: Any = None, domain: Any = None) -> Tuple[Optional[Any], bool]:
+    return None, False
+
+
+def lookup_global_symbol(name: str, domain: Any = None) -> Optional[Any]:
+    return None
+
+
+def lookup_static_symbol(name: str, domain: Any = None) -> Optional[Any]:
+    return None
+
+
+def selected_thread() -> Optional[Any]:
+    return None
+
+
+_SELECTED_FRAME = None
+
+
+def select_frame(frame: Optional['Frame']) -> None:
+    """Test only: Makes frame the result of selected_frame and newest_frame"""
+    global _SELECTED_FRAME
+    _SELECTED_FRAME = frame
+
+
+def newest_frame() -> 'Frame':
+    return selected_frame()
+
+
+def selected_frame() -> 'Frame':
+    if _SELECTED_FRAME is None:
+        raise error("No stack.")
+    return _SELECTED_FRAME
+
+
+# The mock inferior has at most one thread with one frame. Frames only provide the scopes of their variables
+
+class Symtab:
+    filename = ""
+    objfile = None
+
+
+class Symbol:
+    def __init__(self, name: str, type: 'Type', is_argument: bool = False, is_variable: bool = True,
+                 symtab: Optional[Symtab] = None, value: Optional['Value'] = None) -> None:
+        super().__init__()
+
+        self.name = name
+        self.type = type
+        self.is_argument = is_argument
+        self.is_variable = is_variable and not is_argument
+        self.symtab = symtab
+        self._value = value
+
+    def value(self, frame: Optional['Frame'] = None) -> 'Value':
+        if self._value is None:
+            raise error("Cannot compute the value of {}".format(self.name))
+        return self._value
+
+
+class Block:
+    def __init__(self, symbols: Iterable[Symbol] = (), superblock: Optional['Block'] = None,
+                 function: Optional[Symbol] = None) -> None:
+        super().__init__()
+
+        self.symbols = list(symbols)
+        self.superblock = superblock
+        self.function = function
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+
+class Frame:
+    def __init__(self, block: Optional[Block] = None) -> None:
+        super().__init__()
+        self._block = block
+
+    def block(self) -> Block:
+        if self._block is None:
+            raise RuntimeError("Cannot locate block for frame.")
+        return self._block
+
+    def name(self) -> Optional[str]:
+        block = self._block
+        while block is not None and block.function is None:
+            block = block.superblock
+        return None if block is None else block.function.name
+
+    def older(self) -> Optional['Frame']:
+        return None
+
+    def select(self) -> None:
+        select_frame(self)
+
+
+class InferiorThread:
+    num = 1
+    global_num = 1
+
+    def switch(self) -> None:
+        pass
+
+
+class LazyString:
+    pass
@@ -0,0 +1,21 @@
+# Stand-in for gdb.printing, see gdb/__init__.py
+from typing import Any, List, Optional
+
+import gdb
+
+
+class PrettyPrinter:
+    def __init__(self, name: str, subprinters: Optional[List[Any]] = None) -> None:
+        super().__init__()
+
+        self.name = name
+        self.subprinters = subprinters
+        self.enabled = True
+
+    def __call__(self, val: gdb.Value) -> Any:
+        raise NotImplementedError("PrettyPrinter __call__")
+
+
+def register_pretty_printer(obj: Any, printer: Any, replace: bool = False) -> None:
+    # Only global printers are supported
+    gdb.pretty_printers.insert(0, printer)
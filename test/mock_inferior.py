@@ -0,0 +1,132 @@
+import struct
+from typing import List, Tuple, Union, Sequence
+
+import gdb
+
+# Start of the memory region the objects of the tests are allocated in
+HEAP_START = 0x10000
+
+
+def _alignment(t: gdb.Type) -> int:
+    t = t.strip_typedefs()
+    if t.code == gdb.TYPE_CODE_ARRAY:
+        return _alignment(t.target())
+    if t.code == gdb.TYPE_CODE_STRUCT or t.code == gdb.TYPE_CODE_UNION:
+        return max((_alignment(f.type) for f in t.fields()), default=1)
+    return max(min(t.sizeof, 8), 1)
+
+
+def _align(offset: int, alignment: int) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def struct_type(name: str, fields: Sequence[Tuple[str, gdb.Type]], bases: Sequence[gdb.Type] = (),
+                template_arguments: Sequence[gdb.Type] = ()) -> gdb.Type:
+    """
+    Creates a struct type with the usual x86-64 layout and makes it available to gdb.lookup_type.
+    :param name: The full name including template arguments, e.g. "Vector<int>"
+    :param fields: The names and types of the data members in declaration order
+    :param bases: The (non-virtual) base classes
+    :param template_arguments: The types returned by template_argument()
+    """
+    offset = 0
+    alignment = 1
+    gdb_fields = []
+
+    for base in bases:
+        offset = _align(offset, _alignment(base))
+        gdb_fields.append(gdb.Field(base.name, base, offset * 8, is_base_class=True))
+        offset += base.sizeof
+        alignment = max(alignment, _alignment(base))
+
+    for field_name, field_type in fields:
+        offset = _align(offset, _alignment(field_type))
+        gdb_fields.append(gdb.Field(field_name, field_type, offset * 8))
+        offset += field_type.sizeof
+        alignment = max(alignment, _alignment(field_type))
+
+    t = gdb.Type(gdb.TYPE_CODE_STRUCT, name, max(_align(offset, alignment), 1), None, gdb_fields,
+                 list(template_arguments))
+    gdb.TYPES[name] = t
+    return t
+
+
+def pack(t: gdb.Type, value: Union[int, float]) -> bytes:
+    """Encodes a scalar value like the inferior stores it"""
+    t = t.strip_typedefs()
+    if t.code == gdb.TYPE_CODE_FLT:
+        return struct.pack("<f" if t.sizeof == 4 else "<d", value)
+    return (int(value) & ((1 << (8 * t.sizeof)) - 1)).to_bytes(t.sizeof, "little")
+
+
+class MockInferior:
+    """
+    Builds the memory image of a fresh gdb.Inferior and selects it. Objects are allocated one after another in a single
+    memory region, everything outside of it is unreadable.
+    """
+
+    def __init__(self, size: int = 1 << 20) -> None:
+        super().__init__()
+
+        self.inferior = gdb.Inferior()
+        self.inferior.add_region(HEAP_START, size)
+        self._next_address = HEAP_START
+        gdb.select_inferior(self.inferior)
+
+    @property
+    def reads(self) -> List[Tuple[int, int]]:
+        """The (address, length) pairs of all memory transfers so far"""
+        return self.inferior.reads
+
+    def reset_reads(self) -> None:
+        self.inferior.reads.clear()
+
+    def allocate(self, size: int, alignment: int = 16) -> int:
+        address = _align(self._next_address, alignment)
+        self._next_address = address + max(size, 1)
+        return address
+
+    def write(self, address: int, data: bytes) -> None:
+        self.inferior.write_memory(address, data)
+
+    def store(self, t: gdb.Type, address: int, value: Union[int, float]) -> None:
+        self.write(address, pack(t, value))
+
+    def value_at(self, t: gdb.Type, address: int) -> gdb.Value:
+        return gdb.Value(address).cast(t.pointer()).dereference()
+
+    def new_array(self, element_type: gdb.Type, elements: Sequence[Union[int, float]]) -> int:
+        address = self.allocate(len(elements) * element_type.sizeof)
+        self.write(address, b"".join(pack(element_type, x) for x in elements))
+        return address
+
+    def new_string(self, text: str) -> int:
+        data = text.encode() + b"\0"
+        address = self.allocate(len(data), 1)
+        self.write(address, data)
+        return address
+
+    def new_struct(self, t: gdb.Type, **values: Union[int, float]) -> gdb.Value:
+        """Allocates a struct and initializes the named scalar members. All other bytes are zero."""
+        address = self.allocate(t.sizeof, _alignment(t))
+        for name, value in values.items():
+            field = t[name]
+            self.store(field.type, address + field.bitpos // 8, value)
+        return self.value_at(t, address)
+
+
+def vector_type(element_type: gdb.Type) -> gdb.Type:
+    """A std::vector like container: A pointer to the elements, the number of elements and the capacity"""
+    size_t = gdb.lookup_type("size_t")
+    return struct_type("Vector<{}>".format(element_type), [
+        ("m_data", element_type.pointer()),
+        ("m_size", size_t),
+        ("m_capacity", size_t),
+    ], template_arguments=[element_type])
+
+
+def make_vector(inferior: MockInferior, element_type: gdb.Type, elements: Sequence[Union[int, float]],
+                capacity: int = None) -> gdb.Value:
+    capacity = len(elements) if capacity is None else capacity
+    data = inferior.new_array(element_type, list(elements) + [0] * (capacity - len(elements)))
+    return inferior.new_struct(vector_type(element_type), m_data=data, m_size=len(elements), m_capacity=capacity)
@@ -0,0 +1,36 @@
+import unittest
+
+from breaker import CircuitBreaker
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def test_quarantine(self):
+        breaker = CircuitBreaker(3)
+
+        self.assertFalse(breaker.record_failure("vector", "std::vector<int>"))
+        self.assertFalse(breaker.record_failure("vector", "std::vector<int>"))
+        self.assertFalse(breaker.is_quarantined("vector", "std::vector<int>"))
+
+        self.assertTrue(breaker.record_failure("vector", "std::vector<int>"))
+        self.assertTrue(breaker.is_quarantined("vector", "std::vector<int>"))
+        self.assertFalse(breaker.is_quarantined("vector", "std::vector<float>"))
+
+        self.assertListEqual([("vector", "std::vector<int>", 3)], breaker.quarantined())
+
+    def test_success_resets(self):
+        breaker = CircuitBreaker(2)
+
+        breaker.record_failure("vector", "std::vector<int>")
+        breaker.record_success("vector", "std::vector<int>")
+        self.assertFalse(breaker.record_failure("vector", "std::vector<int>"))
+        self.assertFalse(breaker.is_quarantined("vector", "std::vector<int>"))
+
+    def test_release(self):
+        breaker = CircuitBreaker(1)
+
+        breaker.record_failure("vector", "std::vector<int>")
+        breaker.record_failure("list", "std::list<int>")
+
+        breaker.release(["vector"])
+        self.assertFalse(breaker.is_quarantined("vector", "std::vector<int>"))
+        self.assertTrue(breaker.is_quarantined("list", "std::list<int>"))
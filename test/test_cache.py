@@ -0,0 +1,93 @@
+import unittest
+
+from cache import LRUCache, PageCache, ScopedCaches
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    def test_get(self):
+        cache = LRUCache(2)
+        cache["a"] = 1
+
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(2, cache.get("b", 2))
+
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache["a"] = 1
+        cache["b"] = 2
+
+        # Touch "a" so that "b" is the least recently used entry
+        cache.get("a")
+        cache["c"] = 3
+
+        self.assertEqual(2, len(cache))
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+
+
+class ScopedCachesTestCase(unittest.TestCase):
+    def test_get(self):
+        caches = ScopedCaches(dict)
+
+        caches.get("a")["key"] = 1
+
+        self.assertEqual(1, caches.get("a")["key"])
+        self.assertNotIn("key", caches.get("b"))
+
+    def test_evict(self):
+        caches = ScopedCaches(dict)
+        caches.get("a")["key"] = 1
+        caches.get("b")["key"] = 2
+        caches.get("c")["key"] = 3
+
+        caches.evict("a")
+        caches.evict_if(lambda scope: scope == "b")
+
+        self.assertEqual(1, len(caches))
+        self.assertNotIn("key", caches.get("a"))
+        self.assertEqual(3, caches.get("c")["key"])
+
+
+class PageCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.memory = bytes(range(256)) * 4
+        self.reads = []
+
+    def read(self, address: int, length: int) -> bytes:
+        if address + length > len(self.memory):
+            raise ValueError("Cannot access memory at address 0x{:x}".format(address))
+        self.reads.append((address, length))
+        return self.memory[address:address + length]
+
+    def test_read(self):
+        cache = PageCache(self.read, page_size=64)
+
+        self.assertEqual(self.memory[10:20], cache.read(10, 10))
+        self.assertEqual(self.memory[20:30], cache.read(20, 10))
+        self.assertListEqual([(0, 64)], self.reads)
+
+        # Crosses a page boundary
+        self.assertEqual(self.memory[60:70], cache.read(60, 10))
+        self.assertListEqual([(0, 64), (64, 64)], self.reads)
+
+    def test_eviction(self):
+        cache = PageCache(self.read, page_size=64, max_pages=1)
+
+        cache.read(0, 1)
+        cache.read(64, 1)
+        cache.read(0, 1)
+        self.assertEqual(3, len(self.reads))
+
+        cache.clear()
+        cache.read(0, 1)
+        self.assertEqual(4, len(self.reads))
+
+    def test_unreadable_page(self):
+        self.memory = self.memory[:100]
+        cache = PageCache(self.read, page_size=64)
+
+        # The second page is only partially readable, so the exact range is read instead
+        self.assertEqual(self.memory[90:100], cache.read(90, 10))
+        self.assertRaises(ValueError, cache.read, 95, 10)
@@ -0,0 +1,75 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import gdb
+
+import dump
+import natvis
+import parser
+import printer
+from mock_inferior import MockInferior, make_vector, struct_type
+
+
+class _BrokenPrinter:
+    def to_string(self):
+        raise parser.ParserError("Unexpected token")
+
+
+def _broken_lookup(val):
+    return _BrokenPrinter() if val.type.strip_typedefs().name == "Broken" else None
+
+
+class DumpTestCase(unittest.TestCase):
+    def setUp(self):
+        self.inferior = MockInferior()
+
+        old_manager = printer.NATVIS_MANAGER
+        printer.NATVIS_MANAGER = natvis.NatvisManager()
+        printer.NATVIS_MANAGER.load_natvis_file(os.path.join(os.path.dirname(__file__), "data", "vector.natvis"))
+
+        self.printer = printer.NatvisPrettyPrinter("Natvis")
+        gdb.pretty_printers[:0] = [self.printer, _broken_lookup]
+
+        int_type = gdb.lookup_type("int")
+        broken = struct_type("Broken", [("m_value", int_type)])
+        values = make_vector(self.inferior, int_type, [1, 2])
+        count = self.inferior.value_at(int_type, self.inferior.new_array(int_type, [7]))
+        function = gdb.Symbol("main", int_type, is_variable=False)
+        block = gdb.Block([gdb.Symbol("values", values.type, value=values),
+                           gdb.Symbol("broken", broken, value=self.inferior.new_struct(broken)),
+                           gdb.Symbol("count", int_type, is_argument=True, value=count)], function=function)
+        gdb.select_frame(gdb.Frame(block))
+
+        def restore():
+            printer.NATVIS_MANAGER = old_manager
+            gdb.pretty_printers.remove(self.printer)
+            gdb.pretty_printers.remove(_broken_lookup)
+            gdb.select_frame(None)
+
+        self.addCleanup(restore)
+
+    def test_dump(self):
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            dump.DumpNatvis().invoke("--elements 2 " + path, False)
+        self.assertEqual("Wrote 3 values to {}\n".format(path), output.getvalue())
+
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+
+        location = {"thread": 1, "frame": 0, "function": "main"}
+        self.assertListEqual([
+            dict(location, name="values", type="Vector<int>", value="{ size=2 }",
+                 children=[{"name": "[capacity]", "type": "size_t", "value": "2"}, {"name": "[0]", "type": "int", "value": "1"}]),
+            # The failure of one visualizer is recorded and the dump continues
+            dict(location, name="broken", error="Unexpected token"),
+            dict(location, name="count", type="int", value="7"),
+        ], records)
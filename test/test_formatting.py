@@ -0,0 +1,93 @@
+import unittest
+
+import gdb
+
+import formatting
+import printer
+from mock_inferior import MockInferior, struct_type
+from natvis import DisplayStringParser
+from settings import SETTINGS
+
+
+class FormattingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.inferior = MockInferior()
+
+    def render(self, display_string, val):
+        renderer = formatting.DisplayStringRenderer(DisplayStringParser(display_string), printer.format_value)
+
+        def get_value(expression, convert=None):
+            if expression.isdigit():
+                return int(expression)
+            if expression == "this":
+                return val
+            return val[expression]
+
+        return renderer.render(get_value)
+
+    def test_format_specifiers(self):
+        int_type, char = gdb.lookup_type("int"), gdb.lookup_type("char")
+        point = struct_type("FormatPoint", [("x", int_type), ("y", int_type)])
+        formats = struct_type("Formats", [("m_value", int_type), ("m_char", char), ("m_name", char.pointer()),
+                                          ("m_values", int_type.pointer()), ("m_point", point.pointer())])
+        name = self.inferior.new_string("hello")
+        val = self.inferior.new_struct(formats, m_value=42, m_char=ord("A"), m_name=name,
+                                       m_values=self.inferior.new_array(int_type, [1, 2, 3]),
+                                       m_point=int(self.inferior.new_struct(point, x=1, y=2).address))
+
+        self.assertEqual("0x2a 42 052 0x2A", self.render("{m_value,x} {m_value,d} {m_value,o} {m_value,X}", val))
+        self.assertEqual("65 'A'", self.render("{m_char,c}", val))
+        self.assertEqual('0x{:x} "hello"'.format(name), self.render("{m_name}", val))
+        self.assertEqual('"hello" "hello" hello', self.render("{m_name,na} {m_name,s} {m_name,sb}", val))
+        self.assertEqual("{1, 2, 3} {0x1, 0x2}", self.render("{m_values,[3]} {m_values,[2]x}", val))
+        self.assertEqual('"hel"', self.render("{m_name,[3]}", val))
+        # na shows the object instead of the pointer and has no effect on other values
+        self.assertEqual("{x = 1, y = 2} 42", self.render("{m_point,na} {m_value,na}", val))
+
+    def test_read_string(self):
+        text = "a" * (formatting.STRING_CHUNK_SIZE * 2)
+        address = self.inferior.new_string(text)
+
+        self.assertEqual((text, False), formatting.read_string(address, 1, None))
+        self.assertEqual(("aaaa", True), formatting.read_string(address, 1, 4))
+        self.assertEqual(("aa", False), formatting.read_string(address, 1, None, 2))
+        self.assertEqual(("aa", True), formatting.read_string(address, 1, 2, 4))
+        # The string limit bounds the amount of memory read
+        self.inferior.reset_reads()
+        formatting.read_string(self.inferior.new_string("b" * 10000), 1, 100)
+        self.assertLessEqual(sum(length for _, length in self.inferior.reads), 4096)
+
+    def test_char_array_bound(self):
+        char = gdb.lookup_type("char")
+        name = struct_type("Name", [("m_name", char.array(3)), ("m_other", char.array(6))])
+        val = self.inferior.new_struct(name)
+        # m_name is not terminated, the string continues in m_other
+        self.inferior.write(int(val.address), b"abcdSECRET\0")
+
+        self.assertEqual('"abcd" "abcd" abcd', self.render("{m_name} {m_name,s} {m_name,sb}", val))
+        self.assertEqual('"SECRET"', self.render("{m_other}", val))
+
+        old_limit = SETTINGS.string_limit
+        SETTINGS.string_limit = 2
+        self.addCleanup(setattr, SETTINGS, "string_limit", old_limit)
+        self.assertEqual('"ab..."', self.render("{m_name}", val))
+
+    def test_wide_string(self):
+        char16 = gdb.lookup_type("char16_t")
+        text = self.inferior.new_array(char16, [ord(c) for c in "wide"] + [0])
+        val = gdb.Value(text).cast(char16.pointer())
+
+        executed = []
+        execute = gdb.execute
+
+        def count_execute(command, *args, **kwargs):
+            executed.append(command)
+            return execute(command, *args, **kwargs)
+
+        gdb.execute = count_execute
+        self.addCleanup(setattr, gdb, "execute", execute)
+        formatting._BYTE_ORDERS.clear()
+
+        self.assertEqual('"wide" wide', self.render("{this,su} {this,sub}", val))
+        # The byte order is only determined once
+        self.assertListEqual(["show endian"], executed)
@@ -0,0 +1,80 @@
+import unittest
+
+import logger
+
+
+class LoggerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.messages = []
+
+        old_handler, old_level = logger.handler, logger.level
+        logger.handler = self.messages.append
+        logger.reset_failures()
+
+        def restore():
+            logger.handler = old_handler
+            logger.level = old_level
+            logger.reset_failures()
+
+        self.addCleanup(restore)
+
+    def test_level(self):
+        logger.set_level("warning")
+
+        logger.info("{} is not written", "info")
+        logger.warning("{} is written", "warning")
+
+        self.assertListEqual(["warning is written"], self.messages)
+
+    def test_lazy_formatting(self):
+        logger.set_level("error")
+
+        def fail():
+            raise AssertionError("Disabled messages must not be formatted")
+
+        logger.debug(fail)
+        self.assertListEqual([], self.messages)
+
+    def test_failure_deduplication(self):
+        logger.set_level("warning")
+
+        for _ in range(100):
+            logger.log_failure(("type", "expr"), logger.WARNING, "Failed to evaluate '{}'", "expr")
+        logger.log_failure(("type", "other"), logger.WARNING, "Failed to evaluate '{}'", "other")
+
+        self.assertListEqual(["Failed to evaluate 'expr'",
+                              "Failed to evaluate 'expr' (repeated 10 times)",
+                              "Failed to evaluate 'expr' (repeated 100 times)",
+                              "Failed to evaluate 'other'"], self.messages)
+        self.assertEqual(100, logger.failure_counts()[("type", "expr")])
+
+        logger.reset_failures(lambda key: key[1] == "expr")
+        self.assertNotIn(("type", "expr"), logger.failure_counts())
+        self.assertIn(("type", "other"), logger.failure_counts())
+
+    def test_rate_limit(self):
+        logger.set_level("debug")
+        # The messages of the current second are used up
+        logger._window_start = float("inf")
+        logger._window_messages = logger.MAX_MESSAGES_PER_SECOND
+        self.addCleanup(setattr, logger, "_suppressed", 0)
+        self.addCleanup(setattr, logger, "_window_start", 0.0)
+
+        def fail():
+            raise AssertionError("Suppressed messages must not be formatted")
+
+        logger.debug(fail)
+        logger.log_failure("key", logger.WARNING, fail)
+        self.assertListEqual([], self.messages)
+
+    def test_failure_limit(self):
+        logger.set_level("error")
+
+        for i in range(logger.MAX_FAILURE_RECORDS + 10):
+            logger.log_failure(i, logger.WARNING, "Failure {}", i)
+
+        counts = logger.failure_counts()
+        self.assertEqual(logger.MAX_FAILURE_RECORDS, len(counts))
+        # The oldest failures were forgotten
+        self.assertNotIn(0, counts)
+        self.assertIn(logger.MAX_FAILURE_RECORDS + 9, counts)
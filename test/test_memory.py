@@ -0,0 +1,105 @@
+import gc
+import tracemalloc
+import unittest
+
+import natvis
+import templates
+
+# A std::vector like visualizer. The expressions are the same for every type like in the natvis files of large SDKs
+TYPE_TEMPLATE = """
+<Type Name="ns::Container{index}&lt;*&gt;">
+  <DisplayString Condition="_Mypair._Myval2._Mylast == nullptr">empty</DisplayString>
+  <DisplayString>{{ size={{_Mypair._Myval2._Mylast - _Mypair._Myval2._Myfirst}} }}</DisplayString>
+  <Expand>
+    <Item Name="[capacity]">_Mypair._Myval2._Myend - _Mypair._Myval2._Myfirst</Item>
+    <ArrayItems>
+      <Size>_Mypair._Myval2._Mylast - _Mypair._Myval2._Myfirst</Size>
+      <ValuePointer>_Mypair._Myval2._Myfirst</ValuePointer>
+    </ArrayItems>
+    <IndexListItems>
+      <Size>_Mysize</Size>
+      <ValueNode>_Map[($i + _Myoff) % _Mapsize]</ValueNode>
+    </IndexListItems>
+  </Expand>
+</Type>"""
+
+TYPE_COUNT = 2000
+# The model must use at most this fraction of the memory of plain objects with a __dict__ and a copy of every string
+MAX_MEMORY_RATIO = 0.7
+
+
+def _document_content(count: int) -> bytes:
+    types = "".join(TYPE_TEMPLATE.format(index=index) for index in range(count))
+    return ('<?xml version="1.0" encoding="utf-8"?>'
+            '<AutoVisualizer xmlns="http://schemas.microsoft.com/vstudio/debugger/natvis/2010">'
+            + types + '</AutoVisualizer>').encode()
+
+
+class _PlainObject:
+    """An object of the model as it would look without __slots__ and interned strings"""
+
+
+def _plain_copy(obj, copies):
+    if isinstance(obj, str):
+        # Every occurrence gets its own string. Slicing an extended string creates a new object even for interned ones
+        return (obj + " ")[:-1]
+    if id(obj) in copies:
+        return copies[id(obj)]
+
+    if isinstance(obj, (list, tuple)):
+        copy = type(obj)(_plain_copy(x, copies) for x in obj)
+    elif hasattr(obj, "__slots__") and not hasattr(obj, "__dict__"):
+        copy = _PlainObject()
+        copies[id(obj)] = copy
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(obj, name):
+                    setattr(copy, name, _plain_copy(getattr(obj, name), copies))
+        return copy
+    else:
+        # Numbers, enums, None, ...
+        copy = obj
+
+    copies[id(obj)] = copy
+    return copy
+
+
+class ModelMemoryTestCase(unittest.TestCase):
+    def test_slots(self):
+        document = natvis.NatvisDocument.parse_content("test.natvis", _document_content(1))
+        t = document.types[0]
+
+        objects = [t, t.template_type, t.display_parsers[0], t.display_parsers[1].parser,
+                   t.display_parsers[1].parser.code_parts[0], natvis.NatvisTypeInstance(t, [])] + t.expand_items
+        for obj in objects:
+            self.assertFalse(hasattr(obj, "__dict__"), type(obj).__name__)
+
+    def test_interned_expressions(self):
+        document = natvis.NatvisDocument.parse_content("test.natvis", _document_content(2))
+        first, second = document.types
+
+        self.assertIs(first.expand_items[1].size_expr, second.expand_items[1].size_expr)
+        self.assertIs(first.display_parsers[0].condition, second.display_parsers[0].condition)
+        self.assertIs(first.template_type.name, templates.parse_template_type("ns::Container0<int>").name)
+
+    def test_memory_per_type(self):
+        content = _document_content(TYPE_COUNT)
+        gc.collect()
+
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        document = natvis.NatvisDocument.parse_content("test.natvis", content)
+        gc.collect()
+        used, _ = tracemalloc.get_traced_memory()
+
+        # The baseline is measured with the same interpreter since the object sizes differ between Python versions
+        tracemalloc.clear_traces()
+        copies = {}
+        plain_types = _plain_copy(document.types, copies)
+        # Only the copied model counts
+        del copies
+        gc.collect()
+        plain_used, _ = tracemalloc.get_traced_memory()
+
+        self.assertEqual(TYPE_COUNT, len(plain_types))
+        self.assertLess(used, plain_used * MAX_MEMORY_RATIO)
@@ -0,0 +1,102 @@
+import unittest
+
+import gdb
+
+import native
+import parser
+from mock_inferior import MockInferior, make_vector, struct_type
+from settings import SETTINGS
+
+
+class TranslateTestCase(unittest.TestCase):
+    def setUp(self):
+        int_type = gdb.lookup_type("int")
+        base = struct_type("NativeBase", [("m_base", int_type)])
+        self.type = struct_type("NativeDerived", [("m_size", int_type), ("m_data", int_type.pointer())],
+                                bases=[base])
+
+    def test_members(self):
+        self.assertEqual("$natvis_this->m_data[$natvis_this->m_size - 1]",
+                         native.translate(self.type, "m_data[m_size - 1]"))
+        self.assertEqual("$natvis_this->m_base + $natvis_this->m_size",
+                         native.translate(self.type, "m_base + this->m_size"))
+        # Members of other objects, scoped names, literals and number suffixes are kept
+        self.assertEqual("g_other.m_size + ns::m_size + 10u + 0x1f",
+                         native.translate(self.type, "g_other.m_size + ns::m_size + 10u + 0x1f"))
+        self.assertEqual("\"m_size\" == 'm'", native.translate(self.type, "\"m_size\" == 'm'"))
+
+    def test_casts(self):
+        self.assertEqual("(unsigned int)$natvis_this->m_size", native.translate(self.type, "(unsigned int)m_size"))
+        self.assertEqual("static_cast<char>($natvis_this->m_size)",
+                         native.translate(self.type, "static_cast<char>(m_size)"))
+        self.assertEqual("sizeof($natvis_this->m_base)", native.translate(self.type, "sizeof(m_base)"))
+
+    def test_side_effects(self):
+        self.assertIsNone(native.translate(self.type, "size()"))
+        self.assertIsNone(native.translate(self.type, "m_size = 0"))
+        self.assertIsNone(native.translate(self.type, "m_size++"))
+        self.assertIsNone(native.translate(self.type, "m_size += 1"))
+        self.assertIsNotNone(native.translate(self.type, "m_size <= 1 && m_size != 0 && m_size >= 0"))
+
+
+class EvaluateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.inferior = MockInferior()
+        self.vector = make_vector(self.inferior, gdb.lookup_type("int"), [4, 5, 6])
+        gdb.EVALUATED.clear()
+
+        old_backend = SETTINGS.expression_backend
+        SETTINGS.expression_backend = "gdb"
+        self.addCleanup(setattr, SETTINGS, "expression_backend", old_backend)
+
+    def test_evaluate(self):
+        self.assertTrue(native.is_enabled())
+        self.assertEqual(6, int(native.evaluate(self.vector, "m_data[m_size - 1]")))
+        self.assertEqual(9, int(native.evaluate(self.vector, "this->m_data[1] + m_data[0]")))
+
+        # The pointer to the object is passed in a convenience variable, so the translations are shared by all objects
+        other = make_vector(self.inferior, gdb.lookup_type("int"), [7])
+        self.assertEqual(7, int(native.evaluate(other, "m_data[m_size - 1]")))
+        # Every translation is checked once
+        self.assertEqual(2, len([expression for expression in gdb.EVALUATED if expression.startswith("sizeof(")]))
+
+    def test_fallback(self):
+        self.assertIs(native.NOT_EVALUATED, native.evaluate(self.vector, "m_size ? 1 : 0"))
+        self.assertIs(native.NOT_EVALUATED, native.evaluate(self.vector, "m_size ? 1 : 0"))
+        # GDB is not asked again for expressions it could not parse
+        self.assertEqual(1, len(gdb.EVALUATED))
+
+        self.assertIs(native.NOT_EVALUATED, native.evaluate(self.vector, "size()"))
+        self.assertEqual(1, len(gdb.EVALUATED))
+
+    def test_runtime_error(self):
+        empty = make_vector(self.inferior, gdb.lookup_type("int"), [], capacity=4)
+        error = native.evaluate(empty, "m_capacity / m_size")
+        self.assertEqual("Division by zero", error)
+        self.assertIsInstance(error, parser.EvaluationError)
+
+        # The error only affects the object it happened for
+        self.assertEqual(1, int(native.evaluate(self.vector, "m_capacity / m_size")))
+        self.assertEqual("Division by zero", native.evaluate(empty, "m_capacity / m_size"))
+
+    def test_no_inferior_calls(self):
+        may_call = []
+        parse_and_eval = gdb.parse_and_eval
+
+        def record_setting(expression):
+            may_call.append(gdb.parameter("may-call-functions"))
+            return parse_and_eval(expression)
+
+        gdb.parse_and_eval = record_setting
+        self.addCleanup(setattr, gdb, "parse_and_eval", parse_and_eval)
+
+        empty = make_vector(self.inferior, gdb.lookup_type("int"), [], capacity=4)
+        self.assertEqual(3, int(native.evaluate(self.vector, "m_capacity")))
+        self.assertEqual("Division by zero", native.evaluate(empty, "m_capacity / m_size"))
+        # Overloaded operators could otherwise resume the inferior. The setting is restored after errors as well
+        self.assertListEqual([False] * 4, may_call)
+        self.assertTrue(gdb.parameter("may-call-functions"))
+
+    def test_backend_setting(self):
+        SETTINGS.expression_backend = "parser"
+        self.assertFalse(native.is_enabled())
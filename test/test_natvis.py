@@ -1,8 +1,11 @@
 import os
+import shutil
+import tempfile
 import unittest
 
 import templates
-from natvis import NatvisDocument, DisplayStringParser, FormatSpecifiers, NatvisManager
+from natvis import NatvisDocument, DisplayStringParser, FormatSpecifiers, NatvisManager, parse_index_pattern, \
+    member_paths
 
 
 class DisplayStringParserTestCase(unittest.TestCase):
@@ -60,6 +63,15 @@ class DisplayStringParserTestCase(unittest.TestCase):
         self.assertIsNone(parser.code_parts[2].formatspecs)
         self.assertIsNone(parser.code_parts[3].formatspecs)
 
+    def test_literal_parts(self):
+        parser = DisplayStringParser("{{ size={size} }}")
+
+        self.assertEqual(["{ size=", " }"], parser.literal_parts)
+
+        parser = DisplayStringParser("{x}{y}")
+
+        self.assertEqual(["", "", ""], parser.literal_parts)
+
     def test_format(self):
         parser = DisplayStringParser("{x,d}")
 
@@ -70,6 +82,78 @@ class DisplayStringParserTestCase(unittest.TestCase):
 
         self.assertEqual([FormatSpecifiers.DECIMAL_INT], parser.code_parts[0].formatspecs)
 
+    def test_array_length(self):
+        parser = DisplayStringParser("{data,[size]na} {ptr,5x}")
+
+        self.assertEqual(2, len(parser.code_parts))
+        self.assertEqual("data", parser.code_parts[0].base_expression)
+        self.assertEqual("size", parser.code_parts[0].array_length)
+        self.assertEqual([FormatSpecifiers.NO_ADDRESS], parser.code_parts[0].formatspecs)
+
+        self.assertEqual("ptr", parser.code_parts[1].base_expression)
+        self.assertEqual("5", parser.code_parts[1].array_length)
+        self.assertEqual([FormatSpecifiers.HEX_INT], parser.code_parts[1].formatspecs)
+
+
+class IndexPatternTestCase(unittest.TestCase):
+    def test_simple(self):
+        pattern = parse_index_pattern("ptr[$i]")
+
+        self.assertEqual("ptr", pattern.base)
+        self.assertIsNone(pattern.offset)
+        self.assertIsNone(pattern.modulus)
+
+    def test_offset(self):
+        pattern = parse_index_pattern("this->m_data[$i + m_first]")
+
+        self.assertEqual("this->m_data", pattern.base)
+        self.assertEqual("m_first", pattern.offset)
+        self.assertIsNone(pattern.modulus)
+
+    def test_ring_buffer(self):
+        pattern = parse_index_pattern("data[(head + $i) % cap]")
+
+        self.assertEqual("data", pattern.base)
+        self.assertEqual("head", pattern.offset)
+        self.assertEqual("cap", pattern.modulus)
+
+    def test_not_affine(self):
+        self.assertIsNone(parse_index_pattern("ptr[$i * 2]"))
+        self.assertIsNone(parse_index_pattern("ptr[$i + a == b]"))
+        self.assertIsNone(parse_index_pattern("ptr[($i + head) % cap * 2]"))
+        self.assertIsNone(parse_index_pattern("ptr[$i]->value"))
+        self.assertIsNone(parse_index_pattern("a + ptr[$i]"))
+        self.assertIsNone(parse_index_pattern("(char*)ptr[$i]"))
+        self.assertIsNone(parse_index_pattern("nodes[$i][0]"))
+
+
+class MemberPathsTestCase(unittest.TestCase):
+    def test_paths(self):
+        self.assertListEqual(["m_pair.first", "m_first"], member_paths("m_pair.first + this->m_first"))
+        self.assertListEqual(["m_data", "m_size"], member_paths("m_data[$i] && m_size"))
+        self.assertListEqual(["ptr"], member_paths("ptr->value"))
+
+    def test_excluded(self):
+        self.assertListEqual([], member_paths("&m_value"))
+        self.assertListEqual([], member_paths("$T1"))
+        self.assertListEqual([], member_paths("1.5f"))
+        self.assertListEqual(["x"], member_paths("std::size(x)"))
+
+    def test_address_taken(self):
+        content = b"""<?xml version="1.0" encoding="utf-8"?>
+<AutoVisualizer xmlns="http://schemas.microsoft.com/vstudio/debugger/natvis/2010">
+  <Type Name="Pair">
+    <DisplayString>{m_first} {m_second}</DisplayString>
+    <Expand>
+      <Item Name="[first]">&amp;m_first</Item>
+      <Item Name="[both]">m_first &amp;&amp; m_second</Item>
+    </Expand>
+  </Type>
+</AutoVisualizer>"""
+        natvis_type = NatvisDocument.parse_content("pair.natvis", content).types[0]
+        # The evaluator would find the value read for m_first when it evaluates the operand of &m_first
+        self.assertListEqual(["m_second"], natvis_type.member_paths())
+
 
 class NatvisTestCase(unittest.TestCase):
     def print_document(self, doc: NatvisDocument):
@@ -119,3 +203,49 @@ class NatvisManagerTestCase(unittest.TestCase):
         self.assertIsNotNone(manager.lookup_type(templates.parse_template_type("glm::tvec4<int>")))
 
         self.assertIsNone(manager.lookup_type(templates.parse_template_type("lua_State")))
+
+    def test_reload_changed_files(self):
+        manager = NatvisManager()
+
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+
+        path = os.path.join(temp_dir, "test.natvis")
+        shutil.copy(os.path.join(os.path.dirname(__file__), "data", "glm.natvis"), path)
+        manager.load_natvis_file(path)
+
+        self.assertListEqual([], manager.reload_changed_files())
+
+        shutil.copy(os.path.join(os.path.dirname(__file__), "data", "lua.natvis"), path)
+        replaced = []
+        manager.reload_listeners.append(replaced.extend)
+
+        self.assertListEqual([path], manager.reload_changed_files())
+        self.assertEqual(6, len(replaced))
+
+        self.assertIsNone(manager.lookup_type(templates.parse_template_type("glm::tvec1<float>")))
+        self.assertIsNotNone(manager.lookup_type(templates.parse_template_type("lua_State")))
+
+    def test_discovery(self):
+        manager = NatvisManager()
+
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+
+        source_dir = os.path.join(temp_dir, "src")
+        os.mkdir(source_dir)
+        shutil.copy(os.path.join(os.path.dirname(__file__), "data", "glm.natvis"), temp_dir)
+
+        filename = os.path.join(source_dir, "main.cpp")
+        typename = templates.parse_template_type("glm::tvec1<float>")
+
+        self.assertFalse(manager.is_discovered(filename))
+        self.assertIsNotNone(manager.lookup_type(typename, filename))
+        self.assertTrue(manager.is_discovered(filename))
+        self.assertIn(temp_dir, manager.searched_directories)
+
+        # Files added later are not found anymore since the directories are only searched once
+        shutil.copy(os.path.join(os.path.dirname(__file__), "data", "lua.natvis"), source_dir)
+        other = os.path.join(source_dir, "other.cpp")
+        self.assertIsNone(manager.lookup_type(templates.parse_template_type("lua_State"), other))
+        self.assertTrue(manager.is_discovered(other))
@@ -0,0 +1,15 @@
+import unittest
+
+import parser
+
+
+class NormalizeExpressionTestCase(unittest.TestCase):
+    def test_whitespace(self):
+        self.assertEqual("m_data[m_size-1]", parser.normalize_expression("  m_data [ m_size - 1 ] "))
+        self.assertEqual("a.b->c", parser.normalize_expression("a . b -> c"))
+        # Whitespace between words is significant
+        self.assertEqual("(unsigned int)m_value", parser.normalize_expression("( unsigned   int ) m_value"))
+
+    def test_explicit_this(self):
+        self.assertEqual("m_first+m_second", parser.normalize_expression("this->m_first + this -> m_second"))
+        self.assertEqual("other_this->m_value", parser.normalize_expression("other_this->m_value"))
@@ -0,0 +1,379 @@
+import contextlib
+import io
+import os
+import time
+import unittest
+
+import gdb
+
+import logger
+import natvis
+import printer
+from breaker import QUARANTINE_THRESHOLD, CircuitBreaker
+from mock_inferior import MockInferior, make_vector, struct_type
+from settings import SETTINGS
+
+
+class PrinterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.inferior = MockInferior()
+
+        old_manager = printer.NATVIS_MANAGER
+        printer.NATVIS_MANAGER = natvis.NatvisManager()
+        printer.NATVIS_MANAGER.load_natvis_file(os.path.join(os.path.dirname(__file__), "data", "vector.natvis"))
+
+        self.printer = printer.NatvisPrettyPrinter("Natvis")
+        gdb.pretty_printers.insert(0, self.printer)
+
+        def restore():
+            printer.NATVIS_MANAGER = old_manager
+            gdb.pretty_printers.remove(self.printer)
+
+        self.addCleanup(restore)
+
+    def children(self, visualizer):
+        return [(name, str(value)) for name, value in visualizer.expanded_children()]
+
+    def test_vector(self):
+        vector = make_vector(self.inferior, gdb.lookup_type("int"), [1, 2, 3], capacity=4)
+
+        visualizer = self.printer(vector)
+        self.assertIsInstance(visualizer, printer.NatvisPrinter)
+        self.assertEqual("{ size=3 }", visualizer.to_string())
+        self.assertListEqual([("[capacity]", "4"), ("[0]", "1"), ("[1]", "2"), ("[2]", "3")],
+                             self.children(visualizer))
+
+    def test_no_visualizer(self):
+        point = struct_type("Point", [("x", gdb.lookup_type("int")), ("y", gdb.lookup_type("int"))])
+
+        self.assertIsNone(self.printer(self.inferior.new_struct(point, x=1, y=2)))
+
+    def test_item_address(self):
+        vector = make_vector(self.inferior, gdb.lookup_type("int"), [1, 2, 3], capacity=4)
+
+        visualizer = self.printer(vector)
+        visualizer.to_string()
+        name, capacity = next(visualizer.expanded_children())
+        self.assertEqual("[capacity]", name)
+        self.assertEqual(int(vector["m_capacity"].address), int(capacity.address))
+
+    def test_nested_display_string(self):
+        vector_int = make_vector(self.inferior, gdb.lookup_type("int"), [1, 2]).type
+        holder = struct_type("Holder", [("m_values", vector_int)])
+        data = self.inferior.new_array(gdb.lookup_type("int"), [5, 6, 7])
+        val = self.inferior.new_struct(holder)
+        self.inferior.store(gdb.lookup_type("unsigned long"), int(val.address), data)
+        self.inferior.store(gdb.lookup_type("unsigned long"), int(val.address) + 8, 3)
+
+        self.assertEqual("{m_values = { size=3 }}", str(val))
+
+    def test_reads(self):
+        vector = make_vector(self.inferior, gdb.lookup_type("int"), [1, 2, 3], capacity=4)
+        address, data = int(vector.address), int(vector["m_data"])
+        self.inferior.reset_reads()
+
+        visualizer = self.printer(vector)
+        visualizer.to_string()
+        # All members used by the visualizer are read at once
+        self.assertListEqual([(address, vector.type.sizeof)], self.inferior.reads)
+
+        self.children(visualizer)
+        # The elements are read as one block and the members are reused. Only the [capacity] item is read on its own
+        # since children have to refer to the object
+        self.assertListEqual([(address, vector.type.sizeof), (address + 16, 8), (data, 12)], self.inferior.reads)
+
+        self.inferior.reset_reads()
+        printer.INFERIOR_STATE.invalidate()
+        visualizer.to_string()
+        # The inferior state changed so the members have to be read again
+        self.assertListEqual([(address, vector.type.sizeof)], self.inferior.reads)
+
+    def test_large_vector(self):
+        count = 5000
+        self.assertGreater(SETTINGS.max_elements, count)
+        vector = make_vector(self.inferior, gdb.lookup_type("int"), range(count))
+        self.inferior.reset_reads()
+
+        start = time.perf_counter()
+        children = self.children(self.printer(vector))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(count + 1, len(children))
+        self.assertEqual(("[4999]", "4999"), children[-1])
+        # One read for the members, one for the [capacity] item and one per block of elements
+        blocks = -(-count // printer.memory.BULK_READ_ELEMENTS)
+        self.assertEqual(2 + blocks, len(self.inferior.reads))
+        self.assertLess(elapsed, 5.0)
+
+    def test_truncation(self):
+        old_max_elements = SETTINGS.max_elements
+        SETTINGS.max_elements = 2
+        self.addCleanup(setattr, SETTINGS, "max_elements", old_max_elements)
+
+        vector = make_vector(self.inferior, gdb.lookup_type("int"), [1, 2, 3])
+        children = self.children(self.printer(vector))
+
+        self.assertEqual(3, len(children))
+        self.assertTrue(children[-1][0].startswith("[truncated after 2 items"))
+
+    def test_time_limit(self):
+        old_time_limit = SETTINGS.time_limit
+        SETTINGS.time_limit = 0
+        self.addCleanup(setattr, SETTINGS, "time_limit", old_time_limit)
+
+        vector = make_vector(self.inferior, gdb.lookup_type("int"), [1, 2, 3])
+        children = self.children(self.printer(vector))
+        self.assertEqual(1, len(children))
+        self.assertRegex(children[0][0], r"^\[truncated after 0 items / \d+ ms\]$")
+        self.assertEqual("...", children[0][1])
+
+        # Nested values are not rendered anymore
+        node = self._node_type()
+        first, second = self.inferior.new_struct(node, m_value=1), self.inferior.new_struct(node, m_value=2)
+        self._link(first, second)
+        self.assertEqual("1 ...", self.printer(first).to_string())
+
+    def test_summary(self):
+        old_mode, old_limit = SETTINGS.large_container_mode, gdb.PARAMETERS["print elements"]
+        SETTINGS.large_container_mode = "summary"
+        gdb.PARAMETERS["print elements"] = 4
+
+        def restore():
+            SETTINGS.large_container_mode = old_mode
+            gdb.PARAMETERS["print elements"] = old_limit
+
+        self.addCleanup(restore)
+
+        count = 5000
+        vector = make_vector(self.inferior, gdb.lookup_type("int"), range(count))
+        self.inferior.reset_reads()
+
+        visualizer = self.printer(vector)
+        children = self.children(visualizer)
+        self.assertListEqual([("[capacity]", str(count)), ("[0]", "0"), ("[1]", "1"),
+                              ("[...]", "4996 of 5000 elements elided"), ("[4998]", "4998"), ("[4999]", "4999")],
+                             children)
+        # Besides the members and the [capacity] item only the blocks with the first and the last elements are read
+        self.assertEqual(4, len(self.inferior.reads))
+
+        self.assertEqual(6, visualizer.num_children())
+        self.assertEqual(("[4999]", "4999"), tuple(map(str, visualizer.child(5))))
+
+        # Small containers are shown completely
+        small = make_vector(self.inferior, gdb.lookup_type("int"), [1, 2, 3])
+        self.assertEqual(4, len(self.children(self.printer(small))))
+
+    def test_slice(self):
+        vector = make_vector(self.inferior, gdb.lookup_type("int"), range(20000), capacity=20001)
+        self.inferior.reset_reads()
+
+        visualizer = self.printer(vector)
+        # The capacity item is the first child, so the elements are shifted by one
+        children = [(name, str(value)) for name, value in visualizer.slice_children(15001, 15007, 2)]
+        self.assertListEqual([("[15000]", "15000"), ("[15002]", "15002"), ("[15004]", "15004")], children)
+        # Only the members and the block containing the elements are read
+        self.assertEqual(2, len(self.inferior.reads))
+
+        children = [(name, str(value)) for name, value in visualizer.slice_children(0, 3, 2)]
+        self.assertListEqual([("[capacity]", "20001"), ("[1]", "1")], children)
+
+    def test_slice_command(self):
+        vector = make_vector(self.inferior, gdb.lookup_type("int"), range(10))
+        gdb.VARIABLES["values"] = vector
+        self.addCleanup(gdb.VARIABLES.clear)
+        command = printer.NatvisSlice()
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            command.invoke("values 5 7", False)
+        self.assertEqual("[4] = 4\n[5] = 5\n", output.getvalue())
+
+        with self.assertRaises(gdb.GdbError):
+            command.invoke("values 7 5", False)
+        with self.assertRaises(gdb.GdbError):
+            command.invoke("values", False)
+
+    def test_failing_size(self):
+        printer.NATVIS_MANAGER.load_natvis_file(os.path.join(os.path.dirname(__file__), "data", "failing.natvis"))
+        int_type = gdb.lookup_type("int")
+        data = self.inferior.new_array(int_type, [1, 2])
+
+        for name in ("FailingArray", "FailingList"):
+            t = struct_type(name, [("m_value", int_type), ("m_data", int_type.pointer())])
+            visualizer = self.printer(self.inferior.new_struct(t, m_value=5, m_data=data))
+            # The size can not be evaluated, so the range is empty but the other children are still shown
+            self.assertListEqual([("[value]", "5")], self.children(visualizer), name)
+            self.assertEqual(1, visualizer.num_children(), name)
+
+    def test_index_variable(self):
+        int_type = gdb.lookup_type("int")
+        reversed_type = struct_type("Reversed", [("m_data", int_type.pointer()),
+                                                 ("m_size", gdb.lookup_type("unsigned long"))])
+        count = 50
+        val = self.inferior.new_struct(reversed_type, m_data=self.inferior.new_array(int_type, range(count)),
+                                       m_size=count)
+        gdb.EVALUATED.clear()
+
+        children = self.children(self.printer(val))
+        self.assertEqual(("[0]", str(count - 1)), children[0])
+        self.assertEqual(("[49]", "0"), children[-1])
+        # $i is bound through a convenience variable, so the value node is translated and checked only once
+        self.assertEqual(1, len([expression for expression in gdb.EVALUATED
+                                 if expression.startswith("sizeof(") and "m_data" in expression]))
+
+    def test_runtime_error_quarantine(self):
+        printer.NATVIS_MANAGER.load_natvis_file(os.path.join(os.path.dirname(__file__), "data", "failing.natvis"))
+        old_breaker = printer.CIRCUIT_BREAKER
+        printer.CIRCUIT_BREAKER = CircuitBreaker()
+        self.addCleanup(setattr, printer, "CIRCUIT_BREAKER", old_breaker)
+
+        int_type = gdb.lookup_type("int")
+        t = struct_type("FailingDivision", [("m_value", int_type), ("m_zero", int_type)])
+        val = self.inferior.new_struct(t, m_value=1)
+
+        self.assertEqual("Division by zero", self.printer(val).to_string())
+        for _ in range(QUARANTINE_THRESHOLD):
+            visualizer = self.printer(val)
+            if visualizer is None:
+                break
+            printer.INFERIOR_STATE.invalidate()
+            visualizer.to_string()
+        # Errors of the evaluation count as failures, so the visualizer is not used for the type anymore
+        self.assertIsNone(self.printer(val))
+
+    def test_memo(self):
+        int_type = gdb.lookup_type("int")
+        reversed_type = struct_type("Reversed", [("m_data", int_type.pointer()),
+                                                 ("m_size", gdb.lookup_type("unsigned long"))])
+        count = 50
+        val = self.inferior.new_struct(reversed_type, m_data=self.inferior.new_array(int_type, range(count)),
+                                       m_size=count)
+        visualizer = self.printer(val)
+
+        # Equivalent expressions share their result
+        gdb.EVALUATED.clear()
+        self.inferior.reset_reads()
+        first = visualizer._get_value("m_data[1]")
+        self.assertEqual("1", str(first))
+        self.inferior.reset_reads()
+        second = visualizer._get_value("this->m_data [ 1 ]")
+        self.assertIs(first, second)
+        self.assertEqual("1", str(second))
+        self.assertListEqual([], self.inferior.reads)
+        self.assertEqual(1, len([expression for expression in gdb.EVALUATED if not expression.startswith("sizeof(")]))
+
+        # The values of the elements are not kept
+        memo_size = len(visualizer._get_memo())
+        self.assertEqual(count, len(self.children(visualizer)))
+        self.assertEqual(memo_size, len(visualizer._get_memo()))
+
+    def _node_type(self):
+        printer.NATVIS_MANAGER.load_natvis_file(os.path.join(os.path.dirname(__file__), "data", "node.natvis"))
+        node = struct_type("Node", [("m_value", gdb.lookup_type("int")), ("m_next", gdb.lookup_type("void").pointer())])
+        # The type refers to itself, which can not be declared in one go
+        node.fields()[1].type = node.pointer()
+        return node
+
+    def _link(self, node, next_node):
+        self.inferior.store(gdb.lookup_type("unsigned long"), int(node.address) + 8, int(next_node.address))
+
+    def test_max_depth(self):
+        old_max_depth = SETTINGS.max_depth
+        SETTINGS.max_depth = 3
+        self.addCleanup(setattr, SETTINGS, "max_depth", old_max_depth)
+
+        node = self._node_type()
+        nodes = [self.inferior.new_struct(node, m_value=i) for i in range(5)]
+        for current, next_node in zip(nodes, nodes[1:]):
+            self._link(current, next_node)
+
+        self.assertEqual("0 1 2 ...", self.printer(nodes[0]).to_string())
+        # The end of a short list is shown
+        self.assertEqual("3 4 0x0", self.printer(nodes[3]).to_string())
+
+    def test_cycle(self):
+        node = self._node_type()
+        first, second = self.inferior.new_struct(node, m_value=1), self.inferior.new_struct(node, m_value=2)
+        self._link(first, first)
+        self.assertEqual("1 ...", self.printer(first).to_string())
+
+        self._link(first, second)
+        self._link(second, first)
+        printer.INFERIOR_STATE.invalidate()
+        self.assertEqual("1 2 ...", self.printer(first).to_string())
+
+    def test_rendered_reuse(self):
+        node = self._node_type()
+        pair = struct_type("NodePair", [("m_first", node.pointer()), ("m_second", node.pointer())])
+        shared = self.inferior.new_struct(node, m_value=7)
+        self._link(shared, shared)
+        val = self.inferior.new_struct(pair)
+        self.inferior.store(gdb.lookup_type("unsigned long"), int(val.address), int(shared.address))
+        self.inferior.store(gdb.lookup_type("unsigned long"), int(val.address) + 8, int(shared.address))
+
+        calls = []
+        original = printer.NatvisPrinter._get_natvis_type_display_string
+
+        def counting(visualizer, t):
+            calls.append(t.template_type.name)
+            return original(visualizer, t)
+
+        printer.NatvisPrinter._get_natvis_type_display_string = counting
+        self.addCleanup(setattr, printer.NatvisPrinter, "_get_natvis_type_display_string", original)
+
+        self.assertEqual("7 ... 7 ...", self.printer(val).to_string())
+        # The node is rendered once and its display string reused for the second pointer
+        self.assertListEqual(["NodePair", "Node"], calls)
+
+    def test_failure_key(self):
+        vector = make_vector(self.inferior, gdb.lookup_type("int"), [1, 2, 3])
+        visualizer = self.printer(vector)
+        logger.reset_failures()
+        self.addCleanup(logger.reset_failures)
+
+        for i in range(3):
+            visualizer._get_value("m_missing[$i]", i=str(i))
+        # The failures of all indices are counted as one
+        self.assertDictEqual({(visualizer.type.template_type, "m_missing[$i]"): 3}, logger.failure_counts())
+
+
+class MiDetectionTestCase(unittest.TestCase):
+    def setUp(self):
+        old_setting = SETTINGS.display_string_child
+        old_command_line = printer._command_line
+
+        def restore():
+            SETTINGS.display_string_child = old_setting
+            printer._command_line = old_command_line
+            printer._FRONTEND_NEEDS_DISPLAY_STRING_CHILD = None
+
+        self.addCleanup(restore)
+        printer._FRONTEND_NEEDS_DISPLAY_STRING_CHILD = None
+
+    def test_is_mi_session(self):
+        for args in (["gdb", "-i=mi"], ["gdb", "--interpreter=mi2"], ["gdb", "-interpreter=mi3"], ["gdb", "-i", "mi"],
+                     ["gdb", "--interpreter", "mi"], ["gdb", "-q", "--interpreter=mi", "a.out"]):
+            self.assertTrue(printer._is_mi_session(args), args)
+
+        for args in (["gdb"], ["gdb", "-i=console"], ["gdb", "--interpreter"], ["gdb", "--init-command=mi"],
+                     ["gdb", "-ix", "mi"], ["gdb", "a.out", "mi"]):
+            self.assertFalse(printer._is_mi_session(args), args)
+
+    def test_needs_display_string_child(self):
+        SETTINGS.display_string_child = None
+        printer._command_line = lambda: ["gdb", "--interpreter=mi2"]
+        self.assertTrue(printer.needs_display_string_child())
+
+        # The detection is only done once
+        printer._command_line = lambda: ["gdb"]
+        self.assertTrue(printer.needs_display_string_child())
+        printer._FRONTEND_NEEDS_DISPLAY_STRING_CHILD = None
+        self.assertFalse(printer.needs_display_string_child())
+
+        # The setting overrides the detection
+        SETTINGS.display_string_child = True
+        self.assertTrue(printer.needs_display_string_child())
+        SETTINGS.display_string_child = False
+        printer._FRONTEND_NEEDS_DISPLAY_STRING_CHILD = None
+        printer._command_line = lambda: ["gdb", "-i=mi"]
+        self.assertFalse(printer.needs_display_string_child())
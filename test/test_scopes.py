@@ -0,0 +1,147 @@
+import os
+import types
+import unittest
+
+import gdb
+
+import native
+import natvis
+import parser
+import printer
+import scopes
+from mock_inferior import MockInferior, struct_type
+from type_mapping import TypeManager
+
+
+class LookupTypeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.looked_up = []
+        old_lookup_type = gdb.lookup_type
+
+        def lookup_type(name, block=None):
+            self.looked_up.append(name)
+            return old_lookup_type(name, block)
+
+        gdb.lookup_type = lookup_type
+        gdb.events.new_objfile.connect(scopes._on_new_objfile)
+
+        def restore():
+            gdb.lookup_type = old_lookup_type
+            gdb.events.new_objfile.disconnect(scopes._on_new_objfile)
+            gdb.TYPES.pop("LateType", None)
+            scopes._TYPE_CACHES.clear()
+            scopes._MISSING_TYPES.clear()
+
+        self.addCleanup(restore)
+        scopes._TYPE_CACHES.clear()
+        scopes._MISSING_TYPES.clear()
+
+    def test_cache(self):
+        self.assertIs(gdb.TYPES["int"], scopes.lookup_type("int"))
+        self.assertIs(gdb.TYPES["int"], scopes.lookup_type("int"))
+        self.assertListEqual(["int"], self.looked_up)
+
+    def test_missing_type(self):
+        for _ in range(2):
+            with self.assertRaises(gdb.error):
+                scopes.lookup_type("LateType")
+        # The failure is cached as well
+        self.assertListEqual(["LateType"], self.looked_up)
+
+        # A new objfile may define the type
+        late_type = struct_type("LateType", [("m_value", gdb.TYPES["int"])])
+        gdb.events.new_objfile.notify()
+        self.assertIs(late_type, scopes.lookup_type("LateType"))
+        self.assertListEqual(["LateType", "LateType"], self.looked_up)
+
+
+class ObjfileEventsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.inferior = MockInferior()
+
+        old_manager = printer.NATVIS_MANAGER
+        printer.NATVIS_MANAGER = natvis.NatvisManager()
+        printer.NATVIS_MANAGER.load_natvis_file(os.path.join(os.path.dirname(__file__), "data", "vector.natvis"))
+        self.printer = printer.NatvisPrettyPrinter("Natvis")
+
+        gdb.events.clear_objfiles.connect(scopes._on_clear_objfiles)
+        gdb.events.free_objfile.connect(scopes._on_free_objfile)
+
+        def restore():
+            printer.NATVIS_MANAGER = old_manager
+            gdb.events.clear_objfiles.disconnect(scopes._on_clear_objfiles)
+            gdb.events.free_objfile.disconnect(scopes._on_free_objfile)
+
+        self.addCleanup(restore)
+
+    def print_reversed(self, objfile=None):
+        int_type = gdb.lookup_type("int")
+        t = struct_type("Reversed", [("m_data", int_type.pointer()), ("m_size", gdb.lookup_type("unsigned long"))])
+        if objfile is not None:
+            t.objfile = objfile
+        val = self.inferior.new_struct(t, m_data=self.inferior.new_array(int_type, [1, 2]), m_size=2)
+
+        children = [(name, str(value)) for name, value in self.printer(val).expanded_children()]
+        self.assertListEqual([("[0]", "2"), ("[1]", "1")], children)
+
+    def caches(self):
+        # The type manager, the natvis types of the template types and the translated expressions
+        return [self.printer.type_managers, printer.TEMPLATE_TYPE_CACHES, native._TRANSLATIONS]
+
+    def test_free_objfile(self):
+        objfile, other = gdb.Objfile(), gdb.Objfile()
+        self.print_reversed(objfile)
+        self.print_reversed(other)
+        for caches in self.caches():
+            self.assertIn(objfile, caches)
+
+        gdb.events.free_objfile.notify(types.SimpleNamespace(objfile=objfile))
+        for caches in self.caches():
+            self.assertNotIn(objfile, caches)
+            self.assertIn(other, caches)
+
+    def test_clear_objfiles(self):
+        progspace, other_progspace = gdb.current_progspace(), gdb.Progspace()
+        objfile, other = gdb.Objfile(), gdb.Objfile()
+        objfile.progspace, other.progspace = progspace, other_progspace
+        # Types without an objfile belong to the program space
+        self.print_reversed()
+        self.print_reversed(objfile)
+        self.print_reversed(other)
+        for caches in self.caches():
+            self.assertIn(progspace, caches)
+
+        gdb.events.clear_objfiles.notify(types.SimpleNamespace(progspace=progspace))
+        for caches in self.caches():
+            self.assertNotIn(progspace, caches)
+            self.assertNotIn(objfile, caches)
+            self.assertIn(other, caches)
+
+
+@unittest.skipUnless(parser.CLANG_AVAILABLE, "Casts are only evaluated with libclang")
+class ConvertTypeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.inferior = MockInferior()
+        self.type = struct_type("CastTest", [("m_value", gdb.lookup_type("int")),
+                                             ("m_name", gdb.lookup_type("char").pointer())])
+        self.val = self.inferior.new_struct(self.type, m_value=-1, m_name=self.inferior.new_string("name"))
+
+        # The declarations are generated like for the printer, so the type is known to libclang under another name
+        manager = TypeManager()
+        self.c_type_name, self.c_type = manager.get_type_string(self.type)
+        self.original_names = manager.get_original_names(self.type)
+
+    def evaluate(self, expression):
+        return parser.evaluate_expression(self.val, self.c_type_name, self.c_type, expression,
+                                          original_names=self.original_names)
+
+    def test_casts(self):
+        self.assertEqual("unsigned int", str(self.evaluate("(unsigned int)m_value").type))
+        self.assertEqual(0xffffffff, int(self.evaluate("(unsigned int)m_value")))
+        self.assertEqual("const char *", str(self.evaluate("(const char*)m_name").type))
+        self.assertEqual("char", str(self.evaluate("(char)m_value").type))
+        self.assertEqual("CastTest *", str(self.evaluate("(CastTest*)m_name").type))
+
+    def test_unknown_type(self):
+        with self.assertRaises(parser.ParserError):
+            self.evaluate("(Unknown*)m_name")
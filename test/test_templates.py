@@ -103,3 +103,16 @@ class TemplateParserTestCase(unittest.TestCase):
             template_type.matches(templates.parse_template_type("test::template_class<vector<int>, test>"), arglist))
 
         self.assertListEqual(["int", "test"], arglist)
+
+    def test_try_parse(self):
+        template_type = templates.try_parse_template_type("std::vector<int, std::allocator<int> >")
+
+        self.assertEqual("std::vector", template_type.name)
+        self.assertEqual(2, len(template_type.args))
+        self.assertEqual("std::allocator", template_type.args[1].name)
+
+    def test_try_parse_ambiguous(self):
+        self.assertIsNone(templates.try_parse_template_type("std::function<void (int)>"))
+        self.assertIsNone(templates.try_parse_template_type("(anonymous namespace)::test"))
+        self.assertIsNone(templates.try_parse_template_type("test<int>::nested"))
+        self.assertIsNone(templates.try_parse_template_type("test<int"))
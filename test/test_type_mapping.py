@@ -0,0 +1,28 @@
+import unittest
+
+import gdb
+
+from mock_inferior import MockInferior, make_vector, struct_type
+from type_mapping import TypeManager
+
+
+class TypeManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.inferior = MockInferior()
+        vector_int = make_vector(self.inferior, gdb.lookup_type("int"), [1]).type
+        self.type = struct_type("MappedHolder", [("m_values", vector_int), ("m_count", gdb.lookup_type("int"))])
+
+    def test_declarations(self):
+        manager = TypeManager()
+        c_type_name, c_type = manager.get_type_string(self.type)
+        names = manager.get_original_names(self.type)
+
+        self.assertEqual("MappedHolder", names[c_type_name])
+        self.assertSetEqual({"MappedHolder", "Vector<int>"}, set(names.values()))
+        # Types with a plain name can be used in expressions, template instances only by their generated name
+        self.assertIn("typedef {} MappedHolder;".format(c_type_name), c_type)
+        self.assertNotIn("Vector<int>;", c_type)
+
+        # The mapping belongs to the cached declarations
+        self.assertEqual((c_type_name, c_type), manager.get_type_string(self.type))
+        self.assertIs(names, manager.get_original_names(self.type))
@@ -0,0 +1,96 @@
+import os
+import time
+import unittest
+
+import parser
+import validation
+from settings import SETTINGS
+
+
+def _check_in_worker(c_type_name, c_type, expression):
+    # Must be a module level function, the workers only inherit it through the fork
+    return expression != "invalid"
+
+
+def _hanging_check(c_type_name, c_type, expression):
+    time.sleep(1.0)
+    return True
+
+
+class ValidationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.validator = validation.Validator()
+        self.checked = []
+
+        old_check_expression = parser.check_expression
+        old_workers = SETTINGS.validation_workers
+
+        def check_expression(c_type_name, c_type, expression):
+            self.checked.append(expression)
+            return expression != "invalid"
+
+        parser.check_expression = check_expression
+
+        def restore():
+            self.validator.shutdown()
+            parser.check_expression = old_check_expression
+            SETTINGS.validation_workers = old_workers
+
+        self.addCleanup(restore)
+
+    def test_serial(self):
+        SETTINGS.validation_workers = 0
+
+        self.validator.submit("T", "struct T {};", ("a", "b"))
+        self.assertListEqual([], self.checked)
+
+        self.assertTrue(self.validator.is_valid("T", "struct T {};", ("a", "b")))
+        self.assertFalse(self.validator.is_valid("T", "struct T {};", ("invalid",)))
+        self.assertListEqual(["a", "b", "invalid"], self.checked)
+
+        # The results are cached
+        self.assertTrue(self.validator.is_valid("T", "struct T {};", ("a", "b")))
+        self.assertListEqual(["a", "b", "invalid"], self.checked)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "The workers are forked")
+    def test_workers(self):
+        SETTINGS.validation_workers = 2
+        old_clang_available = parser.CLANG_AVAILABLE
+        parser.CLANG_AVAILABLE = True
+        self.addCleanup(setattr, parser, "CLANG_AVAILABLE", old_clang_available)
+        parser.check_expression = _check_in_worker
+
+        candidates = [("a",), ("invalid",), ("b", "c")]
+        for expressions in candidates:
+            self.validator.submit("T", "struct T {};", expressions)
+        self.assertIsNotNone(self.validator._executor)
+        self.assertEqual(3, len(self.validator.pending))
+
+        self.assertTrue(self.validator.is_valid("T", "struct T {};", candidates[0]))
+        self.assertFalse(self.validator.is_valid("T", "struct T {};", candidates[1]))
+        self.assertTrue(self.validator.is_valid("T", "struct T {};", candidates[2]))
+        self.assertEqual(0, len(self.validator.pending))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "The workers are forked")
+    def test_worker_timeout(self):
+        SETTINGS.validation_workers = 1
+        old_clang_available, old_timeout = parser.CLANG_AVAILABLE, validation.VALIDATION_TIMEOUT
+        parser.CLANG_AVAILABLE = True
+        validation.VALIDATION_TIMEOUT = 0.05
+
+        def restore():
+            parser.CLANG_AVAILABLE = old_clang_available
+            validation.VALIDATION_TIMEOUT = old_timeout
+
+        self.addCleanup(restore)
+        check_expression = parser.check_expression
+        parser.check_expression = _hanging_check
+        self.validator.submit("T", "struct T {};", ("a",))
+        self.validator.submit("T", "struct T {};", ("b",))
+        parser.check_expression = check_expression
+
+        # The expressions are checked in this process instead and the stuck pool is dropped
+        self.assertTrue(self.validator.is_valid("T", "struct T {};", ("a",)))
+        self.assertListEqual(["a"], self.checked)
+        self.assertIsNone(self.validator._executor)
+        self.assertEqual(0, len(self.validator.pending))
@@ -0,0 +1,93 @@
+import os
+import unittest
+
+import gdb
+
+import natvis
+import printer
+import validation
+import warmup
+from mock_inferior import MockInferior, make_vector, struct_type
+from settings import SETTINGS
+
+
+class WarmUpTestCase(unittest.TestCase):
+    def setUp(self):
+        self.inferior = MockInferior()
+
+        old_manager = printer.NATVIS_MANAGER
+        printer.NATVIS_MANAGER = natvis.NatvisManager()
+        printer.NATVIS_MANAGER.load_natvis_file(os.path.join(os.path.dirname(__file__), "data", "vector.natvis"))
+
+        old_validator = validation.VALIDATOR
+        validation.VALIDATOR = validation.Validator()
+
+        old_warm_up, old_time_limit = SETTINGS.warm_up, SETTINGS.warm_up_time_limit
+        SETTINGS.warm_up = True
+        SETTINGS.warm_up_time_limit = None
+
+        self.printer = printer.NatvisPrettyPrinter("Natvis")
+        self.warm_up = warmup.WarmUp(self.printer)
+
+        int_type = gdb.lookup_type("int")
+        self.vector_int = make_vector(self.inferior, int_type, [1]).type
+        self.vector_float = make_vector(self.inferior, gdb.lookup_type("float"), [1]).type
+        point = struct_type("Point", [("x", int_type), ("y", int_type)])
+
+        function = gdb.Block([gdb.Symbol("values", self.vector_int.pointer(), is_argument=True),
+                              gdb.Symbol("point", point),
+                              gdb.Symbol("count", int_type)],
+                             function=gdb.Symbol("main", int_type, is_variable=False))
+        inner = gdb.Block([gdb.Symbol("other", self.vector_float.const().reference()),
+                           gdb.Symbol("again", self.vector_int)], superblock=function)
+        gdb.select_frame(gdb.Frame(inner))
+
+        def restore():
+            printer.NATVIS_MANAGER = old_manager
+            validation.VALIDATOR = old_validator
+            SETTINGS.warm_up, SETTINGS.warm_up_time_limit = old_warm_up, old_time_limit
+            gdb.select_frame(None)
+            gdb.run_posted_events()
+
+        self.addCleanup(restore)
+
+    def planned_types(self):
+        return sorted(type_name for plans in self.printer.snapshot_plans._scopes.values()
+                      for _, type_name in plans._entries)
+
+    def test_frame_variable_types(self):
+        types = warmup.frame_variable_types(gdb.selected_frame())
+        self.assertListEqual(["const Vector<float> &", "Vector<int>", "Vector<int> *", "Point", "int"],
+                             [str(t) for t in types])
+
+        self.assertListEqual([], warmup.frame_variable_types(gdb.Frame()))
+
+    def test_warm_up(self):
+        self.warm_up.start()
+        self.assertTrue(self.warm_up.running)
+        self.assertGreater(gdb.run_posted_events(), 0)
+        self.assertFalse(self.warm_up.running)
+
+        self.assertListEqual(["Vector<float>", "Vector<int>"], self.planned_types())
+        self.assertEqual(2, len(validation.VALIDATOR.results))
+
+    def test_cancel(self):
+        self.warm_up.start()
+        self.warm_up.cancel()
+        gdb.run_posted_events()
+
+        self.assertListEqual([], self.planned_types())
+
+    def test_time_limit(self):
+        SETTINGS.warm_up_time_limit = 0
+        self.warm_up.start()
+        gdb.run_posted_events()
+
+        self.assertFalse(self.warm_up.running)
+        self.assertListEqual([], self.planned_types())
+
+    def test_disabled(self):
+        SETTINGS.warm_up = False
+        self.warm_up.start()
+
+        self.assertEqual(0, gdb.run_posted_events())